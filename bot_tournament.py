@@ -3,12 +3,19 @@ from chess_analysis.auto import run_auto_game
 
 import pandas as pd
 import os
+import pickle
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
+from chess_analysis.features import MOBILITY_CACHE
 from chess_analysis.util import random_first_moves
+from chess_analysis.position_analysis import position_analysis, incremental_position_analysis, SUMMARY_FEATURES
+from chess_analysis.profiling import Profiler
 
 def setup_tournament(players, n_rounds, games_per_round, csv_filename):
     # Initialize CSV file (remove if exists to start fresh)
-    if os.path.exists(csv_filename):
+    if csv_filename and os.path.exists(csv_filename):
         os.remove(csv_filename)
         print(f"Removed existing {csv_filename} to start fresh")
     
@@ -33,7 +40,96 @@ def setup_tournament(players, n_rounds, games_per_round, csv_filename):
 
     return player_combinations
 
-def run_tournament(players, n_rounds=1, games_per_round=1, csv_filename='tournament_results.csv'):
+def play_tournament_game(white_player, black_player, seed, annotator=None, shared_cache=True, adjudicator=None, store=None, opening_player=None, cache=None):
+    """
+    Play one tournament game with its own random seed.
+    
+    The pipelines' memos, the engines' hash tables (ucinewgame) and the mobility
+    cache are cleared first, so a game does not depend on the games played before
+    it in the same process.
+    
+    Args:
+        white_player, black_player (Analysis): Player pipelines
+        seed (str): Seed for the opening moves and random players
+        annotator (Analysis): Pipeline analysing positions, defaults to position_analysis
+        shared_cache (bool): Let the players and annotator reuse each other's searches
+        adjudicator (Adjudicator): Ends the game once its result is decided
+        store (PositionStore): Store whose evaluations are looked up before searching
+        opening_player (Analysis): Player making the random opening moves, defaults
+            to random_player
+        cache (EvaluationCache): Cache shared across games instead of a new one per
+            game (ignored with a store, which is one)
+    
+    Returns:
+        tuple: (initial_moves, PositionHistory of the game)
+    """
+    if annotator is None:
+        annotator = position_analysis
+    if opening_player is None:
+        opening_player = random_player
+    for pipeline in (white_player, black_player, annotator, opening_player):
+        pipeline.new_game()
+    MOBILITY_CACHE.clear()
+    
+    random.seed(seed)
+    initial_moves = random_first_moves(white_player, black_player, opening_player)
+    _, position_history = run_auto_game(
+        (white_player, black_player),
+        initial_moves=initial_moves,
+        bare=True,
+        annotator=annotator,
+        shared_cache=shared_cache,
+        adjudicator=adjudicator,
+        cache=store if store is not None else cache
+    )
+    if store is not None:
+        # Commit the game's engine results in one transaction
+        store.flush()
+    return initial_moves, position_history
+
+def game_dataframe(position_history, columns=None):
+    """Get a game's positions as a DataFrame, with the game's result and termination on every row."""
+    df = position_history.to_dataframe(columns)
+    df['result'] = position_history.result
+    df['termination'] = position_history.termination
+    return df
+
+# Per-process copies of the pipelines, with their own engines, in parallel mode
+_worker_players = None
+_worker_annotator = None
+_worker_adjudicator = None
+_worker_store = None
+_worker_opening_player = None
+
+def _init_tournament_worker(payload):
+    global _worker_players, _worker_annotator, _worker_adjudicator, _worker_store, _worker_opening_player
+    players, (random_pipeline, random_engine), (annotator, annotator_engine), _worker_adjudicator, _worker_store = pickle.loads(payload)
+    _worker_players = [pipeline.copy_with_engine(engine) for pipeline, engine in players]
+    _worker_opening_player = random_pipeline.copy_with_engine(random_engine)
+    _worker_annotator = annotator.copy_with_engine(annotator_engine)
+
+def _play_worker_game(white_index, black_index, seed, shared_cache):
+    return play_tournament_game(
+        _worker_players[white_index], _worker_players[black_index], seed,
+        _worker_annotator, shared_cache, _worker_adjudicator, _worker_store, _worker_opening_player
+    )
+
+def run_tournament(
+    players,
+    n_rounds=1,
+    games_per_round=1,
+    csv_filename='tournament_results.csv',
+    profile=False,
+    workers=1,
+    seed=None,
+    shared_cache=True,
+    adjudicator=None,
+    dataset_dir=None,
+    row_group_size=65_536,
+    store_path=None,
+    row_group_games=32,
+    cache_path=None
+):
     """
     Run a tournament with multiple rounds and games per round.
     
@@ -41,56 +137,159 @@ def run_tournament(players, n_rounds=1, games_per_round=1, csv_filename='tournam
         players (list): List of player objects to compete in the tournament
         n_rounds (int): Number of rounds to play
         games_per_round (int): Number of games to play for each player combination per round
-        csv_filename (str): Filename for CSV output (saves after each game)
+        csv_filename (str): Filename for CSV output (saves after each game), unused
+            when dataset_dir is given
+        profile (bool): Time every pipeline step and engine call, printing a report at the end
+            (only games played in this process are profiled)
+        workers (int): Processes playing games at once; each starts its own engines.
+            None uses every core
+        seed (int): Base seed; game i is seeded with f"{seed}:{i}" and starts from fresh
+            engine state whatever process plays it (with store_path, evaluations reused
+            from the store also depend on what it already held)
+        shared_cache (bool): Share engine results between the players and the annotator
+            within each game, so no position is searched twice
+        adjudicator (Adjudicator): Ends games once their result is decided, saving
+            the analysis of decided positions
+        dataset_dir (str): Write the games to a Parquet dataset in this directory instead,
+            partitioned by run (the seed) and pairing (see chess_analysis.dataset)
+        row_group_size (int): Most positions per pairing buffered before writing to the dataset
+        store_path (str): SQLite PositionStore shared by every game (and kept across
+            tournaments): positions it holds a deep enough evaluation of are not searched
+            again, and every game's positions are counted in it
+        row_group_games (int): Most games per pairing buffered before writing to the dataset,
+            bounding what an interrupted tournament can lose
+        cache_path (str): JSON EvaluationCache shared by every game, loaded at the start
+            and saved at the end, so later tournaments start warm; needs workers=1 (use
+            store_path to share evaluations between processes)
     
     Returns:
-        pd.DataFrame: Combined position analysis data from all games
+        pd.DataFrame: Combined position analysis data from all games; None with dataset_dir,
+            whose games are not kept in memory (read them with chess_analysis.dataset.load_dataframe)
     """
     
-    player_combinations = setup_tournament(players, n_rounds, games_per_round, csv_filename)
+    workers = workers or os.cpu_count() or 1
+    if cache_path and store_path:
+        raise ValueError("Give store_path or cache_path, not both")
+    if cache_path and workers > 1:
+        raise ValueError("cache_path needs workers=1, use store_path to share evaluations between processes")
 
-    all_position_data = []
-    game_counter = 0
-    
+    player_combinations = setup_tournament(players, n_rounds, games_per_round, None if dataset_dir else csv_filename)
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    print(f"Seed: {seed}, workers: {workers}")
+
+    writer = None
+    if dataset_dir:
+        from chess_analysis.dataset import DatasetWriter
+        writer = DatasetWriter(
+            dataset_dir, run=str(seed), row_group_size=row_group_size, overwrite=True, row_group_games=row_group_games
+        )
+
+    store = None
+    if store_path:
+        from chess_analysis.position_store import PositionStore
+        store = PositionStore(store_path)
+
+    cache = None
+    if cache_path:
+        from chess_analysis.cache import EvaluationCache
+        cache = EvaluationCache(path=cache_path)
+
+    profiler = Profiler() if profile else None
+    profiled_pipelines = [*players, position_analysis, incremental_position_analysis]
+    for pipeline in profiled_pipelines:
+        pipeline.profiler = profiler
+
+    games = []
     for round_num in range(n_rounds):
-        print(f"Round {round_num + 1}/{n_rounds}")
-        
         for white_player, black_player in player_combinations:
-            print(f"  {white_player['name']} (White) vs {black_player['name']} (Black)")
-            
             for game_num in range(games_per_round):
-                game_counter += 1
-                print(f"    Game {game_num + 1}/{games_per_round} (Total: {game_counter})")
+                games.append((round_num, game_num, players.index(white_player), players.index(black_player)))
 
-                initial_moves = random_first_moves(white_player, black_player, random_player)
-                print(f"      Starting game with initial moves: {initial_moves}")
+    all_position_data = []
+    columns = SUMMARY_FEATURES + ['eval']
 
-                _, position_history = run_auto_game(
-                    (white_player, black_player),
-                    initial_moves=initial_moves,
-                    bare=True
+    def save_game(game_counter, game, initial_moves, position_history):
+        round_num, game_num, white_index, black_index = game
+        if game_num == 0:
+            print(f"Round {round_num + 1}/{n_rounds}: {players[white_index]['name']} (White) vs {players[black_index]['name']} (Black)")
+        print(f"    Game {game_num + 1}/{games_per_round} (Total: {game_counter})")
+        print(f"      Initial moves: {initial_moves}")
+        adjudication = position_history.adjudication
+        if adjudication is not None:
+            print(f"      Adjudicated {adjudication.result} ({adjudication.reason}) at ply {adjudication.ply}")
+
+        if store is not None:
+            store.add_game(position_history)
+        if writer is not None:
+            writer.write_game(players[white_index]['name'], players[black_index]['name'], position_history)
+            print(f"      Game {game_counter} data buffered for {dataset_dir} ({len(position_history)} positions)")
+            return
+        all_position_data.append(game_dataframe(position_history))
+        game_df = game_dataframe(position_history, columns)
+        write_header = not os.path.exists(csv_filename)
+        game_df.to_csv(csv_filename, mode='a', header=write_header, index=False)
+        
+        print(f"      Game {game_counter} data saved to {csv_filename} ({len(position_history)} positions)")
+
+    try:
+        if workers == 1:
+            for i, game in enumerate(games):
+                _, _, white_index, black_index = game
+                results = play_tournament_game(
+                    players[white_index], players[black_index], f"{seed}:{i}",
+                    shared_cache=shared_cache, adjudicator=adjudicator, store=store, cache=cache
                 )
-                                
-                game_positions = []
-                for position in position_history:                
-                    position_data = position['analysis']
-                    game_positions.append(position_data)
-                all_position_data += game_positions
-
-                game_df = pd.DataFrame(game_positions)
-                write_header = not os.path.exists(csv_filename)
-                game_df.to_csv(csv_filename, mode='a', header=write_header, index=False)
-                
-                print(f"      Game {game_counter} data saved to {csv_filename} ({len(game_positions)} positions)")
-    
-    df = pd.DataFrame(all_position_data)
+                save_game(i + 1, game, *results)
+        else:
+            # Games finish in any order but are written in order by this process alone
+            payload = pickle.dumps((
+                [(player, player.engine) for player in players],
+                (random_player, random_player.engine),
+                (position_analysis, position_analysis.engine),
+                adjudicator,
+                store,
+            ))
+            with ProcessPoolExecutor(workers, initializer=_init_tournament_worker, initargs=(payload,)) as executor:
+                pending = deque()
+                for i, game in enumerate(games):
+                    _, _, white_index, black_index = game
+                    pending.append((i, game, executor.submit(_play_worker_game, white_index, black_index, f"{seed}:{i}", shared_cache)))
+                    if len(pending) >= 2 * workers:
+                        j, done_game, future = pending.popleft()
+                        save_game(j + 1, done_game, *future.result())
+                while pending:
+                    j, done_game, future = pending.popleft()
+                    save_game(j + 1, done_game, *future.result())
+    finally:
+        # Engines restart if used again; the workers' engines exit with them
+        for pipeline in [*players, random_player, position_analysis, incremental_position_analysis]:
+            pipeline.close()
+        # Even after an error or Ctrl-C, buffered games are written and the files finished
+        if writer is not None:
+            writer.close()
+            print(f"Saved to: {writer.run_dir}")
+        if store is not None:
+            print(f"Position store: {store.stats()}")
+            store.close()
+        if cache is not None:
+            print(f"Evaluation cache: {cache.stats()}")
+            cache.close()
+        if profiler is not None:
+            print("\nPipeline profile (ms):")
+            print(profiler.report())
+            for pipeline in profiled_pipelines:
+                pipeline.profiler = None
+
+    if writer is not None:
+        return None
     print(f"Saved to: {csv_filename}")
-        
-    return df
+    return pd.concat(all_position_data, ignore_index=True) if all_position_data else pd.DataFrame()
 
-tournament_players = [engine_player, random_player]
-tournament_df = run_tournament(tournament_players)
+if __name__ == '__main__':
+    tournament_players = [engine_player, random_player]
+    tournament_df = run_tournament(tournament_players)
 
-print(f"\nTournament completed!")
-print(f"Total positions analyzed: {len(tournament_df)}")
-print(f"Data shape: {tournament_df.shape}")
\ No newline at end of file
+    print(f"\nTournament completed!")
+    print(f"Total positions analyzed: {len(tournament_df)}")
+    print(f"Data shape: {tournament_df.shape}")
\ No newline at end of file
@@ -0,0 +1,121 @@
+from typing import Optional, TYPE_CHECKING
+import chess
+from .probe import Prober
+
+if TYPE_CHECKING:
+    from .auto import Ply
+
+
+class Adjudication:
+    """Result an Adjudicator gave a game.
+
+    Attributes:
+        result (str): PGN result, '1-0', '0-1' or '1/2-1/2'
+        reason (str): Why the game was adjudicated, e.g. 'resign'
+        ply (int): Ply of the game (board.ply()) it was adjudicated at
+    """
+    __slots__ = ('result', 'reason', 'ply')
+
+    def __init__(self, result: str, reason: str, ply: int):
+        self.result = result
+        self.reason = reason
+        self.ply = ply
+
+    def __repr__(self) -> str:
+        return f"Adjudication({self.result!r}, {self.reason!r}, ply={self.ply})"
+
+
+class Adjudicator:
+    """Ends games whose result is already decided.
+
+    Fed every Ply of a game by play_game, in order. Evaluations are in pawns
+    from White's point of view; plies without one reset the eval counters.
+    All rules are off unless configured.
+    """
+
+    def __init__(
+        self,
+        resign_eval: Optional[float] = None,
+        resign_plies: int = 4,
+        draw_eval: Optional[float] = None,
+        draw_plies: int = 10,
+        draw_after: int = 40,
+        tablebase: Optional[Prober] = None,
+        max_plies: Optional[int] = None
+    ):
+        """Initialize the adjudicator.
+
+        Args:
+            resign_eval: The losing side resigns once the eval is beyond
+                +/- this for resign_plies consecutive plies
+            resign_plies: Consecutive plies needed to resign
+            draw_eval: The game is drawn once |eval| stays below this for
+                draw_plies consecutive plies from move draw_after on
+            draw_plies: Consecutive plies needed for a draw
+            draw_after: First full move number draw adjudication counts from
+            tablebase: Prober whose tablebases decide positions they cover
+            max_plies: Game length (board.ply()) at which the game is drawn
+        """
+        self.resign_eval = resign_eval
+        self.resign_plies = resign_plies
+        self.draw_eval = draw_eval
+        self.draw_plies = draw_plies
+        self.draw_after = draw_after
+        self.tablebase = tablebase
+        self.max_plies = max_plies
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the current game, before starting a new one."""
+        self.white_winning = 0
+        self.black_winning = 0
+        self.level = 0
+        self.adjudication: Optional[Adjudication] = None
+
+    def adjudicate(self, ply: 'Ply') -> Optional[Adjudication]:
+        """Take the next ply into account.
+
+        Returns:
+            The Adjudication if the game should end here (also kept as
+            self.adjudication), otherwise None
+        """
+        board = ply.board
+        if self.adjudication is not None or board.is_game_over():
+            return self.adjudication
+
+        self._count(board, ply.eval)
+
+        if self.tablebase is not None:
+            probed = self.tablebase.probe_tablebase(board)
+            if probed is not None:
+                value = probed['score']['value']
+                return self._decide("1-0" if value > 0 else "0-1" if value < 0 else "1/2-1/2", "tablebase", board)
+
+        if self.resign_eval is not None:
+            if self.white_winning >= self.resign_plies:
+                return self._decide("1-0", "resign", board)
+            if self.black_winning >= self.resign_plies:
+                return self._decide("0-1", "resign", board)
+
+        if self.draw_eval is not None and self.level >= self.draw_plies:
+            return self._decide("1/2-1/2", "draw", board)
+
+        if self.max_plies is not None and board.ply() >= self.max_plies:
+            return self._decide("1/2-1/2", "max plies", board)
+
+        return None
+
+    def _count(self, board: chess.Board, eval: Optional[float]) -> None:
+        if eval is None:
+            self.white_winning = self.black_winning = self.level = 0
+            return
+
+        if self.resign_eval is not None:
+            self.white_winning = self.white_winning + 1 if eval >= self.resign_eval else 0
+            self.black_winning = self.black_winning + 1 if eval <= -self.resign_eval else 0
+        if self.draw_eval is not None and board.fullmove_number >= self.draw_after:
+            self.level = self.level + 1 if abs(eval) < self.draw_eval else 0
+
+    def _decide(self, result: str, reason: str, board: chess.Board) -> Adjudication:
+        self.adjudication = Adjudication(result, reason, board.ply())
+        return self.adjudication
@@ -1,48 +1,454 @@
-from typing import Any, Callable, Optional
+import copy
+import inspect
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
 import chess
-from .engine import Engine, StockfishEngine
+import chess.polyglot
+from .async_engine import AsyncEngine
+from .engine import Engine
+from .profiling import Profiler
+from .uci import UCIEngine
+
+Step = Callable[['Analysis'], Any]
+
+
+def step(produces: Iterable[str] = (), consumes: Iterable[str] = (), memoize: bool = True) -> Callable[[Step], Step]:
+    """Declare the keys a pipeline step sets and reads.
+    
+    Declared steps that produce keys only run when one of those keys is
+    read (or when they are the pipeline's last step), and their results are
+    memoized per position. Steps depending on more than the position (move
+    history, clocks, randomness, input) must set memoize=False.
+    """
+    def decorate(func: Step) -> Step:
+        func.produces = tuple(produces)
+        func.consumes = tuple(consumes)
+        func.memoize = memoize
+        return func
+    return decorate
+
+
+_UNSET = object()
+
+
+class Record:
+    """Results of one Analysis call, with a slot for every key its steps produce.
+    
+    Keys no step declares (set by undeclared steps) go in an overflow dict.
+    """
+    __slots__ = ('index', 'values', 'extra')
+    
+    def __init__(self, index: dict[str, int]):
+        self.index = index
+        self.values = [_UNSET] * len(index)
+        self.extra: Optional[dict[str, Any]] = None
+    
+    def __contains__(self, key) -> bool:
+        i = self.index.get(key)
+        if i is None:
+            return self.extra is not None and key in self.extra
+        return self.values[i] is not _UNSET
+    
+    def __getitem__(self, key) -> Any:
+        if key not in self:
+            raise KeyError(key)
+        return self.get(key)
+    
+    def __setitem__(self, key, value):
+        i = self.index.get(key)
+        if i is not None:
+            self.values[i] = value
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+    
+    def get(self, key, default=None) -> Any:
+        i = self.index.get(key)
+        if i is None:
+            return self.extra.get(key, default) if self.extra is not None else default
+        value = self.values[i]
+        return default if value is _UNSET else value
+    
+    def keys(self) -> list[str]:
+        keys = [key for key, i in self.index.items() if self.values[i] is not _UNSET]
+        return keys + list(self.extra or ())
+    
+    def items(self) -> list[tuple[str, Any]]:
+        return [(key, self.get(key)) for key in self.keys()]
+    
+    def to_dict(self) -> dict[str, Any]:
+        return dict(self.items())
+    
+    def copy(self) -> dict[str, Any]:
+        return self.to_dict()
+    
+    def __repr__(self) -> str:
+        return f"Record({self.to_dict()})"
+
 
 class Analysis:
-    def __init__(self, engine: Optional[Engine] = None):
+    def __init__(
+        self,
+        engine: Optional[Union[Engine, AsyncEngine]] = None,
+        memo_size: int = 10_000,
+        records: bool = False
+    ):
+        """Create an empty pipeline.
+        
+        Args:
+            engine: Engine used by the steps, defaults to a Stockfish UCIEngine
+            memo_size: Positions whose step results are memoized (0 disables)
+            records: Give each call a fresh Record for its results instead of
+                writing them into persist, which steps may then only read
+        """
         self.pipeline = []
         
         if engine is None:
-            engine = StockfishEngine(path="stockfish", depth=15)
+            engine = UCIEngine(path="stockfish", depth=15)
         self.engine = engine
         
         self.persist = {}
+        self.records = records
+        self.memo: OrderedDict[int, dict[Step, tuple[dict[str, Any], Any]]] = OrderedDict()
+        self.memo_size = memo_size
+        self.memo_lock = threading.Lock()
+        # Optional Profiler timing every step; None costs one check per step
+        self.profiler: Optional[Profiler] = None
+        # (pipeline length, producers(), Record index), rebuilt when steps are added
+        self.index: Optional[tuple[int, dict[str, Step], dict[str, int]]] = None
+        self._ensure_index()
         self.reset()
     
+    def _ensure_index(self):
+        """Build the producer map and Record index unless they match the pipeline.
+        
+        Views (see bind) share this analysis's index and only read it.
+        """
+        if self.index is None or self.index[0] != len(self.pipeline):
+            producer_of = self.producers()
+            self.index = (len(self.pipeline), producer_of, {key: i for i, key in enumerate(producer_of)})
+    
     def reset(self, board: Optional[chess.Board] = None):
         self.board = board if board else chess.Board()
-        self.context = self.persist
+        _, self.producer_of, record_index = self.index
+        if self.records:
+            self.context = Record(record_index)
+        else:
+            self.context = self.persist
+        self.outputs: dict[Step, Any] = {}
+        self.writes: list[dict[str, Any]] = []
+        self.child_times: list[float] = []
+        self.position_key: Optional[int] = None
+        self.lazy = True
+    
+    def bind(self, board: Optional[chess.Board]) -> 'Analysis':
+        """Get a view of this analysis for one call on a board.
+        
+        The view shares the pipeline, persist, engine and memo, but has its
+        own board and results, so one Analysis can serve several threads
+        (as long as its engine can).
+        """
+        # Steps appended to self.pipeline directly are indexed here, once
+        self._ensure_index()
+        bound = copy.copy(self)
+        bound.reset(board)
+        return bound
+    
+    def with_settings(self, **settings: Any) -> 'Analysis':
+        """Get a view of this analysis with its own persist, updated with settings.
+        
+        The view shares the pipeline, engine and memo, so per-game state
+        (e.g. an accumulator) can be given to a shared pipeline without
+        other users of it seeing that state.
+        """
+        self._ensure_index()
+        view = copy.copy(self)
+        view.persist = {**self.persist, **settings}
+        view.reset(self.board)
+        return view
+    
+    def __copy__(self) -> 'Analysis':
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        return view
+    
+    def __getstate__(self) -> dict[str, Any]:
+        # Pickled without its engine, memo or current call (see Analysis.map)
+        return {
+            'pipeline': self.pipeline,
+            'persist': self.persist,
+            'records': self.records,
+            'memo_size': self.memo_size,
+        }
+    
+    def __setstate__(self, state: dict[str, Any]):
+        self.__dict__.update(state)
+        self.engine = None
+        self.memo = OrderedDict()
+        self.memo_lock = threading.Lock()
+        self.profiler = None
+        self.index = None
+        self._ensure_index()
+        self.reset()
 
     def __getitem__(self, item) -> Any:
+        producer = self.producer_of.get(item) if self.lazy else None
+        if producer is not None and producer not in self.outputs:
+            self.run_step(producer)
+        
         if item in self.context:
             return self.context.get(item)
         else:
             return self.persist.get(item)
     
     def __setitem__(self, key, value):
+        if self.records and key in self.persist and key not in self.producer_of:
+            raise KeyError(f"'{key}' is a persistent setting, read-only while analysing")
         self.context[key] = value
+        if self.writes:
+            self.writes[-1][key] = value
 
-    def __or__(self, func: Callable[['Analysis'], Any]) -> 'Analysis':
+    def __or__(self, func: Step) -> 'Analysis':
         self.pipeline.append(func)
+        self.index = None
+        self._ensure_index()
         return self
     
+    def producers(self) -> dict[str, Step]:
+        """Map every declared key to the last step in the pipeline producing it."""
+        return {key: func for func in self.pipeline for key in getattr(func, 'produces', ())}
+    
+    def is_lazy(self, func: Step) -> bool:
+        return bool(getattr(func, 'produces', ()))
+    
+    def run_step(self, func: Step) -> Any:
+        """Run a step once for the current board, replaying it from the memo if possible."""
+        if self.profiler is None:
+            return self._execute(func)[0]
+        
+        # Time the step without the steps it triggers
+        self.child_times.append(0.0)
+        start = time.perf_counter()
+        try:
+            out, memoized = self._execute(func)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self.child_times.pop()
+            if self.child_times:
+                self.child_times[-1] += elapsed
+        self.profiler.record_step(getattr(func, '__name__', repr(func)), elapsed - children, memoized)
+        return out
+    
+    def _execute(self, func: Step) -> tuple[Any, bool]:
+        """Run or replay a step, returning its output and whether it was replayed."""
+        self.outputs[func] = None
+        memoize = getattr(func, 'memoize', False) and self.memo_size > 0
+        if memoize:
+            if self.position_key is None:
+                self.position_key = chess.polyglot.zobrist_hash(self.board)
+            with self.memo_lock:
+                entry = self.memo.get(self.position_key, {}).get(func)
+            if entry is not None:
+                # Replay what the step read too, so the call sets the same keys as a real run
+                for key in getattr(func, 'consumes', ()):
+                    self[key]
+                writes, out = entry
+                for key, value in writes.items():
+                    self[key] = value
+                self.outputs[func] = out
+                return out, True
+        
+        for key in getattr(func, 'consumes', ()):
+            self[key]
+        
+        self.writes.append({})
+        try:
+            out = func(self)
+        finally:
+            writes = self.writes.pop()
+        
+        if memoize and not inspect.isawaitable(out):
+            with self.memo_lock:
+                steps = self.memo.setdefault(self.position_key, {})
+                steps[func] = (writes, out)
+                self.memo.move_to_end(self.position_key)
+                while len(self.memo) > self.memo_size:
+                    self.memo.popitem(last=False)
+        self.outputs[func] = out
+        return out, False
+    
+    def compute(self, board: Optional[chess.Board], *keys: str) -> dict[str, Any]:
+        """Get some keys for a board, running only the steps they depend on."""
+        run = self.bind(board)
+        return {key: run[key] for key in keys}
+    
+    def run(self, board: Optional[chess.Board]) -> Union[Record, dict[str, Any]]:
+        """Run the pipeline and return everything it set (a Record in records mode)."""
+        run = self.bind(board)
+        run._run_pipeline()
+        return run.context
+    
+    def new_game(self):
+        """Forget the memo and the engine's state from earlier games (see Engine.new_game)."""
+        self.clear_memo()
+        if isinstance(self.engine, Engine):
+            self.engine.new_game()
+    
+    def close(self):
+        """Close the pipeline's engine (see Engine.close); a UCI engine restarts if used again."""
+        if isinstance(self.engine, Engine):
+            self.engine.close()
+    
+    def clear_memo(self):
+        """Forget memoized step results, e.g. after changing the engine's settings."""
+        with self.memo_lock:
+            self.memo.clear()
+    
     def __call__(self, board: Optional[chess.Board]) -> Any:
-        self.reset(board)
+        """Run the pipeline and return its last step's output.
+        
+        Undeclared steps and steps producing nothing run in order; declared
+        steps only run when the keys they produce are read.
+        """
+        return self.bind(board)._run_pipeline()
+    
+    def _run_pipeline(self) -> Any:
         out = None
-        for func in self.pipeline:
-            out = func(self)
+        for i, func in enumerate(self.pipeline):
+            if func in self.outputs:
+                out = self.outputs[func]
+            elif self.is_lazy(func) and i < len(self.pipeline) - 1:
+                continue
+            else:
+                out = self.run_step(func)
         return out
 
+    async def acall(self, board: Optional[chess.Board]) -> Any:
+        """Run the pipeline, awaiting steps that return awaitables.
+        
+        Use with an AsyncEngine. Each call has its own board and results,
+        but concurrent calls still each need their own engine. Steps cannot
+        be awaited from inside another step, so every step runs in order
+        and nothing is memoized.
+        """
+        run = self.bind(board)
+        run.lazy = False
+        out = None
+        for func in run.pipeline:
+            run.outputs[func] = None
+            start = time.perf_counter()
+            out = func(run)
+            if inspect.isawaitable(out):
+                out = await out
+            run.outputs[func] = out
+            if run.profiler is not None:
+                run.profiler.record_step(getattr(func, '__name__', repr(func)), time.perf_counter() - start)
+        return out
+
+    def map(
+        self,
+        boards: Iterable[chess.Board],
+        workers: Optional[int] = None,
+        chunksize: int = 16,
+        ordered: bool = True
+    ) -> Iterator[Any]:
+        """Run the pipeline over many boards in a process pool.
+        
+        Each worker process unpickles this pipeline and its engine (engines
+        pickle by configuration, so every worker starts its own) and joins
+        them with copy_with_engine. Boards are read and submitted lazily, at
+        most two chunks per worker at a time, so any iterable can be used.
+        
+        Args:
+            boards: Boards to analyse
+            workers: Number of processes, defaults to the CPU count; 0 runs
+                in this process
+            chunksize: Boards sent to a worker at once
+            ordered: Yield outputs in input order; otherwise yield
+                (index, output) pairs as chunks finish
+        
+        Yields:
+            The pipeline's output for every board (see ordered)
+        """
+        chunks = _chunks(enumerate(boards), chunksize)
+        if workers == 0:
+            for chunk in chunks:
+                for i, board in chunk:
+                    yield self(board) if ordered else (i, self(board))
+            return
+        
+        workers = workers or os.cpu_count() or 1
+        executor = ProcessPoolExecutor(
+            workers,
+            initializer=_init_worker,
+            initargs=(pickle.dumps((self, self.engine)),)
+        )
+        try:
+            if ordered:
+                queue = deque()
+                for chunk in chunks:
+                    queue.append(executor.submit(_map_chunk, chunk))
+                    if len(queue) >= 2 * workers:
+                        for _, out in queue.popleft().result():
+                            yield out
+                while queue:
+                    for _, out in queue.popleft().result():
+                        yield out
+            else:
+                pending = set()
+                for chunk in chunks:
+                    pending.add(executor.submit(_map_chunk, chunk))
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield from future.result()
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
     def copy(self) -> 'Analysis':
         return self.copy_with_engine(self.engine)
 
-    def copy_with_engine(self, engine: Engine) -> 'Analysis':
-        new_analysis = Analysis(engine)
+    def copy_with_engine(self, engine: Union[Engine, AsyncEngine]) -> 'Analysis':
+        new_analysis = Analysis(engine, self.memo_size, self.records)
         new_analysis.pipeline = self.pipeline.copy()
         new_analysis.persist = self.persist.copy()
-        new_analysis.context = self.context.copy()
+        new_analysis.profiler = self.profiler
+        new_analysis.index = self.index
+        new_analysis._ensure_index()
+        new_analysis.reset()
         return new_analysis
+
+
+# Pipeline of the current Analysis.map worker process
+_worker_analysis: Optional[Analysis] = None
+
+
+def _init_worker(payload: bytes):
+    global _worker_analysis
+    analysis, engine = pickle.loads(payload)
+    _worker_analysis = analysis.copy_with_engine(engine)
+
+
+def _map_chunk(chunk: list[tuple[int, chess.Board]]) -> list[tuple[int, Any]]:
+    return [(i, _worker_analysis(board)) for i, board in chunk]
+
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
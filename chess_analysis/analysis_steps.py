@@ -1,15 +1,16 @@
+import inspect
 import random
-from typing import Optional, TYPE_CHECKING
+import time
+from typing import Any, Awaitable, Optional, TYPE_CHECKING
 import chess
+from .analysis import step
 if TYPE_CHECKING:
     from .analysis import Analysis
 
+@step(produces=['eval', 'best_move', 'mate_in'], consumes=['probe', 'limit'])
 def evaluate_board(analysis: 'Analysis') -> tuple[float, Optional[chess.Move], Optional[int]]:
     board = analysis.board
     engine = analysis.engine
-    
-    move = None
-    mate_in = None
 
     if board.is_game_over():
         result = board.result()
@@ -19,27 +20,72 @@ def evaluate_board(analysis: 'Analysis') -> tuple[float, Optional[chess.Move], O
             eval = float('-inf')
         else:
             eval = 0
+        return store_evaluation(analysis, eval, None, None)
     
-    else:
-        engine.set_board(board)
-        raw_eval = engine.get_evaluation()
-        best_move_uci = engine.get_best_move()
+    probed = analysis['probe']
+    if probed is not None and probed['score'] is not None:
+        return store_engine_result(analysis, board, probed)
+    
+    start = time.perf_counter()
+    result = engine.analyse(board, limit=analysis['limit'])
+    if inspect.isawaitable(result):
+        # AsyncEngine: Analysis.acall awaits the rest of this step
+        return _store_engine_result_async(analysis, board, result, start)
+    if analysis.profiler is not None:
+        # Cache hits (see CachedEngine) are reported apart from searches
+        analysis.profiler.record_engine_call(engine.name, time.perf_counter() - start, getattr(engine, 'last_hit', False))
+    return store_engine_result(analysis, board, result)
 
-        if raw_eval['type'] == 'cp':
-            eval = raw_eval['value'] / 100.0
-        else:
-            mate_in = abs(raw_eval['value'])
-            eval = float('inf') if raw_eval['value'] > 0 else float('-inf')
+def store_engine_result(analysis: 'Analysis', board: chess.Board, result: dict[str, Any]) -> tuple[float, Optional[chess.Move], Optional[int]]:
+    raw_eval = result['score']
+    best_move_uci = result['best_move']
+    
+    move = None
+    mate_in = None
 
-        if best_move_uci:
-            move = board.parse_uci(best_move_uci)
+    if raw_eval['type'] == 'cp':
+        eval = raw_eval['value'] / 100.0
+    else:
+        mate_in = result['mate_in']
+        eval = float('inf') if raw_eval['value'] > 0 else float('-inf')
+
+    if best_move_uci:
+        move = board.parse_uci(best_move_uci)
     
+    return store_evaluation(analysis, eval, move, mate_in)
+
+async def _store_engine_result_async(analysis: 'Analysis', board: chess.Board, result: Awaitable[dict[str, Any]], start: float):
+    result = await result
+    if analysis.profiler is not None:
+        analysis.profiler.record_engine_call(analysis.engine.name, time.perf_counter() - start)
+    return store_engine_result(analysis, board, result)
+
+def store_evaluation(analysis: 'Analysis', eval: float, move: Optional[chess.Move], mate_in: Optional[int]) -> tuple[float, Optional[chess.Move], Optional[int]]:
     analysis['eval'] = eval
     analysis['best_move'] = move
     analysis['mate_in'] = mate_in
 
     return eval, move, mate_in
 
+@step(produces=['probe'], consumes=['prober'])
+def probe_board(analysis: 'Analysis') -> Optional[dict[str, Any]]:
+    """Look the position up in analysis['prober'] (a probe.Prober), if set.
+    
+    A hit is stored as analysis['probe']. evaluate_board uses a tablebase
+    hit instead of searching the position; a book hit has no score, so it is
+    only used by book_move.
+    """
+    board = analysis.board
+    prober = analysis['prober']
+    
+    result = None
+    if prober is not None and not board.is_game_over():
+        result = prober.probe(board)
+    
+    analysis['probe'] = result
+    return result
+
+@step(produces=['move', 'result'], consumes=['eval', 'best_move', 'mate_in'])
 def process_eval(analysis: 'Analysis'):
     eval = analysis['eval']
     move = analysis['best_move']
@@ -57,6 +103,23 @@ def process_eval(analysis: 'Analysis'):
     analysis['result'] = result
     return move, result
 
+@step(produces=['move'], consumes=['probe'])
+def book_move(analysis: 'Analysis') -> Optional[chess.Move]:
+    """Play the heaviest book move in book positions, otherwise analysis['best_move'].
+    
+    Placed after the evaluation steps, a player only searches positions
+    its book does not cover.
+    """
+    probed = analysis['probe']
+    if probed is not None and probed.get('source') == 'book':
+        move = analysis.board.parse_uci(probed['best_move'])
+    else:
+        move = analysis['best_move']
+    
+    analysis['move'] = move
+    return move
+
+@step(produces=['move'], memoize=False)
 def random_move(analysis: 'Analysis') -> Optional[chess.Move]:
     board = analysis.board
     
@@ -66,9 +129,11 @@ def random_move(analysis: 'Analysis') -> Optional[chess.Move]:
     analysis['move'] = move
     return move
 
+@step(consumes=['move'], memoize=False)
 def extract_move(analysis: 'Analysis') -> Optional[chess.Move]:
     return analysis['move']
 
+@step(produces=['move'], memoize=False)
 def human_move(analysis: 'Analysis') -> Optional[chess.Move]:
     board = analysis.board
     
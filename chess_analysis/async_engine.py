@@ -0,0 +1,248 @@
+import asyncio
+import os
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+import chess
+from chess.engine import Limit
+from .engine import Engine, go_command
+from .uci import InfoCallback, SearchOutput, position_command
+
+
+class AsyncEngine(ABC):
+    """Abstract base class for engines driven from an asyncio event loop."""
+
+    name: str = 'engine'
+
+    @abstractmethod
+    async def analyse(self, board: chess.Board, multipv: int = 1, limit: Optional[Limit] = None) -> Dict[str, Any]:
+        """Evaluate a position and find its best move with a single search.
+
+        Cancelling the awaiting task stops the search.
+
+        Args:
+            board: The position to analyse, not modified while awaiting
+            multipv: Number of principal variations to report
+            limit: Search budget, defaults to the engine's configured depth
+
+        Returns:
+            Same dict as Engine.analyse
+        """
+        pass
+
+    async def stop(self) -> None:
+        """Ask a running search to finish early."""
+        pass
+
+    async def quit(self) -> None:
+        """Release the engine's resources."""
+        pass
+
+
+class AsyncUCIEngine(AsyncEngine):
+    """UCI engine subprocess driven with asyncio pipes.
+
+    Create instances with `await AsyncUCIEngine.popen(...)`. One search runs
+    at a time per process; use one engine per concurrent game or analysis.
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process, path: str, depth: int, on_info: Optional[InfoCallback] = None):
+        self.process = process
+        self.path = path
+        self.depth = depth
+        self.name = os.path.basename(path)
+        self.callbacks: List[InfoCallback] = [on_info] if on_info else []
+        self.engine_id: Dict[str, str] = {}
+        self.multipv = 1
+        self.position = None
+        self.lock = asyncio.Lock()
+
+    @classmethod
+    async def popen(
+        cls,
+        path: str = "stockfish",
+        depth: int = 15,
+        options: Optional[Dict[str, Any]] = None,
+        on_info: Optional[InfoCallback] = None
+    ) -> 'AsyncUCIEngine':
+        """Start an engine process and run the UCI handshake.
+
+        Args:
+            path: Path to the UCI executable
+            depth: Search depth when no limit is given
+            options: UCI options to set, e.g. {'Threads': 1, 'Hash': 64}
+            on_info: Callback receiving every parsed 'info' line
+        """
+        process = await asyncio.create_subprocess_exec(
+            path,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        engine = cls(process, path, depth, on_info)
+
+        await engine.send("uci")
+        while True:
+            line = await engine.read_line()
+            if line == "uciok":
+                break
+            tokens = line.split()
+            if line.startswith("id ") and len(tokens) > 2:
+                engine.engine_id[tokens[1]] = " ".join(tokens[2:])
+
+        for name, value in (options or {}).items():
+            await engine.setoption(name, value)
+        await engine.ucinewgame()
+        return engine
+
+    async def send(self, command: str) -> None:
+        """Send a single command line to the engine."""
+        if self.process.stdin is None:
+            raise BrokenPipeError()
+        self.process.stdin.write(f"{command}\n".encode())
+        await self.process.stdin.drain()
+
+    async def read_line(self) -> str:
+        """Read one line of engine output."""
+        if self.process.stdout is None:
+            raise BrokenPipeError()
+        line = await self.process.stdout.readline()
+        if not line:
+            raise EOFError(f"UCI engine {self.path} exited (code {self.process.returncode})")
+        return line.decode().strip()
+
+    async def isready(self) -> None:
+        """Wait until the engine has processed every command sent so far."""
+        await self.send("isready")
+        while await self.read_line() != "readyok":
+            pass
+
+    async def setoption(self, name: str, value: Any) -> None:
+        """Set a UCI option."""
+        if isinstance(value, bool):
+            value = str(value).lower()
+        await self.send(f"setoption name {name} value {value}")
+        await self.isready()
+
+    async def ucinewgame(self) -> None:
+        """Tell the engine the next position is from a different game."""
+        await self.send("ucinewgame")
+        self.position = None
+        await self.isready()
+
+    async def analyse(self, board: chess.Board, multipv: int = 1, limit: Optional[Limit] = None) -> Dict[str, Any]:
+        """Evaluate a position and find its best move with a single search.
+
+        If the awaiting task is cancelled (e.g. by asyncio.wait_for timing
+        out), the engine is told to stop and its output is drained so the
+        process can be used again.
+
+        Args:
+            board: The position to analyse, not modified while awaiting
+            multipv: Number of principal variations to report
+            limit: Search budget, defaults to the configured depth
+
+        Returns:
+            Same dict as UCIEngine.analyse
+        """
+        if limit is None:
+            limit = Limit(depth=self.depth)
+
+        async with self.lock:
+            if multipv != self.multipv:
+                await self.setoption("MultiPV", multipv)
+                self.multipv = multipv
+
+            position = position_command(board)
+            if position != self.position:
+                await self.send(position)
+                self.position = position
+            await self.send(go_command(board, limit, self.depth))
+
+            output = SearchOutput(board, self.callbacks)
+            try:
+                while not output.feed(await self.read_line()):
+                    pass
+            except asyncio.CancelledError:
+                await self.send("stop")
+                while not (await self.read_line()).startswith("bestmove"):
+                    pass
+                raise
+            return output.result()
+
+    async def stop(self) -> None:
+        """Ask a running search to finish early."""
+        await self.send("stop")
+
+    async def quit(self) -> None:
+        """Shut the engine process down."""
+        if self.process.returncode is None:
+            try:
+                await self.send("quit")
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except (BrokenPipeError, ConnectionResetError, asyncio.TimeoutError):
+                self.process.kill()
+
+
+# One lock per synchronous engine, shared by every ThreadedEngine around it
+_engine_locks: 'weakref.WeakKeyDictionary[Engine, threading.Lock]' = weakref.WeakKeyDictionary()
+
+
+class ThreadedEngine(AsyncEngine):
+    """Runs a synchronous Engine in a worker thread, e.g. CustomModelEngine.
+
+    Several ThreadedEngines may wrap the same engine (e.g. a player in
+    concurrent games); its searches then run one at a time.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.name = engine.name
+        self.depth = getattr(engine, 'depth', 0)
+        self.lock = asyncio.Lock()
+        self.engine_lock = _engine_locks.setdefault(engine, threading.Lock())
+        # Whether the worker thread is searching with self.engine, so stop() only stops our search
+        self.searching = False
+
+    def _analyse(self, board: chess.Board, multipv: int, limit: Optional[Limit], cancelled: threading.Event) -> Optional[Dict[str, Any]]:
+        with self.engine_lock:
+            if cancelled.is_set():
+                return None
+            self.searching = True
+            try:
+                return self.engine.analyse(board, multipv, limit)
+            finally:
+                self.searching = False
+
+    async def analyse(self, board: chess.Board, multipv: int = 1, limit: Optional[Limit] = None) -> Dict[str, Any]:
+        """Evaluate a copy of a position in a worker thread; cancelling stops the search.
+
+        Args:
+            board: The position to analyse, not modified while awaiting
+            multipv: Number of principal variations to report
+            limit: Search budget passed on to the engine
+
+        Returns:
+            Same dict as Engine.analyse
+        """
+        async with self.lock:
+            # The engine may push and pop moves on the board it is given
+            cancelled = threading.Event()
+            task = asyncio.ensure_future(asyncio.to_thread(self._analyse, board.copy(), multipv, limit, cancelled))
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                cancelled.set()
+                await self.stop()
+                await asyncio.gather(task, return_exceptions=True)
+                raise
+
+    async def stop(self) -> None:
+        """Ask a running search to finish early."""
+        if self.searching:
+            self.engine.stop()
+
+    async def quit(self) -> None:
+        """Close the wrapped engine."""
+        self.engine.close()
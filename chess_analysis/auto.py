@@ -1,88 +1,318 @@
+import asyncio
+import time
 import chess
+from .adjudication import Adjudication, Adjudicator
 from .analysis import Analysis
+from .async_engine import AsyncEngine, AsyncUCIEngine, ThreadedEngine
+from .cache import CachedEngine, EvaluationCache
+from .engine import Engine
 from .util import display_board, export_game, save_position_history
-from .position_analysis import position_analysis
-from typing import Callable, Optional
+from .features import FeatureAccumulator
+from .history import PositionHistory
+from .position_analysis import position_analysis, incremental_position_analysis
+from typing import AsyncIterator, Callable, Iterator, Optional
 
 
-def setup_game(players: tuple[Analysis, Analysis], initial_moves: list[str]):
+def share_evaluations(
+    players: tuple[Analysis, Analysis],
+    annotator: Analysis,
+    cache: Optional[EvaluationCache] = None
+) -> tuple[tuple[Analysis, Analysis], Analysis]:
+    """
+    Make the players and annotator reuse each other's searches within a game.
+    
+    Each pipeline is copied around a CachedEngine sharing one cache, so a
+    position the annotator searched is not searched again by the player
+    about to move.
+    
+    Args:
+        players (list): List of two player pipelines [white_player, black_player]
+        annotator (Analysis): Pipeline analysing positions
+        cache (EvaluationCache): Cache to share, a new one by default
+    
+    Returns:
+        tuple: (players, annotator) using the shared cache
+    """
+    if cache is None:
+        cache = EvaluationCache()
+    
+    def shared(pipeline: Analysis) -> Analysis:
+        if not isinstance(pipeline.engine, Engine):
+            return pipeline
+        return pipeline.copy_with_engine(CachedEngine(pipeline.engine, cache))
+    
+    return (shared(players[0]), shared(players[1])), shared(annotator)
+
+
+class Ply:
+    """One move of a game, as yielded by iter_game.
+    
+    Attributes:
+        number (int): Ply number, 1 for the first move played
+        move (chess.Move): The move
+        san (str): The move in SAN notation
+        player (str): Name of the player who made it
+        board (chess.Board): The game's board, after the move (it keeps
+            changing, copy it to keep the position)
+        analysis: The annotator's results for the new position (only valid
+            until the next ply unless the annotator uses records=True)
+        eval (float): The annotator's evaluation in pawns, None if it has none
+        move_time (float): Seconds the player took to choose the move
+        analysis_time (float): Seconds the annotator took
+    """
+    __slots__ = ('number', 'move', 'san', 'player', 'board', 'analysis', 'eval', 'move_time', 'analysis_time')
+    
+    def __init__(self, number, move, san, player, board, analysis, eval, move_time, analysis_time):
+        self.number = number
+        self.move = move
+        self.san = san
+        self.player = player
+        self.board = board
+        self.analysis = analysis
+        self.eval = eval
+        self.move_time = move_time
+        self.analysis_time = analysis_time
+    
+    def __repr__(self) -> str:
+        return f"Ply({self.number}, {self.san!r}, eval={self.eval})"
+
+
+def annotator_eval(annotator: Analysis, analysis) -> Optional[float]:
+    """Get the eval from an annotator's output, None if it does not evaluate.
+    
+    position_summary leaves level (0.0) evaluations out, so a missing eval
+    from an annotator with an eval step means 0.
+    """
+    eval = analysis.get('eval')
+    if eval is None and 'eval' in annotator.producers():
+        return 0.0
+    return eval
+
+
+def iter_game(
+    board: chess.Board,
+    players: tuple[Analysis, Analysis],
+    annotator: Optional[Analysis] = None,
+    accumulator: Optional[FeatureAccumulator] = None
+) -> Iterator[Ply]:
+    """
+    Play a game move by move, yielding a Ply after each one is analysed.
+    
+    Nothing is kept between plies, and the next move is only searched once
+    the consumer asks for it, so stopping early (break, close()) stops the
+    game. The board is modified in place.
+    
+    Args:
+        board (chess.Board): The chess board to play on
+        players (list): List of two player pipelines [white_player, black_player]
+        annotator (Analysis): Pipeline analysing positions, defaults to
+            position_analysis (incremental_position_analysis with an accumulator)
+        accumulator (FeatureAccumulator): If given, moves are pushed through it
+            and positions are featurized incrementally
+    
+    Yields:
+        Ply: The move made and the analysis of the resulting position
+    """
+    if annotator is None:
+        annotator = position_analysis if accumulator is None else incremental_position_analysis
+    if accumulator is not None:
+        annotator = annotator.with_settings(accumulator=accumulator)
+    
+    number = 0
+    while not board.is_game_over():
+        player = players[1 - board.turn]
+        start = time.perf_counter()
+        move = player(board)
+        move_time = time.perf_counter() - start
+        san = board.san(move)
+        if accumulator is not None:
+            accumulator.push(board, move)
+        else:
+            board.push(move)
+        
+        start = time.perf_counter()
+        analysis = annotator(board)
+        number += 1
+        yield Ply(number, move, san, player['name'], board, analysis, annotator_eval(annotator, analysis), move_time, time.perf_counter() - start)
+
+
+async def game_annotator() -> Analysis:
+    """
+    Copy position_analysis around a new AsyncUCIEngine for one game.
+    
+    The engine is started with the path and depth of position_analysis's
+    engine; call quit() on it once the game is over.
+    """
+    engine = position_analysis.engine
+    async_engine = await AsyncUCIEngine.popen(getattr(engine, 'path', "stockfish"), getattr(engine, 'depth', 15))
+    return position_analysis.copy_with_engine(async_engine)
+
+
+def check_async_annotator(annotator: Analysis) -> None:
+    """Reject annotators whose engine would block the event loop."""
+    if not isinstance(annotator.engine, AsyncEngine):
+        raise TypeError(
+            "The annotator of an asynchronous game needs an AsyncEngine "
+            "(e.g. AsyncUCIEngine, or ThreadedEngine around a synchronous one)"
+        )
+
+
+def threaded_player(player: Analysis) -> Analysis:
+    """Copy a player around a ThreadedEngine if its engine is synchronous, so it does not block the event loop."""
+    if isinstance(player.engine, Engine):
+        return player.copy_with_engine(ThreadedEngine(player.engine))
+    return player
+
+
+async def aiter_game(
+    board: chess.Board,
+    players: tuple[Analysis, Analysis],
+    annotator: Optional[Analysis] = None,
+    move_timeout: Optional[float] = None
+) -> AsyncIterator[Ply]:
+    """
+    Asynchronous version of iter_game, running the pipelines with acall.
+    
+    Players on a synchronous Engine search in a worker thread (see
+    threaded_player), one search at a time per engine.
+    
+    Args:
+        board (chess.Board): The chess board to play on
+        players (list): List of two player pipelines [white_player, black_player]
+        annotator (Analysis): Pipeline run after every move, on an AsyncEngine;
+            defaults to a game_annotator quit when the game ends
+        move_timeout (float): Seconds allowed per move; raises asyncio.TimeoutError
+    
+    Yields:
+        Ply: The move made and the analysis of the resulting position
+    """
+    owned = annotator is None
+    if owned:
+        annotator = await game_annotator()
+    check_async_annotator(annotator)
+    players = (threaded_player(players[0]), threaded_player(players[1]))
+    
+    try:
+        number = 0
+        while not board.is_game_over():
+            player = players[1 - board.turn]
+            start = time.perf_counter()
+            move = await asyncio.wait_for(player.acall(board), move_timeout)
+            move_time = time.perf_counter() - start
+            san = board.san(move)
+            board.push(move)
+            
+            start = time.perf_counter()
+            analysis = await annotator.acall(board)
+            number += 1
+            yield Ply(number, move, san, player['name'], board, analysis, annotator_eval(annotator, analysis), move_time, time.perf_counter() - start)
+    finally:
+        if owned:
+            await annotator.engine.quit()
+
+
+def setup_game(
+    players: tuple[Analysis, Analysis],
+    initial_moves: list[str],
+    annotator: Optional[Analysis] = None
+):
     """
     Set up a new chess game with optional initial moves and players.
     
     Args:
         players (list): List of two player functions [white_player, black_player]
         initial_moves (list): List of moves in SAN notation
+        annotator (Analysis): Pipeline analysing positions, defaults to position_analysis
 
     Returns:
-        tuple: (board, players, position_history)
+        tuple: (board, players, position_history), the history a PositionHistory
     """
+    if annotator is None:
+        annotator = position_analysis
     
     board = chess.Board()
     for move in initial_moves:
         board.push_san(move)
     
-    position_history = []
-    initial_position = position_analysis(board)
-    position_history.append({
-        'move_number': 0,
-        'fen': board.fen(),
-        'last_move': None,
-        'analysis': initial_position.copy()
-    })
+    position_history = PositionHistory(board)
+    position_history.append(None, annotator(board))
     
     return board, players, position_history
 
 
-def play_game(board, players, position_history, is_closed: Optional[Callable]=None):
+def play_game(
+    board,
+    players,
+    position_history,
+    is_closed: Optional[Callable]=None,
+    accumulator: Optional[FeatureAccumulator]=None,
+    annotator: Optional[Analysis]=None,
+    adjudicator: Optional[Adjudicator]=None
+) -> Optional[Adjudication]:
     """
-    Play the chess game until completion or display is closed.
+    Play the chess game until completion, adjudication or display is closed.
     
     Args:
         board (chess.Board): The chess board
         players (list): List of player functions
-        position_history (list): List to store position history
+        position_history (PositionHistory): History to append positions to
+        accumulator (FeatureAccumulator): If given, moves are pushed through it
+            and positions are featurized incrementally
+        annotator (Analysis): Pipeline analysing positions, defaults to
+            position_analysis (incremental_position_analysis with an accumulator)
+        adjudicator (Adjudicator): Ends the game early once its result is
+            decided; reset before the game starts
     
     Returns:
-        None: Modifies board and position_history in place
+        Adjudication: The adjudicated result, None if the game was not
+            adjudicated. Modifies board and position_history in place
     """
-    while (not (board.is_game_over()) and (is_closed is None or not is_closed())):
-        player = players[1 - board.turn]
-        move = player(board)
-        move_san = board.san(move)
-        if is_closed: print(f'{player["name"]} - {move_san}')
-        board.push(move)
-        if is_closed: display_board(board, move, pov=chess.WHITE)
-
-        position = position_analysis(board)
-        position_history.append({
-            'move_number': len(position_history),
-            'fen': board.fen(),
-            'last_move': move_san,
-            'analysis': position.copy()
-        })
+    if adjudicator is not None:
+        adjudicator.reset()
+    if is_closed is not None and is_closed():
+        return None
+    
+    for ply in iter_game(board, players, annotator, accumulator):
+        if is_closed:
+            print(f'{ply.player} - {ply.san}')
+            display_board(board, ply.move, pov=chess.WHITE)
+        position_history.append(ply.move, ply.analysis)
+        if adjudicator is not None and adjudicator.adjudicate(ply) is not None:
+            if is_closed: print(f'Adjudicated {adjudicator.adjudication.result} ({adjudicator.adjudication.reason})')
+            return adjudicator.adjudication
+        if is_closed is not None and is_closed():
+            break
+    return None
 
 
-def finalize_game(board, players, position_history):
+def finalize_game(board, players, position_history, adjudication: Optional[Adjudication]=None):
     """
     Finalize the game by cleaning up display and saving data.
     
     Args:
         board (chess.Board): The chess board
         players (list): List of player functions
-        position_history (list): Position history data
+        position_history (PositionHistory): Position history data
+        adjudication (Adjudication): Result to record in the PGN if the game
+            was adjudicated
     """
     from .display import finish_display, plot_position_history
     
     finish_display()
     save_position_history(position_history)
     plot_position_history(position_history)
-    export_game(board, players)
+    export_game(board, players, adjudication)
 
 
 def run_auto_game(
     players: tuple[Analysis, Analysis],
     initial_moves: list[str] = [],
-    bare=False
+    bare=False,
+    incremental=False,
+    annotator: Optional[Analysis] = None,
+    shared_cache: bool = False,
+    adjudicator: Optional[Adjudicator] = None,
+    cache: Optional[EvaluationCache] = None
 ):
     """
     Run a complete automated chess game.
@@ -90,13 +320,101 @@ def run_auto_game(
     Args:
         players (list): List of two player functions [white_player, black_player]
         initial_moves (list): List of moves in SAN notation
+        incremental (bool): Update position features incrementally after each move
+        annotator (Analysis): Pipeline analysing positions, defaults to position_analysis
+        shared_cache (bool): Share engine results between the players and annotator
+            for this game (see share_evaluations)
+        adjudicator (Adjudicator): Ends the game early once its result is decided
+        cache (EvaluationCache): Cache to share instead of a new one per game, e.g.
+            a PositionStore kept across games (implies shared_cache)
+    
+    Unless bare, the engines of the players and annotator are closed when the
+    game ends (UCI engines restart if used again).
+    
+    Returns:
+        tuple: (board, position_history); the history's result and termination are
+            set, and its adjudication unless the game ended on the board
     """
     is_closed = None
     if not bare:
         from .display import is_closed
     
-    board, players, position_history = setup_game(players, initial_moves)
-    play_game(board, players, position_history, is_closed=is_closed)
-    if not bare: finalize_game(board, players, position_history)
+    if shared_cache or cache is not None:
+        if annotator is None:
+            annotator = incremental_position_analysis if incremental else position_analysis
+        players, annotator = share_evaluations(players, annotator, cache)
+    
+    try:
+        board, players, position_history = setup_game(players, initial_moves, annotator)
+        accumulator = FeatureAccumulator(board, max_undo=0) if incremental else None
+        adjudication = play_game(
+            board, players, position_history,
+            is_closed=is_closed, accumulator=accumulator, annotator=annotator, adjudicator=adjudicator
+        )
+        position_history.finish(board, adjudication)
+        if not bare: finalize_game(board, players, position_history, adjudication)
+    finally:
+        if not bare:
+            for pipeline in (*players, annotator or position_analysis):
+                pipeline.close()
+    
+    return board, position_history
+
+
+async def run_auto_game_async(
+    players: tuple[Analysis, Analysis],
+    initial_moves: list[str] = [],
+    annotator: Optional[Analysis] = None,
+    move_timeout: Optional[float] = None,
+    adjudicator: Optional[Adjudicator] = None
+):
+    """
+    Run a complete automated chess game on an asyncio event loop.
+    
+    Many games can run concurrently in one process (e.g. with asyncio.gather)
+    as long as each game gets its own annotator, typically a copy made with
+    copy_with_engine around its own AsyncEngine. Players may be shared: a
+    synchronous player engine runs in a worker thread, one search at a time,
+    so give each game its own player engines for the searches to overlap.
+    
+    Args:
+        players (list): List of two player pipelines [white_player, black_player]
+        initial_moves (list): List of moves in SAN notation
+        annotator (Analysis): Pipeline run after every move, on an AsyncEngine;
+            defaults to a game_annotator quit when the game ends
+        move_timeout (float): Seconds allowed per move; raises asyncio.TimeoutError
+        adjudicator (Adjudicator): Ends the game early once its result is decided;
+            give each concurrent game its own
+    
+    Returns:
+        tuple: (board, position_history); the history's result and termination are
+            set, and its adjudication unless the game ended on the board
+    """
+    owned = annotator is None
+    if owned:
+        annotator = await game_annotator()
+    check_async_annotator(annotator)
+    
+    try:
+        board = chess.Board()
+        for move in initial_moves:
+            board.push_san(move)
+        
+        position_history = PositionHistory(board)
+        position_history.append(None, await annotator.acall(board))
+        
+        adjudication = None
+        if adjudicator is not None:
+            adjudicator.reset()
+        async for ply in aiter_game(board, players, annotator, move_timeout):
+            position_history.append(ply.move, ply.analysis)
+            if adjudicator is not None:
+                adjudication = adjudicator.adjudicate(ply)
+                if adjudication is not None:
+                    break
+        position_history.finish(board, adjudication)
+    finally:
+        if owned:
+            await annotator.engine.quit()
     
     return board, position_history
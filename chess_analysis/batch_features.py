@@ -0,0 +1,370 @@
+from typing import Iterable, Optional
+import chess
+import numpy as np
+from chess import WHITE, BLACK
+from .features import (
+    PIECE_VALUES, DEVELOPMENT_WEIGHTS, STARTING_MASKS, STARTING_COUNTS,
+    SUMMARY_FEATURES, castled_flags
+)
+
+# Packed positions are uint64 arrays with one row per position and these columns:
+# a bitboard per (color, piece type), White first, then the position's state.
+# 'castling_rights' holds the rook squares like chess.Board.castling_rights,
+# 'ep_square' a bitboard (0 without one), and 'castled' bit 1 << color for each
+# side that castled, which FENs cannot tell.
+PIECE_COLUMNS: list[tuple[chess.Color, chess.PieceType]] = [
+    (color, piece_type) for color in [WHITE, BLACK] for piece_type in chess.PIECE_TYPES
+]
+PACKED_COLUMNS: list[str] = [
+    f"{chess.COLOR_NAMES[color]}_{chess.PIECE_NAMES[piece_type]}s" for color, piece_type in PIECE_COLUMNS
+] + ['turn', 'castling_rights', 'ep_square', 'halfmove_clock', 'fullmove_number', 'castled']
+
+TURN, CASTLING, EP, HALFMOVE, FULLMOVE, CASTLED = range(len(PIECE_COLUMNS), len(PACKED_COLUMNS))
+
+_FEN_PIECES = {symbol: PIECE_COLUMNS.index((symbol.isupper(), chess.PIECE_SYMBOLS.index(symbol.lower())))
+               for symbol in "PNBRQKpnbrqk"}
+_FEN_CASTLING = {'K': chess.BB_H1, 'Q': chess.BB_A1, 'k': chess.BB_H8, 'q': chess.BB_A8}
+
+_U64 = np.uint64
+_NOT_FILE_A = _U64(~chess.BB_FILE_A & chess.BB_ALL)
+_NOT_FILE_H = _U64(~chess.BB_FILE_H & chess.BB_ALL)
+_NOT_FILES_AB = _U64(~(chess.BB_FILE_A | chess.BB_FILE_B) & chess.BB_ALL)
+_NOT_FILES_GH = _U64(~(chess.BB_FILE_G | chess.BB_FILE_H) & chess.BB_ALL)
+_ALL = _U64(chess.BB_ALL)
+
+# (shift, mask of squares the shifted bits may land on), so nothing wraps around the board
+ORTHOGONAL = [(8, _ALL), (-8, _ALL), (1, _NOT_FILE_A), (-1, _NOT_FILE_H)]
+DIAGONAL = [(9, _NOT_FILE_A), (7, _NOT_FILE_H), (-7, _NOT_FILE_A), (-9, _NOT_FILE_H)]
+KING_STEPS = ORTHOGONAL + DIAGONAL
+KNIGHT_JUMPS = [
+    (17, _NOT_FILE_A), (15, _NOT_FILE_H), (10, _NOT_FILES_AB), (6, _NOT_FILES_GH),
+    (-6, _NOT_FILES_AB), (-10, _NOT_FILES_GH), (-15, _NOT_FILE_A), (-17, _NOT_FILE_H),
+]
+
+
+def board_to_packed(board: chess.Board) -> list[int]:
+    """Get a board's packed row."""
+    castled = castled_flags(board)
+    return [board.pieces_mask(piece_type, color) for color, piece_type in PIECE_COLUMNS] + [
+        int(board.turn),
+        board.castling_rights,
+        chess.BB_SQUARES[board.ep_square] if board.ep_square is not None else 0,
+        board.halfmove_clock,
+        board.fullmove_number,
+        (castled[WHITE] << WHITE) | (castled[BLACK] << BLACK),
+    ]
+
+
+def boards_to_packed(boards: Iterable[chess.Board]) -> np.ndarray:
+    """Pack boards into a (positions, PACKED_COLUMNS) uint64 array."""
+    rows = [board_to_packed(board) for board in boards]
+    return np.array(rows, dtype=np.uint64).reshape(-1, len(PACKED_COLUMNS))
+
+
+def fen_to_packed(fen: str) -> list[int]:
+    """Get a FEN's packed row without building a chess.Board.
+
+    Only standard castling rights (KQkq) are read; nobody counts as castled.
+    """
+    fields = fen.split()
+    row = [0] * len(PACKED_COLUMNS)
+
+    square = chess.A8
+    for symbol in fields[0]:
+        if symbol == '/':
+            square -= 16
+        elif symbol.isdigit():
+            square += int(symbol)
+        else:
+            row[_FEN_PIECES[symbol]] |= chess.BB_SQUARES[square]
+            square += 1
+
+    row[TURN] = int(len(fields) < 2 or fields[1] == 'w')
+    if len(fields) > 2:
+        for symbol in fields[2]:
+            row[CASTLING] |= _FEN_CASTLING.get(symbol, 0)
+    if len(fields) > 3 and fields[3] != '-':
+        row[EP] = chess.BB_SQUARES[chess.parse_square(fields[3])]
+    row[HALFMOVE] = int(fields[4]) if len(fields) > 4 else 0
+    row[FULLMOVE] = int(fields[5]) if len(fields) > 5 else 1
+    return row
+
+
+def fens_to_packed(fens: Iterable[str]) -> np.ndarray:
+    """Pack FENs into a (positions, PACKED_COLUMNS) uint64 array."""
+    rows = [fen_to_packed(fen) for fen in fens]
+    return np.array(rows, dtype=np.uint64).reshape(-1, len(PACKED_COLUMNS))
+
+
+def popcount(bitboards: np.ndarray) -> np.ndarray:
+    """Count the bits of every bitboard in an array."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bitboards).astype(np.int64)
+
+    # SWAR popcount for NumPy < 2.0
+    x = bitboards - ((bitboards >> _U64(1)) & _U64(0x5555555555555555))
+    x = (x & _U64(0x3333333333333333)) + ((x >> _U64(2)) & _U64(0x3333333333333333))
+    x = (x + (x >> _U64(4))) & _U64(0x0F0F0F0F0F0F0F0F)
+    return ((x * _U64(0x0101010101010101)) >> _U64(56)).astype(np.int64)
+
+
+def shift(bitboards: np.ndarray, offset: int, mask: np.uint64) -> np.ndarray:
+    """Move every bit by offset squares, keeping only those landing in mask."""
+    if offset > 0:
+        return (bitboards << _U64(offset)) & mask
+    return (bitboards >> _U64(-offset)) & mask
+
+
+def ray_attacks(sliders: np.ndarray, empty: np.ndarray, offset: int, mask: np.uint64) -> np.ndarray:
+    """Squares the sliders attack in one direction, up to and including blockers.
+
+    Rays of different sliders in the same direction never overlap, so
+    popcounting the result counts every slider's moves separately.
+    """
+    flood = sliders
+    for _ in range(6):
+        flood = flood | (shift(flood, offset, mask) & empty)
+    return shift(flood, offset, mask)
+
+
+def pieces_of(packed: np.ndarray, color: chess.Color) -> dict[chess.PieceType, np.ndarray]:
+    """A color's bitboard of every piece type."""
+    return {piece_type: packed[:, PIECE_COLUMNS.index((color, piece_type))] for piece_type in chess.PIECE_TYPES}
+
+
+def attacked_squares(packed: np.ndarray, color: chess.Color, occupied: np.ndarray) -> np.ndarray:
+    """Union of the squares attacked by a color's pieces."""
+    pieces = pieces_of(packed, color)
+    empty = ~occupied
+    forward = 8 if color == WHITE else -8
+
+    attacks = (shift(pieces[chess.PAWN], forward + 1, _NOT_FILE_A)
+               | shift(pieces[chess.PAWN], forward - 1, _NOT_FILE_H))
+    for offset, mask in KNIGHT_JUMPS:
+        attacks |= shift(pieces[chess.KNIGHT], offset, mask)
+    for offset, mask in KING_STEPS:
+        attacks |= shift(pieces[chess.KING], offset, mask)
+    for offset, mask in ORTHOGONAL:
+        attacks |= ray_attacks(pieces[chess.ROOK] | pieces[chess.QUEEN], empty, offset, mask)
+    for offset, mask in DIAGONAL:
+        attacks |= ray_attacks(pieces[chess.BISHOP] | pieces[chess.QUEEN], empty, offset, mask)
+    return attacks
+
+
+def slider_directions(enemy: dict[chess.PieceType, np.ndarray]) -> list[tuple[int, np.uint64, np.ndarray]]:
+    """(offset, mask, enemy sliders moving that way) for the eight ray directions."""
+    orthogonal = enemy[chess.ROOK] | enemy[chess.QUEEN]
+    diagonal = enemy[chess.BISHOP] | enemy[chess.QUEEN]
+    return ([(offset, mask, orthogonal) for offset, mask in ORTHOGONAL]
+            + [(offset, mask, diagonal) for offset, mask in DIAGONAL])
+
+
+def attackers(king: np.ndarray, color: chess.Color, enemy: dict[chess.PieceType, np.ndarray], empty: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Enemy pieces attacking a color's king, like board.attackers_mask.
+
+    Returns:
+        (attackers, squares from the king up to and including attacking sliders)
+    """
+    forward = 8 if color == WHITE else -8
+    found = ((shift(king, forward + 1, _NOT_FILE_A) | shift(king, forward - 1, _NOT_FILE_H)) & enemy[chess.PAWN])
+    for offset, mask in KNIGHT_JUMPS:
+        found |= shift(king, offset, mask) & enemy[chess.KNIGHT]
+    for offset, mask in KING_STEPS:
+        found |= shift(king, offset, mask) & enemy[chess.KING]
+
+    rays = np.zeros_like(king)
+    for offset, mask, sliders in slider_directions(enemy):
+        ray = ray_attacks(king, empty, offset, mask)
+        checker = ray & sliders
+        found |= checker
+        rays |= np.where(checker != 0, ray, _U64(0))
+    return found, rays
+
+
+def piece_moves(
+    pieces: dict[chess.PieceType, np.ndarray],
+    color: chess.Color,
+    own: np.ndarray,
+    theirs: np.ndarray,
+    targets: np.ndarray
+) -> np.ndarray:
+    """Count the moves of a color's pawns (without en passant), knights, bishops, rooks and queens onto targets."""
+    empty = ~(own | theirs)
+    not_own = ~own & targets
+    count = np.zeros(len(own), dtype=np.int64)
+
+    forward = 8 if color == WHITE else -8
+    double_rank = _U64(chess.BB_RANK_3 if color == WHITE else chess.BB_RANK_6)
+    last_rank = _U64(chess.BB_RANK_8 if color == WHITE else chess.BB_RANK_1)
+    single = shift(pieces[chess.PAWN], forward, _ALL) & empty
+    double = shift(single & double_rank, forward, _ALL) & empty
+    pawn_moves = [single, double,
+                  shift(pieces[chess.PAWN], forward + 1, _NOT_FILE_A) & theirs,
+                  shift(pieces[chess.PAWN], forward - 1, _NOT_FILE_H) & theirs]
+    for moves in pawn_moves:
+        moves &= targets
+        count += popcount(moves & ~last_rank) + 4 * popcount(moves & last_rank)
+
+    for offset, mask in KNIGHT_JUMPS:
+        count += popcount(shift(pieces[chess.KNIGHT], offset, mask) & not_own)
+    for offset, mask in ORTHOGONAL:
+        count += popcount(ray_attacks(pieces[chess.ROOK] | pieces[chess.QUEEN], empty, offset, mask) & not_own)
+    for offset, mask in DIAGONAL:
+        count += popcount(ray_attacks(pieces[chess.BISHOP] | pieces[chess.QUEEN], empty, offset, mask) & not_own)
+    return count
+
+
+def mobility(packed: np.ndarray, color: chess.Color, legal: bool = True) -> np.ndarray:
+    """Move count of a color as if it were that color's turn, like features.count_moves.
+
+    Moves are counted like board.legal_moves (a promotion counts four
+    times). Legal counts keep pinned pieces on their pin line, answer
+    checks and keep kings out of attacked squares; pseudo-legal ones only
+    check castling. En passant only counts for the side to move, and only
+    standard castling is counted.
+    """
+    pieces = pieces_of(packed, color)
+    enemy = pieces_of(packed, not color)
+    own = np.bitwise_or.reduce(packed[:, 0:6] if color == WHITE else packed[:, 6:12], axis=1)
+    theirs = np.bitwise_or.reduce(packed[:, 6:12] if color == WHITE else packed[:, 0:6], axis=1)
+    occupied = own | theirs
+    empty = ~occupied
+    king = pieces[chess.KING]
+    no_pieces = np.zeros(len(packed), dtype=np.uint64)
+
+    # Squares non-king moves may end on (check evasions) and each ray's pinned piece and pin line
+    targets = np.full(len(packed), _ALL)
+    pins: list[tuple[np.ndarray, np.ndarray]] = []
+    if legal:
+        checkers, check_rays = attackers(king, color, enemy, empty)
+        checks = popcount(checkers)
+        targets = np.where(checks == 0, _ALL, np.where(checks == 1, checkers | check_rays, _U64(0)))
+        for offset, mask, sliders in slider_directions(enemy):
+            ray = ray_attacks(king, empty, offset, mask)
+            blocker = ray & own
+            beyond = ray_attacks(blocker, empty, offset, mask)
+            pins.append((np.where((beyond & sliders) != 0, blocker, _U64(0)), ray | beyond))
+
+    pinned = no_pieces
+    for piece, _ in pins:
+        pinned = pinned | piece
+    count = piece_moves({piece_type: bitboard & ~pinned for piece_type, bitboard in pieces.items()},
+                        color, own, theirs, targets)
+    for piece, line in pins:
+        rows = np.flatnonzero(piece)
+        if len(rows):
+            count[rows] += piece_moves({piece_type: bitboard[rows] & piece[rows] for piece_type, bitboard in pieces.items()},
+                                       color, own[rows], theirs[rows], targets[rows] & line[rows])
+
+    # En passant, legal if the king is not attacked once both pawns are gone
+    forward = 8 if color == WHITE else -8
+    ep = np.where(packed[:, TURN] == int(color), packed[:, EP] & empty, _U64(0))
+    captured = shift(ep, -forward, _ALL) & enemy[chess.PAWN]
+    ep = np.where(captured != 0, ep, _U64(0))
+    for offset, mask in [(forward + 1, _NOT_FILE_A), (forward - 1, _NOT_FILE_H)]:
+        mover = shift(ep, -offset, _NOT_FILE_H if mask == _NOT_FILE_A else _NOT_FILE_A) & pieces[chess.PAWN]
+        allowed = mover != 0
+        if legal:
+            after = (occupied & ~mover & ~captured) | ep
+            remaining = {**enemy, chess.PAWN: enemy[chess.PAWN] & ~captured}
+            allowed &= attackers(king, color, remaining, ~after)[0] == 0
+        count += allowed.astype(np.int64)
+
+    # King, which sliders see through when it steps back along their ray
+    attacked = attacked_squares(packed, not color, occupied & ~king)
+    king_targets = ~own & ~attacked if legal else ~own
+    for offset, mask in KING_STEPS:
+        count += popcount(shift(king, offset, mask) & king_targets)
+
+    # Standard castling, which even pseudo-legal moves only include when legal
+    back_rank = 0 if color == WHITE else 56
+    king_home = _U64(chess.BB_SQUARES[chess.E1 + back_rank])
+    rooks = pieces[chess.ROOK] & packed[:, CASTLING]
+    can_castle = ((king & king_home) != 0) & ((attacked & king_home) == 0)
+    for rook_square, between, path in [
+        (chess.H1, chess.BB_F1 | chess.BB_G1, chess.BB_F1 | chess.BB_G1),
+        (chess.A1, chess.BB_B1 | chess.BB_C1 | chess.BB_D1, chess.BB_C1 | chess.BB_D1),
+    ]:
+        rook = _U64(chess.BB_SQUARES[rook_square + back_rank])
+        between = _U64(between << back_rank)
+        path = _U64(path << back_rank)
+        count += (can_castle
+                  & ((rooks & rook) != 0)
+                  & ((occupied & between) == 0)
+                  & ((attacked & path) == 0)).astype(np.int64)
+    return count
+
+
+def lsb_square(bitboards: np.ndarray) -> np.ndarray:
+    """Index of the lowest set bit of every (non-empty) bitboard."""
+    lowest = bitboards & (~bitboards + _U64(1))
+    return popcount(lowest - _U64(1))
+
+
+def furthest_rank(occupied: np.ndarray, color: chess.Color) -> np.ndarray:
+    """Furthest rank reached by a color's pieces, from its own side (0 without pieces)."""
+    furthest = np.zeros(len(occupied), dtype=np.int64)
+    for rank in range(1, 8):
+        rank_mask = _U64(chess.BB_RANKS[rank if color == WHITE else 7 - rank])
+        furthest = np.where((occupied & rank_mask) != 0, rank, furthest)
+    return furthest
+
+
+def featurize_batch(
+    packed: np.ndarray,
+    features: Optional[list[str]] = None,
+    legal: bool = True
+) -> tuple[np.ndarray, list[str]]:
+    """Compute the position_summary features of packed positions at once.
+
+    Every feature matches features.featurize (mobility that of
+    features.mobility_counts with the same legal flag).
+
+    Args:
+        packed: (positions, PACKED_COLUMNS) uint64 array from fens_to_packed
+            or boards_to_packed
+        features: Columns to return, defaults to SUMMARY_FEATURES
+        legal: Count legal moves for mobility, or pseudo-legal ones
+
+    Returns:
+        A (positions, features) float32 array and its column names; king
+        features of positions without that king are NaN
+    """
+    packed = np.asarray(packed, dtype=np.uint64).reshape(-1, len(PACKED_COLUMNS))
+    features = list(features or SUMMARY_FEATURES)
+    columns: dict[str, np.ndarray] = {}
+
+    for color, prefix in [(WHITE, 'white'), (BLACK, 'black')]:
+        counts = {piece_type: popcount(packed[:, PIECE_COLUMNS.index((color, piece_type))])
+                  for piece_type in chess.PIECE_TYPES}
+        columns[f'{prefix}_material'] = sum(counts[piece_type] * value for piece_type, value in PIECE_VALUES.items())
+
+        development = np.zeros(len(packed), dtype=np.float64)
+        for piece_type, weight in DEVELOPMENT_WEIGHTS.items():
+            current = packed[:, PIECE_COLUMNS.index((color, piece_type))]
+            moved = popcount(_U64(STARTING_MASKS[color, piece_type]) & ~current)
+            captured = STARTING_COUNTS[color, piece_type] - counts[piece_type]
+            development += np.where(moved > 0, np.maximum(0, moved - captured), 0) * weight
+        columns[f'{prefix}_development'] = development
+
+        columns[f'{prefix}_mobility'] = mobility(packed, color, legal)
+        columns[f'{prefix}_has_castled'] = (packed[:, CASTLED] >> _U64(int(color))) & _U64(1)
+
+        occupied = np.bitwise_or.reduce(packed[:, 0:6] if color == WHITE else packed[:, 6:12], axis=1)
+        columns[f'{prefix}_furthest_rank'] = furthest_rank(occupied, color)
+
+        kings = packed[:, PIECE_COLUMNS.index((color, chess.KING))]
+        square = lsb_square(kings)
+        rank = square // 8
+        columns[f'{prefix}_king_file'] = np.where(kings != 0, square % 8, np.nan)
+        columns[f'{prefix}_king_rank'] = np.where(kings != 0, rank if color == WHITE else 7 - rank, np.nan)
+
+    for feature in ['material', 'development', 'mobility', 'furthest_rank']:
+        columns[feature] = columns[f'white_{feature}'] - columns[f'black_{feature}']
+    columns['fullmove_number'] = packed[:, FULLMOVE]
+    columns['halfmove_clock'] = packed[:, HALFMOVE]
+
+    result = np.empty((len(packed), len(features)), dtype=np.float32)
+    for i, feature in enumerate(features):
+        result[:, i] = columns[feature]
+    return result, features
@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import chess
+import chess.polyglot
+from chess.engine import Limit
+from .engine import Engine
+
+CacheKey = tuple[str, int]
+
+
+class EvaluationCache:
+    """Bounded LRU cache of Engine.analyse results keyed by Zobrist hash."""
+    
+    def __init__(self, max_size: int = 100_000, path: Optional[str] = None):
+        """Initialize the cache.
+        
+        Args:
+            max_size: Maximum number of positions kept before the least
+                recently used one is evicted
+            path: Optional JSON file to load from, and save to on close()
+        """
+        self.max_size = max_size
+        self.path = path
+        self.entries: OrderedDict[CacheKey, tuple[Dict[str, Any], int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __reduce__(self):
+        # Pickled empty (reloading from path), so each process keeps its own entries
+        return (EvaluationCache, (self.max_size, self.path))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: CacheKey, depth: int, multipv: int = 1) -> Optional[Dict[str, Any]]:
+        """Get a cached result searched at least as deep as requested.
+        
+        Args:
+            key: (engine name, Zobrist hash) of the position
+            depth: Minimum search depth the result must come from
+            multipv: Minimum number of lines the result must hold
+        
+        Returns:
+            The cached analysis result, or None on a miss
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry[0]['depth'] < depth or entry[1] < multipv:
+            self.misses += 1
+            return None
+        
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: CacheKey, result: Dict[str, Any], multipv: int = 1) -> None:
+        """Store a result unless a deeper one is already cached.
+        
+        Args:
+            key: (engine name, Zobrist hash) of the position
+            result: Result returned by Engine.analyse
+            multipv: Number of lines the result was searched with
+        """
+        entry = self.entries.get(key)
+        if entry is not None and (entry[0]['depth'], entry[1]) > (result['depth'], multipv):
+            self.entries.move_to_end(key)
+            return
+        
+        self.entries[key] = (result, multipv)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self.entries),
+        }
+
+    def load(self, path: Optional[str] = None) -> None:
+        """Load entries saved by save(), oldest first."""
+        with open(path or self.path, "r") as f:
+            for name, zobrist, result, multipv in json.load(f):
+                self.put((name, zobrist), result, multipv)
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write all entries to a JSON file, oldest first."""
+        path = path or self.path
+        if path is None:
+            raise ValueError("No path given to save the evaluation cache to")
+        
+        data = [[name, zobrist, result, multipv]
+                for (name, zobrist), (result, multipv) in self.entries.items()]
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    def close(self) -> None:
+        """Save the entries if the cache has a path, so the next run starts warm."""
+        if self.path is not None:
+            self.save()
+
+
+class CachedEngine(Engine):
+    """Engine wrapper that reuses cached analysis of positions it has seen."""
+    
+    def __init__(
+        self,
+        engine: Engine,
+        cache: Optional[EvaluationCache] = None,
+        depth: Optional[int] = None
+    ):
+        """Initialize the cached engine.
+        
+        Args:
+            engine: Engine used on cache misses
+            cache: Cache to use, possibly shared with other engines
+            depth: Minimum depth of reused results, defaults to the engine's depth
+        """
+        self.engine = engine
+        self.cache = cache if cache is not None else EvaluationCache()
+        self.depth = depth if depth is not None else getattr(engine, 'depth', 0)
+        self.name = engine.name
+        self.board = chess.Board()
+        # Whether each thread's last analyse was answered from the cache
+        self.local = threading.local()
+
+    def __reduce__(self):
+        return (CachedEngine, (self.engine, self.cache, self.depth))
+
+    @property
+    def last_hit(self) -> bool:
+        """Whether the last analyse call of this thread was answered from the cache."""
+        return getattr(self.local, 'hit', False)
+
+    def set_board(self, board: chess.Board) -> None:
+        """Set the board."""
+        self.board = board
+
+    def get_evaluation(self) -> Dict[str, Any]:
+        """Get the evaluation of the current position.
+        
+        Returns:
+            Dict with 'type' ('cp' for centipawns, 'mate' for mate) and 'value'
+        """
+        return self.analyse(self.board)['score']
+
+    def get_best_move(self) -> Optional[str]:
+        """Get the best move in UCI format.
+        
+        Returns:
+            UCI move string or None if no move available
+        """
+        return self.analyse(self.board)['best_move']
+
+    def analyse(self, board: chess.Board, multipv: int = 1, limit: Optional[Limit] = None) -> Dict[str, Any]:
+        """Analyse a position, searching only if no deep enough result is cached.
+        
+        Cached results are only reused when the required depth is known: the
+        limit's depth, or the configured depth when no limit is given.
+        
+        Args:
+            board: The position to analyse
+            multipv: Number of principal variations to report
+            limit: Search budget passed on to the engine
+        
+        Returns:
+            Dict with 'score', 'best_move', 'mate_in', 'depth' and 'lines'
+        """
+        key = (self.name, chess.polyglot.zobrist_hash(board))
+        depth = self.depth if limit is None else limit.depth
+        
+        result = None
+        if depth is not None:
+            result = self.cache.get(key, depth, multipv)
+        self.local.hit = result is not None
+        if result is None:
+            result = self.engine.analyse(board, multipv, limit)
+            self.cache.put(key, result, multipv)
+        return result
+
+    def stop(self) -> None:
+        """Ask a running search to finish early."""
+        self.engine.stop()
+
+    def new_game(self) -> None:
+        """Start a new game on the wrapped engine; the cache is kept."""
+        self.engine.new_game()
+
+    def close(self) -> None:
+        """Close the wrapped engine."""
+        self.engine.close()
@@ -0,0 +1,222 @@
+import os
+import shutil
+import time
+from typing import Dict, List, Optional
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs
+import pyarrow.parquet as pq
+from .features import SUMMARY_FEATURES
+from .history import PositionHistory
+
+# Smallest type holding every value of each stored column
+COLUMN_TYPES: Dict[str, pa.DataType] = {
+    'game': pa.int32(),
+    'ply': pa.int16(),
+    'material': pa.int8(),
+    'white_material': pa.int8(),
+    'black_material': pa.int8(),
+    'development': pa.float32(),
+    'white_development': pa.float32(),
+    'black_development': pa.float32(),
+    'mobility': pa.int16(),
+    'white_mobility': pa.int16(),
+    'black_mobility': pa.int16(),
+    'white_has_castled': pa.bool_(),
+    'black_has_castled': pa.bool_(),
+    'fullmove_number': pa.int16(),
+    'halfmove_clock': pa.int16(),
+    'furthest_rank': pa.int8(),
+    'white_furthest_rank': pa.int8(),
+    'black_furthest_rank': pa.int8(),
+    'white_king_file': pa.int8(),
+    'white_king_rank': pa.int8(),
+    'black_king_file': pa.int8(),
+    'black_king_rank': pa.int8(),
+    'eval': pa.float32(),
+    # How the position's game ended (see PositionHistory.finish), null if unknown
+    'result': pa.string(),
+    'termination': pa.string(),
+}
+DATASET_SCHEMA = pa.schema([
+    (name, COLUMN_TYPES[name]) for name in ['game', 'ply'] + SUMMARY_FEATURES + ['eval', 'result', 'termination']
+])
+PARTITION_SCHEMA = pa.schema([('run', pa.string()), ('pairing', pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+
+def features_to_table(
+    features: np.ndarray,
+    evals: np.ndarray,
+    games: np.ndarray,
+    plies: np.ndarray,
+    results: Optional[List[Optional[str]]] = None,
+    terminations: Optional[List[Optional[str]]] = None
+) -> pa.Table:
+    """Build a table with DATASET_SCHEMA, NaNs becoming nulls.
+
+    Args:
+        features: (positions, len(SUMMARY_FEATURES)) array
+        evals: Eval of each position
+        games: Game number of each position
+        plies: Ply of each position within its game
+        results: Result of each position's game, all null by default
+        terminations: Termination of each position's game, all null by default
+    """
+    size = len(games)
+    arrays = [pa.array(np.asarray(games, dtype=np.int32)), pa.array(np.asarray(plies, dtype=np.int16))]
+    for field, values in zip(list(DATASET_SCHEMA)[2:-2], [*np.asarray(features).T, np.asarray(evals)]):
+        missing = np.isnan(values)
+        if pa.types.is_boolean(field.type):
+            array = pa.array(values != 0, mask=missing)
+        elif pa.types.is_integer(field.type):
+            array = pa.array(np.where(missing, 0, values).astype(np.int64), mask=missing).cast(field.type)
+        else:
+            array = pa.array(values.astype(np.float32), mask=missing)
+        arrays.append(array)
+    for values in (results, terminations):
+        arrays.append(pa.array(values, pa.string()) if values is not None else pa.nulls(size, pa.string()))
+    return pa.Table.from_arrays(arrays, schema=DATASET_SCHEMA)
+
+
+def history_to_table(position_history: PositionHistory, game: int = 0) -> pa.Table:
+    """Convert a game's history to a table with DATASET_SCHEMA, missing values as nulls."""
+    size = len(position_history)
+    features = np.column_stack([position_history.column(feature) for feature in SUMMARY_FEATURES])
+    return features_to_table(
+        features, position_history.column('eval'), np.full(size, game), np.arange(size),
+        [position_history.result] * size, [position_history.termination] * size
+    )
+
+
+class DatasetWriter:
+    """Writes games to a Parquet dataset partitioned by run and player pairing.
+
+    Files go to root/run=<run>/pairing=<white>_vs_<black>/part-0.parquet.
+    Games are buffered per pairing and written as row groups of about
+    row_group_size positions, or of row_group_games games. Use as a context
+    manager, or call close(): a file is only readable once closed.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        run: Optional[str] = None,
+        row_group_size: int = 65_536,
+        overwrite: bool = False,
+        row_group_games: Optional[int] = None
+    ):
+        """Open the writer.
+
+        Args:
+            root: Dataset directory
+            run: Name of this run's partition, the current time by default
+            row_group_size: Positions buffered per pairing before writing
+            overwrite: Delete an existing partition of the same run first
+            row_group_games: Games buffered per pairing before writing, however
+                few positions they have; None for no limit
+        """
+        self.root = root
+        self.run = run if run is not None else time.strftime('%Y%m%d-%H%M%S')
+        self.row_group_size = row_group_size
+        self.row_group_games = row_group_games
+        self.run_dir = os.path.join(root, f"run={quote(str(self.run), safe='')}")
+        if overwrite and os.path.exists(self.run_dir):
+            shutil.rmtree(self.run_dir)
+        self.writers: Dict[str, pq.ParquetWriter] = {}
+        self.buffers: Dict[str, List[pa.Table]] = {}
+        self.buffered: Dict[str, int] = {}
+        self.buffered_games: Dict[str, int] = {}
+        self.games = 0
+        self.rows = 0
+
+    def __enter__(self) -> 'DatasetWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write_game(self, white: str, black: str, position_history: PositionHistory) -> None:
+        """Add a game between players named white and black."""
+        pairing = f"{white}_vs_{black}"
+        table = history_to_table(position_history, self.games)
+        self.games += 1
+        self.rows += table.num_rows
+
+        self.buffers.setdefault(pairing, []).append(table)
+        self.buffered[pairing] = self.buffered.get(pairing, 0) + table.num_rows
+        self.buffered_games[pairing] = self.buffered_games.get(pairing, 0) + 1
+        if (self.buffered[pairing] >= self.row_group_size
+                or self.row_group_games is not None and self.buffered_games[pairing] >= self.row_group_games):
+            self._flush(pairing)
+
+    def _flush(self, pairing: str) -> None:
+        if not self.buffers.get(pairing):
+            return
+        writer = self.writers.get(pairing)
+        if writer is None:
+            directory = os.path.join(self.run_dir, f"pairing={quote(pairing, safe='')}")
+            os.makedirs(directory, exist_ok=True)
+            writer = self.writers[pairing] = pq.ParquetWriter(os.path.join(directory, 'part-0.parquet'), DATASET_SCHEMA)
+        writer.write_table(pa.concat_tables(self.buffers[pairing]), row_group_size=self.row_group_size)
+        self.buffers[pairing] = []
+        self.buffered[pairing] = 0
+        self.buffered_games[pairing] = 0
+
+    def flush(self) -> None:
+        """Write every buffered game."""
+        for pairing in list(self.buffers):
+            self._flush(pairing)
+
+    def close(self) -> None:
+        """Write every buffered game and finish the files."""
+        self.flush()
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+
+def open_dataset(root: str, memory_map: bool = True) -> ds.Dataset:
+    """Open a dataset written by DatasetWriter, with 'run' and 'pairing' as columns.
+
+    Files written before a column was added read it as nulls.
+    """
+    filesystem = pyarrow.fs.LocalFileSystem(use_mmap=memory_map)
+    schema = pa.unify_schemas([DATASET_SCHEMA, PARTITION_SCHEMA])
+    return ds.dataset(os.path.abspath(root), schema=schema, format='parquet', partitioning=PARTITIONING, filesystem=filesystem)
+
+
+def load_table(
+    root: str,
+    columns: Optional[List[str]] = None,
+    filter: Optional[ds.Expression] = None,
+    memory_map: bool = True
+) -> pa.Table:
+    """Read a dataset, only decoding the given columns and matching rows.
+
+    Args:
+        root: Dataset directory
+        columns: Columns to read, every one by default
+        filter: Row filter, e.g. ds.field('run') == '42'; filters on run
+            and pairing skip whole partitions
+        memory_map: Memory-map the files instead of reading them
+    """
+    return open_dataset(root, memory_map).to_table(columns=columns, filter=filter)
+
+
+def table_to_matrix(table: pa.Table, dtype=np.float32) -> np.ndarray:
+    """Stack a table's columns into one (rows, columns) array, nulls as NaN."""
+    matrix = np.empty((table.num_rows, table.num_columns), dtype=dtype)
+    for i, column in enumerate(table.columns):
+        values = pc.cast(column, pa.float64() if dtype == np.float64 else pa.float32())
+        matrix[:, i] = values.to_numpy()
+    return matrix
+
+
+def load_dataframe(root: str, columns: Optional[List[str]] = None, filter: Optional[ds.Expression] = None) -> pd.DataFrame:
+    """Read a dataset into a DataFrame (integer columns with nulls become floats)."""
+    return load_table(root, columns, filter).to_pandas()
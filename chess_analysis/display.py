@@ -2,6 +2,7 @@ import sys
 from PyQt5 import QtWidgets, QtSvg, QtCore
 from typing import Optional
 from matplotlib import pyplot as plt
+from .history import PositionHistory
 
 app = QtWidgets.QApplication.instance()
 if app is None:
@@ -34,11 +35,18 @@ def finish_display() -> None:
     if app: app.exec_()
 
 def plot_position_history(position_history):
-    moves = [entry['move_number'] for entry in position_history]
-    material = [entry['analysis'].get('material', 0) for entry in position_history]
-    development = [entry['analysis'].get('development', 0) for entry in position_history]
-    mobility = [entry['analysis'].get('mobility', 0) for entry in position_history]
-    evals = [entry['analysis'].get('eval', 0) for entry in position_history]
+    if isinstance(position_history, PositionHistory):
+        moves = range(len(position_history))
+        material = position_history.column('material', 0)
+        development = position_history.column('development', 0)
+        mobility = position_history.column('mobility', 0)
+        evals = position_history.column('eval', 0)
+    else:
+        moves = [entry['move_number'] for entry in position_history]
+        material = [entry['analysis'].get('material', 0) for entry in position_history]
+        development = [entry['analysis'].get('development', 0) for entry in position_history]
+        mobility = [entry['analysis'].get('mobility', 0) for entry in position_history]
+        evals = [entry['analysis'].get('eval', 0) for entry in position_history]
 
     plt.figure(figsize=(12, 6))
     
@@ -1,15 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import chess
+from chess.engine import Limit
 import joblib
-import pandas as pd
-from stockfish import Stockfish
 import numpy as np
+from .search import AlphaBetaSearch, MAX_PLY
 
 
 class Engine(ABC):
     """Abstract base class for chess engines."""
     
+    name: str = 'engine'
+    
     @abstractmethod
     def set_board(self, board: chess.Board) -> None:
         """Set the board."""
@@ -33,6 +35,167 @@ class Engine(ABC):
         """
         pass
 
+    @abstractmethod
+    def analyse(self, board: chess.Board, multipv: int = 1, limit: Optional[Limit] = None) -> Dict[str, Any]:
+        """Evaluate a position and find its best move with a single search.
+        
+        Args:
+            board: The position to analyse
+            multipv: Number of principal variations to report
+            limit: Search budget (depth, nodes, time or clock), defaults to
+                the engine's configured depth
+        
+        Returns:
+            Dict with 'score' (same format as get_evaluation), 'best_move'
+            (UCI string or None), 'mate_in' (moves to mate or None), 'depth'
+            and 'lines' (up to multipv dicts with 'move' and 'score')
+        """
+        pass
+
+    def stop(self) -> None:
+        """Ask a running search to finish early, e.g. from another thread.
+        
+        The interrupted search still returns its best result so far. Engines
+        that cannot be interrupted ignore this.
+        """
+        pass
+
+    def new_game(self) -> None:
+        """Forget what earlier games left behind (e.g. hash tables).
+        
+        Engines without such state ignore this.
+        """
+        pass
+
+    def close(self) -> None:
+        """Release the engine's resources, e.g. its process.
+        
+        Engines that hold none ignore this.
+        """
+        pass
+
+    def __enter__(self) -> 'Engine':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def make_analysis_result(score: Dict[str, Any], lines: List[Dict[str, Any]], depth: int) -> Dict[str, Any]:
+    """Build the dict returned by Engine.analyse."""
+    return {
+        'score': score,
+        'best_move': lines[0]['move'] if lines else None,
+        'mate_in': abs(score['value']) if score['type'] == 'mate' else None,
+        'depth': depth,
+        'lines': lines,
+    }
+
+
+def go_command(board: chess.Board, limit: Limit, depth: int) -> str:
+    """Build the UCI 'go' command for a search limit.
+
+    A limit that sets no budget (e.g. Limit()) searches to depth instead of
+    'go infinite', which would never send 'bestmove' without a 'stop'.
+    """
+    parts = ["go"]
+    if limit.depth is not None:
+        parts += ["depth", str(limit.depth)]
+    if limit.nodes is not None:
+        parts += ["nodes", str(limit.nodes)]
+    if limit.time is not None:
+        parts += ["movetime", str(max(1, int(limit.time * 1000)))]
+    if limit.mate is not None:
+        parts += ["mate", str(limit.mate)]
+    if limit.white_clock is not None:
+        parts += ["wtime", str(max(1, int(limit.white_clock * 1000)))]
+    if limit.black_clock is not None:
+        parts += ["btime", str(max(1, int(limit.black_clock * 1000)))]
+    if limit.white_inc is not None:
+        parts += ["winc", str(int(limit.white_inc * 1000))]
+    if limit.black_inc is not None:
+        parts += ["binc", str(int(limit.black_inc * 1000))]
+    if limit.remaining_moves is not None:
+        parts += ["movestogo", str(limit.remaining_moves)]
+    if len(parts) == 1:
+        parts += ["depth", str(depth)]
+    return " ".join(parts)
+
+
+def allotted_time(board: chess.Board, limit: Limit) -> Optional[float]:
+    """Get the seconds to spend on a move, from a movetime or the mover's clock.
+    
+    With a clock, the remaining time is split over the moves left to the
+    next time control (30 if unknown) and most of the increment is added.
+    """
+    if limit.time is not None:
+        return limit.time
+    
+    clock = limit.white_clock if board.turn == chess.WHITE else limit.black_clock
+    if clock is None:
+        return None
+    inc = (limit.white_inc if board.turn == chess.WHITE else limit.black_inc) or 0
+    moves_to_go = limit.remaining_moves or 30
+    return max(0.01, min(clock / moves_to_go + inc * 0.75, clock * 0.5))
+
+
+def parse_info(line: str) -> Dict[str, Any]:
+    """Parse a UCI 'info' line into a dict.
+    
+    Scores are kept relative to the side to move, as sent by the engine.
+    Parsing stops at a malformed field (e.g. 'depth' without a number),
+    keeping the fields before it.
+    """
+    info: Dict[str, Any] = {}
+    tokens = line.split()
+    i = 1
+    try:
+        while i < len(tokens):
+            token = tokens[i]
+            if token in ("depth", "seldepth", "multipv", "nodes", "nps", "time", "hashfull", "tbhits"):
+                info[token] = int(tokens[i + 1])
+                i += 2
+            elif token == "score":
+                if tokens[i + 1] not in ("cp", "mate"):
+                    break
+                info['score'] = {'type': tokens[i + 1], 'value': int(tokens[i + 2])}
+                i += 3
+                if i < len(tokens) and tokens[i] in ("lowerbound", "upperbound"):
+                    info['bound'] = tokens[i]
+                    i += 1
+            elif token == "pv":
+                info['pv'] = tokens[i + 1:]
+                break
+            elif token == "string":
+                info['string'] = " ".join(tokens[i + 1:])
+                break
+            else:
+                i += 1
+    except (IndexError, ValueError):
+        pass
+    return info
+
+
+def white_score(score: Dict[str, Any], board: chess.Board) -> Dict[str, Any]:
+    """Convert a side-to-move score into one from White's point of view."""
+    if board.turn == chess.WHITE:
+        return score
+    return {'type': score['type'], 'value': -score['value']}
+
+
+def lines_from_info(infos: Dict[int, Dict[str, Any]], board: chess.Board) -> List[Dict[str, Any]]:
+    """Turn the latest 'info' of each multipv index into analysis lines."""
+    lines = []
+    for _, info in sorted(infos.items()):
+        if 'score' not in info or not info.get('pv'):
+            continue
+        lines.append({
+            'move': info['pv'][0],
+            'score': white_score(info['score'], board),
+            'pv': info['pv'],
+        })
+    return lines
+
 
 class StockfishEngine(Engine):
     """Stockfish engine implementation."""
@@ -44,11 +207,20 @@ class StockfishEngine(Engine):
             path: Path to stockfish executable
             depth: Search depth for analysis
         """
-        self.engine = Stockfish(path=path, depth=depth)
+        from .uci import UCIEngine
+        
+        self.engine = UCIEngine(path=path, depth=depth)
+        self.path = path
+        self.depth = depth
+        self.name = 'stockfish'
+
+    def __reduce__(self):
+        # Pickled by configuration (e.g. for Analysis.map), starting a new process
+        return (StockfishEngine, (self.path, self.depth))
 
     def set_board(self, board: chess.Board) -> None:
         """Set the board."""
-        self.engine.set_fen_position(board.fen())
+        self.engine.set_board(board)
 
     def get_evaluation(self) -> Dict[str, Any]:
         """Get the evaluation of the current position.
@@ -66,57 +238,163 @@ class StockfishEngine(Engine):
         """
         return self.engine.get_best_move()
 
+    def analyse(self, board: chess.Board, multipv: int = 1, limit: Optional[Limit] = None) -> Dict[str, Any]:
+        """Evaluate a position and find its best move with a single search.
+        
+        Args:
+            board: The position to analyse
+            multipv: Number of principal variations to report
+            limit: Search budget, defaults to the configured depth
+        
+        Returns:
+            Dict with 'score', 'best_move', 'mate_in', 'depth' and 'lines'
+            (each with its 'pv'), scores from White's point of view
+        """
+        return self.engine.analyse(board, multipv, limit)
+
+    def stop(self) -> None:
+        """Ask a running search to finish early."""
+        self.engine.stop()
+
+    def new_game(self) -> None:
+        """Tell the engine the next position is from a different game."""
+        self.engine.new_game()
+
+    def close(self) -> None:
+        """Shut the engine process down; it restarts if used again."""
+        self.engine.close()
+
 
 class CustomModelEngine(Engine):
     """Custom model engine implementation using a joblib-saved model."""
     
-    def __init__(self, model_path: str, depth: int = 3):
+    def __init__(
+        self,
+        model_path: str,
+        depth: int = 3,
+        search: bool = False,
+        max_nodes: Optional[int] = None,
+        movetime: Optional[float] = None
+    ):
         """Initialize custom model engine.
         
         Args:
             model_path: Path to the joblib-saved model
-            depth: Search depth for move generation (number of moves to consider)
+            depth: Search depth in plies when search is enabled
+            search: Use alpha-beta search instead of a 1-ply scan of the moves
+            max_nodes: Optional node budget per search
+            movetime: Optional time budget per search in seconds
         """
-        from .position_analysis import position_analysis_without_eval
+        from .features import FeatureAccumulator, SUMMARY_FEATURES
         
         self.model = joblib.load(model_path)
-        self.depth = depth
+        self.model_path = model_path
+        self.search_depth = depth
+        # Depth analyse reports, which CachedEngine requires of cached results:
+        # the 1-ply scan always reports 1, whatever depth was configured
+        self.depth = depth if search else 1
+        self.name = f'custom:{model_path}'
         self.board = chess.Board()
-        self.analysis = position_analysis_without_eval
+        # Tracks the features of self.board through every push/pop below
+        self.accumulator = FeatureAccumulator(self.board)
+        # Column order the model was trained with (see data.load_data)
+        self.feature_names = list(getattr(self.model, 'feature_names_in_', SUMMARY_FEATURES))
+        
+        self.max_nodes = max_nodes
+        self.movetime = movetime
+        self.searcher = None
+        if search:
+            self.searcher = AlphaBetaSearch(
+                evaluate=lambda board: self._evaluate_moves(board, [None])[0],
+                evaluate_moves=self._evaluate_moves,
+                make_move=self.accumulator.push,
+                unmake_move=self.accumulator.pop
+            )
+        self.last_search: Optional[Dict[str, Any]] = None
+
+    def __reduce__(self):
+        # Pickled by configuration (e.g. for Analysis.map), reloading the model
+        return (CustomModelEngine, (self.model_path, self.search_depth, self.searcher is not None, self.max_nodes, self.movetime))
 
     def set_board(self, board: chess.Board) -> None:
         """Set the board."""
         self.board = board
 
-    def get_evaluation(self) -> Dict[str, Any]:
-        """Get the evaluation of the current position using the custom model.
+    def _terminal_score(self, board: chess.Board) -> Optional[int]:
+        """Get the score of a finished game, or None if the game is not over."""
+        if not board.is_game_over():
+            return None
         
-        Returns:
-            Dict with 'type' ('cp' for centipawns) and 'value'
-        """
-        if self.board.is_game_over():
-            result = self.board.result()
-            if result == "1-0":
-                return {'type': 'cp', 'value': 2000}  # Large positive value for white win
-            elif result == "0-1":
-                return {'type': 'cp', 'value': -2000}  # Large negative value for black win
-            else:
-                return {'type': 'cp', 'value': 0}  # Draw
+        result = board.result()
+        if result == "1-0":
+            return 2000  # Large positive value for white win
+        elif result == "0-1":
+            return -2000  # Large negative value for black win
+        else:
+            return 0  # Draw
 
-        analysis_result = self.analysis(self.board)
-        features_df = pd.DataFrame([analysis_result]).select_dtypes(include=[np.number, bool])
-        X = features_df.values
+    def _features(self, board: chess.Board) -> List[float]:
+        """Get the model's input row for a position."""
+        summary = self.accumulator.features(board)
+        return [summary[feature] for feature in self.feature_names]
 
-        # Make prediction using the model
+    def _predict(self, rows: List[List[float]]) -> List[int]:
+        """Score a batch of feature rows in centipawns with one model call."""
         try:
-            prediction = self.model.predict(X)[0]
-            centipawns = int(prediction * 100)
-            return {'type': 'cp', 'value': centipawns}
+            predictions = self.model.predict(np.array(rows, dtype=np.float64))
+            return [int(prediction * 100) for prediction in predictions]
         except Exception as e:
             # Fallback to neutral evaluation if model prediction fails
             print(f"Model prediction failed: {e}")
-            return {'type': 'cp', 'value': 0}
+            return [0] * len(rows)
+
+    def _evaluate_moves(self, board: chess.Board, moves: List[Optional[chess.Move]]) -> List[int]:
+        """Evaluate the position after each move (None for the position itself).
+        
+        All positions are featurized first and scored with a single predict call.
+        """
+        scores = [0] * len(moves)
+        rows = []
+        row_indices = []
+        
+        for i, move in enumerate(moves):
+            if move is not None:
+                self.accumulator.push(board, move)
+            
+            terminal_score = self._terminal_score(board)
+            if terminal_score is None:
+                rows.append(self._features(board))
+                row_indices.append(i)
+            else:
+                scores[i] = terminal_score
+            
+            if move is not None:
+                self.accumulator.pop(board)
+        
+        if rows:
+            for i, score in zip(row_indices, self._predict(rows)):
+                scores[i] = score
+        return scores
+
+    def get_evaluation(self) -> Dict[str, Any]:
+        """Get the evaluation of the current position using the custom model.
+        
+        Returns:
+            Dict with 'type' ('cp' for centipawns) and 'value'
+        """
+        self.accumulator.reset(self.board)
+        return {'type': 'cp', 'value': self._evaluate_moves(self.board, [None])[0]}
     
+    def new_game(self) -> None:
+        """Forget the search's transposition table."""
+        if self.searcher is not None:
+            self.searcher.clear()
+    
+    def _rank_moves(self, scored_moves: List[tuple[chess.Move, int]]) -> List[tuple[chess.Move, int]]:
+        """Sort scored moves best first for the side to move."""
+        # White wants higher scores, Black wants lower scores
+        return sorted(scored_moves, key=lambda item: item[1], reverse=self.board.turn == chess.WHITE)
+
     def get_best_move(self) -> Optional[str]:
         """Get the best move using minimax search with the custom model evaluation.
         
@@ -125,33 +403,74 @@ class CustomModelEngine(Engine):
         """
         if self.board.is_game_over():
             return None
+        if self.searcher is not None:
+            return self.analyse(self.board)['best_move']
         
+        self.accumulator.reset(self.board)
         legal_moves = list(self.board.legal_moves)
-        if not legal_moves:
-            return None
+        scored_moves = self._rank_moves(list(zip(legal_moves, self._evaluate_moves(self.board, legal_moves))))
+        return scored_moves[0][0].uci() if scored_moves else None
+
+    def analyse(self, board: chess.Board, multipv: int = 1, limit: Optional[Limit] = None) -> Dict[str, Any]:
+        """Evaluate a position and rank its moves with the custom model.
         
-        best_move = None
-        best_score = float('-inf') if self.board.turn == chess.WHITE else float('inf')
+        Without search, the position and all of its children are scored in
+        one batch. With search, a single line from the alpha-beta search is
+        reported along with its node count and speed.
         
-        for move in legal_moves:
-            # Make the move
-            self.board.push(move)
-            
-            # Evaluate the resulting position
-            eval_result = self.get_evaluation()
-            score = eval_result['value']
-            
-            # Undo the move
-            self.board.pop()
-            
-            # Update best move based on whose turn it is
-            if self.board.turn == chess.WHITE:  # White wants higher scores
-                if score > best_score:
-                    best_score = score
-                    best_move = move
-            else:  # Black wants lower scores
-                if score < best_score:
-                    best_score = score
-                    best_move = move
-        
-        return best_move.uci() if best_move else None
\ No newline at end of file
+        Args:
+            board: The position to analyse
+            multipv: Number of principal variations to report
+            limit: Search budget, only used with search. Defaults to the
+                configured depth, node and time budgets; a limit without a
+                depth, node or time budget searches to the configured depth
+        
+        Returns:
+            Dict with 'score', 'best_move', 'mate_in', 'depth' and 'lines'
+        """
+        self.set_board(board)
+        if self.board.is_game_over():
+            return make_analysis_result(self.get_evaluation(), [], 0)
+        self.accumulator.reset(self.board)
+        if self.searcher is not None:
+            return self._search(limit)
+        
+        legal_moves = list(self.board.legal_moves)
+        score, *child_scores = self._evaluate_moves(self.board, [None, *legal_moves])
+        lines = [
+            {'move': move.uci(), 'score': {'type': 'cp', 'value': value}}
+            for move, value in self._rank_moves(list(zip(legal_moves, child_scores)))[:multipv]
+        ]
+        return make_analysis_result({'type': 'cp', 'value': score}, lines, 1)
+
+    def _search(self, limit: Optional[Limit] = None) -> Dict[str, Any]:
+        """Run the alpha-beta search on the current position."""
+        if limit is None:
+            limit = Limit(depth=self.search_depth, nodes=self.max_nodes, time=self.movetime)
+        
+        # A node or time budget without a depth searches as deep as it allows;
+        # a limit with neither (e.g. Limit() or Limit(mate=2)) uses the configured depth
+        movetime = allotted_time(self.board, limit)
+        if limit.depth is not None:
+            depth = limit.depth
+        elif limit.nodes is not None or movetime is not None:
+            depth = MAX_PLY
+        else:
+            depth = self.search_depth
+        search = self.searcher.search(self.board, depth, limit.nodes, movetime)
+        self.last_search = search
+        
+        line = {
+            'move': search['move'].uci(),
+            'score': search['score'],
+            'pv': [move.uci() for move in search['pv']]
+        }
+        result = make_analysis_result(search['score'], [line], search['depth'])
+        result['nodes'] = search['nodes']
+        result['nps'] = search['nps']
+        return result
+
+    def stop(self) -> None:
+        """Ask a running search to finish early."""
+        if self.searcher is not None:
+            self.searcher.stop()
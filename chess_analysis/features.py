@@ -0,0 +1,490 @@
+import threading
+from collections import OrderedDict, deque
+from typing import Iterable, Optional, Union
+import chess
+import chess.pgn
+import chess.polyglot
+import numpy as np
+from chess import Board, WHITE, BLACK, popcount
+
+PIECE_VALUES: dict[chess.PieceType, int] = {
+    chess.PAWN: 1,
+    chess.KNIGHT: 3,
+    chess.BISHOP: 3,
+    chess.ROOK: 5,
+    chess.QUEEN: 9,
+    chess.KING: 0
+}
+
+# Minor pieces count double, pawns and kings not at all
+DEVELOPMENT_WEIGHTS: dict[chess.PieceType, int] = {
+    chess.KNIGHT: 2,
+    chess.BISHOP: 2,
+    chess.ROOK: 1,
+    chess.QUEEN: 1
+}
+
+# Features of position_summary, without eval
+SUMMARY_FEATURES: list[str] = [
+    'material',
+    'white_material',
+    'black_material',
+    'development',
+    'white_development',
+    'black_development',
+    'mobility',
+    'white_mobility',
+    'black_mobility',
+    'white_has_castled',
+    'black_has_castled',
+    'fullmove_number',
+    'halfmove_clock',
+    'furthest_rank',
+    'white_furthest_rank',
+    'black_furthest_rank',
+    'white_king_file',
+    'white_king_rank',
+    'black_king_file',
+    'black_king_rank'
+]
+
+_STARTING_BOARD = Board()
+# Squares each (color, piece type) starts on, and how many pieces start there
+STARTING_MASKS: dict[tuple[chess.Color, chess.PieceType], int] = {
+    (color, piece_type): _STARTING_BOARD.pieces_mask(piece_type, color)
+    for color in chess.COLORS
+    for piece_type in chess.PIECE_TYPES
+}
+STARTING_COUNTS: dict[tuple[chess.Color, chess.PieceType], int] = {
+    key: popcount(mask) for key, mask in STARTING_MASKS.items()
+}
+
+
+def material_points(board: Board) -> list[int]:
+    """Material of [Black, White] from piece popcounts."""
+    points = [0, 0]
+    for color in chess.COLORS:
+        for piece_type, value in PIECE_VALUES.items():
+            if value:
+                points[color] += value * popcount(board.pieces_mask(piece_type, color))
+    return points
+
+
+def development_points(board: Board) -> list[float]:
+    """Development of [Black, White].
+
+    A piece counts as developed when its starting square no longer holds it,
+    minus the pieces of that type that have been captured.
+    """
+    development = [0., 0.]
+    for color in chess.COLORS:
+        for piece_type, weight in DEVELOPMENT_WEIGHTS.items():
+            current = board.pieces_mask(piece_type, color)
+            moved = popcount(STARTING_MASKS[color, piece_type] & ~current)
+            if not moved:
+                continue
+            captured = STARTING_COUNTS[color, piece_type] - popcount(current)
+            development[color] += max(0, moved - captured) * weight
+    return development
+
+
+def furthest_ranks(board: Board) -> list[int]:
+    """Furthest rank reached by any piece of [Black, White], from its own side."""
+    white = board.occupied_co[WHITE]
+    black = board.occupied_co[BLACK]
+    return [
+        7 - chess.square_rank(chess.lsb(black)) if black else 0,
+        chess.square_rank(chess.msb(white)) if white else 0,
+    ]
+
+
+def king_placement(board: Board, color: chess.Color) -> Optional[tuple[int, int]]:
+    """File and rank (from its own side) of a color's king, or None without one."""
+    kings = board.kings & board.occupied_co[color]
+    if not kings:
+        return None
+
+    square = chess.lsb(kings)
+    rank = chess.square_rank(square)
+    return chess.square_file(square), rank if color == WHITE else 7 - rank
+
+
+class MobilityCache:
+    """Thread-safe LRU cache of mobility counts keyed by Zobrist hash."""
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self.entries: OrderedDict[tuple[int, bool], list[int]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple[int, bool]) -> Optional[list[int]]:
+        with self.lock:
+            counts = self.entries.get(key)
+            if counts is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return counts
+
+    def put(self, key: tuple[int, bool], counts: list[int]) -> None:
+        with self.lock:
+            self.entries[key] = counts
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+MOBILITY_CACHE = MobilityCache()
+
+# Squares that must be empty and squares the king passes, by castling rook square
+_CASTLING_PATHS: dict[chess.Square, tuple[int, int]] = {
+    chess.H1: (chess.BB_F1 | chess.BB_G1, chess.BB_E1 | chess.BB_F1 | chess.BB_G1),
+    chess.A1: (chess.BB_B1 | chess.BB_C1 | chess.BB_D1, chess.BB_C1 | chess.BB_D1 | chess.BB_E1),
+    chess.H8: (chess.BB_F8 | chess.BB_G8, chess.BB_E8 | chess.BB_F8 | chess.BB_G8),
+    chess.A8: (chess.BB_B8 | chess.BB_C8 | chess.BB_D8, chess.BB_C8 | chess.BB_D8 | chess.BB_E8),
+}
+
+
+def count_moves(board: Board, color: chess.Color, legal: bool = True) -> int:
+    """Count a color's moves as if it were its turn, without touching the board.
+
+    Moves come from the attack tables; legal counts also drop moves of
+    pinned pieces off their pin line, moves that leave a check unanswered
+    and king moves into attacked squares, matching board.legal_moves with
+    board.turn set to color. Only standard castling is counted.
+    """
+    own = board.occupied_co[color]
+    theirs = board.occupied_co[not color]
+    occupied = board.occupied
+    king = board.king(color)
+
+    evasion_mask = chess.BB_ALL
+    checkers = 0
+    if legal and king is not None:
+        checkers = board.attackers_mask(not color, king)
+        if popcount(checkers) > 1:
+            evasion_mask = 0
+        elif checkers:
+            checker = chess.lsb(checkers)
+            evasion_mask = chess.between(king, checker) | checkers
+
+    count = 0
+    pawns = board.pawns & own
+    last_rank = chess.BB_RANK_8 if color == WHITE else chess.BB_RANK_1
+    for square in chess.scan_forward(own & ~board.kings):
+        pin_mask = board.pin_mask(color, square) if legal else chess.BB_ALL
+        if pawns & chess.BB_SQUARES[square]:
+            targets = chess.BB_PAWN_ATTACKS[color][square] & theirs
+            step = square + (8 if color == WHITE else -8)
+            if 0 <= step < 64 and not occupied & chess.BB_SQUARES[step]:
+                targets |= chess.BB_SQUARES[step]
+                double = step + (8 if color == WHITE else -8)
+                start_rank = 1 if color == WHITE else 6
+                if chess.square_rank(square) == start_rank and not occupied & chess.BB_SQUARES[double]:
+                    targets |= chess.BB_SQUARES[double]
+            targets &= pin_mask & evasion_mask
+            count += popcount(targets & ~last_rank) + 4 * popcount(targets & last_rank)
+        else:
+            count += popcount(board.attacks_mask(square) & ~own & pin_mask & evasion_mask)
+
+    # En passant only exists for the side to move
+    if color == board.turn and board.ep_square is not None and not occupied & chess.BB_SQUARES[board.ep_square]:
+        captured = board.ep_square + (-8 if color == WHITE else 8)
+        for square in chess.scan_forward(pawns & chess.BB_PAWN_ATTACKS[not color][board.ep_square]):
+            if not (board.pawns & theirs & chess.BB_SQUARES[captured]):
+                break
+            if legal and king is not None:
+                after = (occupied & ~chess.BB_SQUARES[square] & ~chess.BB_SQUARES[captured]) | chess.BB_SQUARES[board.ep_square]
+                if board.attackers_mask(not color, king, after) & ~chess.BB_SQUARES[captured]:
+                    continue
+            count += 1
+
+    if king is None:
+        return count
+
+    without_king = occupied & ~chess.BB_SQUARES[king]
+    for square in chess.scan_forward(chess.BB_KING_ATTACKS[king] & ~own):
+        if not legal or not board.attackers_mask(not color, square, without_king):
+            count += 1
+
+    # Castling is only generated when legal, even for pseudo-legal moves
+    back_rank = chess.BB_RANK_1 if color == WHITE else chess.BB_RANK_8
+    if not checkers and board.kings & own & (chess.BB_E1 | chess.BB_E8) & back_rank:
+        for rook in chess.scan_forward(board.castling_rights & board.rooks & own & back_rank):
+            if rook not in _CASTLING_PATHS:
+                continue
+            empty, path = _CASTLING_PATHS[rook]
+            if occupied & empty:
+                continue
+            if any(board.attackers_mask(not color, square) for square in chess.scan_forward(path)):
+                continue
+            count += 1
+    return count
+
+
+def mobility_counts(board: Board, legal: bool = True, cache: Optional[MobilityCache] = MOBILITY_CACHE) -> list[int]:
+    """Move counts of [Black, White] with each side to move in turn.
+
+    The board is only read, so it may be shared with other threads or a
+    running search. Both counts are cached together under the position's
+    Zobrist key.
+
+    Args:
+        board: The position
+        legal: Count legal moves, or pseudo-legal ones (ignoring pins and checks)
+        cache: Cache to use, None to always compute
+    """
+    key = (chess.polyglot.zobrist_hash(board), legal) if cache is not None else None
+    if key is not None:
+        counts = cache.get(key)
+        if counts is not None:
+            return list(counts)
+
+    counts = [count_moves(board, BLACK, legal), count_moves(board, WHITE, legal)]
+    if key is not None:
+        cache.put(key, counts)
+    return list(counts)
+
+
+def castled_flags(board: Board) -> list[bool]:
+    """Whether [Black, White] castled, replaying the game from its root."""
+    has_castled = [False, False]
+
+    temp_board = board.root()
+    for move in board.move_stack:
+        if temp_board.is_castling(move):
+            has_castled[temp_board.turn] = True
+        temp_board.push(move)
+        if has_castled[WHITE] and has_castled[BLACK]:
+            break
+    return has_castled
+
+
+def featurize(board: Board) -> dict:
+    """Compute the position_summary features (without eval) of a position."""
+    material = material_points(board)
+    development = development_points(board)
+    mobility = mobility_counts(board)
+    has_castled = castled_flags(board)
+    furthest_rank = furthest_ranks(board)
+
+    features = {
+        'material': material[WHITE] - material[BLACK],
+        'white_material': material[WHITE],
+        'black_material': material[BLACK],
+        'development': development[WHITE] - development[BLACK],
+        'white_development': development[WHITE],
+        'black_development': development[BLACK],
+        'mobility': mobility[WHITE] - mobility[BLACK],
+        'white_mobility': mobility[WHITE],
+        'black_mobility': mobility[BLACK],
+        'white_has_castled': has_castled[WHITE],
+        'black_has_castled': has_castled[BLACK],
+        'fullmove_number': board.fullmove_number,
+        'halfmove_clock': board.halfmove_clock,
+        'furthest_rank': furthest_rank[WHITE] - furthest_rank[BLACK],
+        'white_furthest_rank': furthest_rank[WHITE],
+        'black_furthest_rank': furthest_rank[BLACK],
+    }
+    for color, prefix in [(WHITE, 'white'), (BLACK, 'black')]:
+        placement = king_placement(board, color)
+        if placement is not None:
+            features[f'{prefix}_king_file'], features[f'{prefix}_king_rank'] = placement
+    return features
+
+
+class FeatureAccumulator:
+    """Keeps the featurize() features of a board up to date move by move.
+
+    Moves must be made and unmade through push() and pop(), which update
+    piece counts, home-square occupancy, per-rank occupancy, king squares
+    and castling flags from the squares the move changed, like an NNUE
+    accumulator. Only mobility is still computed from the board on request.
+    """
+
+    def __init__(self, board: Board, max_undo: Optional[int] = None):
+        """Start tracking a board.
+
+        Args:
+            board: The board to track
+            max_undo: Moves that can be taken back with pop(), None for all;
+                0 for a game that only moves forward keeps no history
+        """
+        self.max_undo = max_undo
+        self.reset(board)
+
+    def reset(self, board: Board) -> None:
+        """Recompute everything from a board."""
+        self.counts = [[0] * 7 for _ in chess.COLORS]
+        self.home = [[0] * 7 for _ in chess.COLORS]
+        self.rank_counts = [[0] * 8 for _ in chess.COLORS]
+        self.kings = [0, 0]
+        self.castled = castled_flags(board)
+        self.changes: deque[tuple[list[tuple[chess.Square, Optional[chess.Piece], Optional[chess.Piece]]], list[bool]]] = deque(maxlen=self.max_undo)
+
+        for square, piece in board.piece_map().items():
+            self._add(square, piece)
+
+    def _add(self, square: chess.Square, piece: chess.Piece) -> None:
+        color, piece_type = piece.color, piece.piece_type
+        self.counts[color][piece_type] += 1
+        if STARTING_MASKS[color, piece_type] & chess.BB_SQUARES[square]:
+            self.home[color][piece_type] += 1
+        rank = chess.square_rank(square)
+        self.rank_counts[color][rank if color == WHITE else 7 - rank] += 1
+        if piece_type == chess.KING:
+            self.kings[color] |= chess.BB_SQUARES[square]
+
+    def _remove(self, square: chess.Square, piece: chess.Piece) -> None:
+        color, piece_type = piece.color, piece.piece_type
+        self.counts[color][piece_type] -= 1
+        if STARTING_MASKS[color, piece_type] & chess.BB_SQUARES[square]:
+            self.home[color][piece_type] -= 1
+        rank = chess.square_rank(square)
+        self.rank_counts[color][rank if color == WHITE else 7 - rank] -= 1
+        if piece_type == chess.KING:
+            self.kings[color] &= ~chess.BB_SQUARES[square]
+
+    def push(self, board: Board, move: chess.Move) -> None:
+        """Make a move on the board and update the features from its delta."""
+        squares = [move.from_square, move.to_square]
+        if board.is_castling(move):
+            # King and rook both land on the back rank
+            squares = list(chess.SquareSet(chess.BB_RANK_1 if board.turn == WHITE else chess.BB_RANK_8))
+        elif board.is_en_passant(move):
+            squares.append(chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square)))
+
+        castled = self.castled.copy()
+        if board.is_castling(move):
+            self.castled[board.turn] = True
+
+        before = [board.piece_at(square) for square in squares]
+        board.push(move)
+
+        changes = []
+        for square, old in zip(squares, before):
+            new = board.piece_at(square)
+            if old != new:
+                changes.append((square, old, new))
+                if old is not None:
+                    self._remove(square, old)
+                if new is not None:
+                    self._add(square, new)
+        self.changes.append((changes, castled))
+
+    def pop(self, board: Board) -> chess.Move:
+        """Unmake the last move pushed through the accumulator."""
+        if not self.changes:
+            raise IndexError("No move to take back within the accumulator's max_undo")
+        move = board.pop()
+        changes, self.castled = self.changes.pop()
+        for square, old, new in reversed(changes):
+            if new is not None:
+                self._remove(square, new)
+            if old is not None:
+                self._add(square, old)
+        return move
+
+    def features(self, board: Board) -> dict:
+        """Get the same dict as featurize() for the board being tracked."""
+        material = [0, 0]
+        for color in chess.COLORS:
+            for piece_type, value in PIECE_VALUES.items():
+                material[color] += self.counts[color][piece_type] * value
+
+        development = [0., 0.]
+        for color in chess.COLORS:
+            for piece_type, weight in DEVELOPMENT_WEIGHTS.items():
+                start = STARTING_COUNTS[color, piece_type]
+                moved = start - self.home[color][piece_type]
+                if not moved:
+                    continue
+                captured = start - self.counts[color][piece_type]
+                development[color] += max(0, moved - captured) * weight
+
+        furthest_rank = [0, 0]
+        for color in chess.COLORS:
+            for rank in range(7, 0, -1):
+                if self.rank_counts[color][rank]:
+                    furthest_rank[color] = rank
+                    break
+
+        mobility = mobility_counts(board)
+        features = {
+            'material': material[WHITE] - material[BLACK],
+            'white_material': material[WHITE],
+            'black_material': material[BLACK],
+            'development': development[WHITE] - development[BLACK],
+            'white_development': development[WHITE],
+            'black_development': development[BLACK],
+            'mobility': mobility[WHITE] - mobility[BLACK],
+            'white_mobility': mobility[WHITE],
+            'black_mobility': mobility[BLACK],
+            'white_has_castled': self.castled[WHITE],
+            'black_has_castled': self.castled[BLACK],
+            'fullmove_number': board.fullmove_number,
+            'halfmove_clock': board.halfmove_clock,
+            'furthest_rank': furthest_rank[WHITE] - furthest_rank[BLACK],
+            'white_furthest_rank': furthest_rank[WHITE],
+            'black_furthest_rank': furthest_rank[BLACK],
+        }
+        for color, prefix in [(WHITE, 'white'), (BLACK, 'black')]:
+            if self.kings[color]:
+                square = chess.lsb(self.kings[color])
+                rank = chess.square_rank(square)
+                features[f'{prefix}_king_file'] = chess.square_file(square)
+                features[f'{prefix}_king_rank'] = rank if color == WHITE else 7 - rank
+        return features
+
+
+def featurize_game(
+    game: Union[chess.pgn.Game, Iterable[Union[chess.Move, str]]],
+    board: Optional[Board] = None
+) -> tuple[np.ndarray, list[str]]:
+    """Featurize every position of a game, replaying it once.
+
+    Args:
+        game: A PGN game (its mainline is used), or moves as chess.Move,
+            UCI or SAN strings
+        board: Position the moves start from, defaults to the starting
+            position (ignored for PGN games, which carry their own)
+
+    Returns:
+        A (plies + 1, len(SUMMARY_FEATURES)) float32 array with a row for the
+        starting position and one after each move, and its column names.
+        Features a position lacks (a missing king) are NaN.
+    """
+    if isinstance(game, chess.pgn.Game):
+        board = game.board()
+        moves: Iterable = game.mainline_moves()
+    else:
+        board = board.copy() if board is not None else Board()
+        moves = game
+
+    accumulator = FeatureAccumulator(board, max_undo=0)
+    rows = []
+
+    def add_row() -> None:
+        features = accumulator.features(board)
+        rows.append([features.get(feature, np.nan) for feature in SUMMARY_FEATURES])
+
+    add_row()
+    for move in moves:
+        if isinstance(move, str):
+            try:
+                move = board.parse_uci(move)
+            except ValueError:
+                move = board.parse_san(move)
+        accumulator.push(board, move)
+        add_row()
+
+    return np.array(rows, dtype=np.float32).reshape(-1, len(SUMMARY_FEATURES)), list(SUMMARY_FEATURES)
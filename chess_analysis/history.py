@@ -0,0 +1,205 @@
+from typing import Any, Dict, Iterator, List, Optional, TYPE_CHECKING
+import chess
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from .adjudication import Adjudication
+
+NO_MOVE = 0
+# A column's kind only widens: bool to int to float
+KIND_RANKS: Dict[type, int] = {bool: 0, int: 1, float: 2}
+
+
+def encode_move(move: Optional[chess.Move]) -> int:
+    """Pack a move into 16 bits: from square, to square << 6, promotion << 12."""
+    if move is None:
+        return NO_MOVE
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code: int) -> Optional[chess.Move]:
+    """Inverse of encode_move."""
+    if code == NO_MOVE:
+        return None
+    return chess.Move(code & 63, (code >> 6) & 63, promotion=(code >> 12) or None)
+
+
+class PositionHistory:
+    """Analysis of every position of a game, stored column by column.
+
+    Each position's numeric and boolean features go in a growable float64
+    array (NaN when missing) and the move leading to it in a uint16 array.
+    FENs, SAN moves and DataFrames are only built when asked for.
+
+    Iterating yields the same entries play_game used to append
+    ({'move_number', 'fen', 'last_move', 'analysis'}), so code written for
+    lists of entries keeps working.
+
+    Once the game is over, finish() records its result and termination.
+    """
+
+    def __init__(self, board: chess.Board, columns: Optional[List[str]] = None, capacity: int = 256):
+        """Start an empty history.
+
+        Args:
+            board: The position the first entry is for
+            columns: Features to keep, by default every one seen
+            capacity: Number of positions allocated up front
+        """
+        self.start_fen = board.fen()
+        self.fixed_columns = columns is not None
+        self.columns: List[str] = list(columns or [])
+        self.index: Dict[str, int] = {column: i for i, column in enumerate(self.columns)}
+        self.kinds: Dict[str, type] = {}
+        self.values = np.full((capacity, len(self.columns)), np.nan)
+        self.moves = np.zeros(capacity, dtype=np.uint16)
+        self.size = 0
+        # PGN result ('*' while unfinished) and how the game ended, set by finish()
+        self.result = '*'
+        self.termination: Optional[str] = None
+        # The Adjudication that ended the game, if any
+        self.adjudication: Optional['Adjudication'] = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _add_column(self, column: str) -> None:
+        self.index[column] = len(self.columns)
+        self.columns.append(column)
+        self.values = np.hstack([self.values, np.full((len(self.values), 1), np.nan)])
+
+    def append(self, move: Optional[chess.Move], analysis: Dict[str, Any]) -> None:
+        """Add the next position.
+
+        Args:
+            move: The move leading to it, None for the first position
+            analysis: Its analysis; only numbers and booleans are kept
+        """
+        if self.size == len(self.moves):
+            capacity = max(1, 2 * len(self.moves))
+            values = np.full((capacity, len(self.columns)), np.nan)
+            values[:self.size] = self.values[:self.size]
+            self.values = values
+            self.moves = np.resize(self.moves, capacity)
+
+        row = self.size
+        self.values[row] = np.nan
+        for column, value in analysis.items():
+            if value is None or not isinstance(value, (bool, int, float, np.number, np.bool_)):
+                continue
+            if column not in self.index:
+                if self.fixed_columns:
+                    continue
+                self._add_column(column)
+            if isinstance(value, (bool, np.bool_)):
+                kind = bool
+            else:
+                kind = int if isinstance(value, (int, np.integer)) else float
+            if column not in self.kinds or KIND_RANKS[kind] > KIND_RANKS[self.kinds[column]]:
+                self.kinds[column] = kind
+            self.values[row, self.index[column]] = value
+
+        self.moves[row] = encode_move(move)
+        self.size += 1
+
+    def finish(self, board: chess.Board, adjudication: Optional['Adjudication'] = None) -> None:
+        """Record how the game on board ended.
+
+        An adjudicated game keeps the adjudication and gets its result and the
+        termination 'adjudication: <reason>'; a game over on the board gets its outcome
+        (e.g. 'checkmate'); an unfinished game keeps '*' and no termination.
+        """
+        self.adjudication = adjudication
+        if adjudication is not None:
+            self.result = adjudication.result
+            self.termination = f"adjudication: {adjudication.reason}"
+            return
+        outcome = board.outcome()
+        if outcome is not None:
+            self.result = outcome.result()
+            self.termination = outcome.termination.name.lower()
+
+    def column(self, name: str, default: float = np.nan) -> np.ndarray:
+        """Get one feature for every position, missing values set to default."""
+        if name not in self.index:
+            return np.full(self.size, default)
+        values = self.values[:self.size, self.index[name]]
+        return np.where(np.isnan(values), default, values)
+
+    def move_list(self) -> List[Optional[chess.Move]]:
+        """Get the move leading to each position (None for the first)."""
+        return [decode_move(int(code)) for code in self.moves[:self.size]]
+
+    def boards(self) -> Iterator[chess.Board]:
+        """Replay the game, yielding the board at each position (reused between yields)."""
+        board = chess.Board(self.start_fen)
+        for i, move in enumerate(self.move_list()):
+            if i > 0 and move is not None:
+                board.push(move)
+            yield board
+
+    def fens(self) -> List[str]:
+        """Get the FEN of every position."""
+        return [board.fen() for board in self.boards()]
+
+    def sans(self) -> List[Optional[str]]:
+        """Get the SAN of the move leading to every position (None for the first)."""
+        sans: List[Optional[str]] = []
+        board = chess.Board(self.start_fen)
+        for i, move in enumerate(self.move_list()):
+            if i == 0 or move is None:
+                sans.append(None)
+                continue
+            sans.append(board.san(move))
+            board.push(move)
+        return sans
+
+    def analysis(self, row: int) -> Dict[str, Any]:
+        """Get one position's analysis as a dict, without missing features."""
+        analysis = {}
+        for column, i in self.index.items():
+            value = self.values[row, i]
+            if not np.isnan(value):
+                analysis[column] = self.kinds.get(column, float)(value)
+        return analysis
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        if row < 0:
+            row += self.size
+        if not 0 <= row < self.size:
+            raise IndexError(row)
+        board = chess.Board(self.start_fen)
+        moves = self.move_list()
+        for move in moves[1:row]:
+            board.push(move)
+        last_move = None
+        if row > 0:
+            last_move = board.san(moves[row])
+            board.push(moves[row])
+        return {'move_number': row, 'fen': board.fen(), 'last_move': last_move, 'analysis': self.analysis(row)}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        sans = self.sans()
+        for row, board in enumerate(self.boards()):
+            yield {'move_number': row, 'fen': board.fen(), 'last_move': sans[row], 'analysis': self.analysis(row)}
+
+    def to_dataframe(self, columns: Optional[List[str]] = None, text: bool = False) -> pd.DataFrame:
+        """Get the features as a DataFrame, one row per position.
+
+        Args:
+            columns: Features to include, by default every stored one
+            text: Also include 'move_number', 'fen' and 'last_move' columns
+        """
+        data = {}
+        if text:
+            data['move_number'] = np.arange(self.size)
+            data['fen'] = self.fens()
+            data['last_move'] = self.sans()
+        for column in columns or self.columns:
+            values = self.column(column)
+            kind = self.kinds.get(column, float)
+            if kind is not float and len(values) and not np.isnan(values).any():
+                values = values.astype(bool if kind is bool else np.int64)
+            data[column] = values
+        return pd.DataFrame(data)
@@ -0,0 +1,251 @@
+import bz2
+import gzip
+import glob
+import io
+import json
+import lzma
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+import chess
+import chess.pgn
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .dataset import features_to_table
+from .features import SUMMARY_FEATURES, featurize_game
+from .position_store import EVAL_LIMIT
+
+# Leading underscores and dots keep pyarrow from reading these as data files
+MANIFEST = '_import.json'
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+TAG_LINE = re.compile(rb'^\[[A-Za-z0-9][A-Za-z0-9_+#=:-]*\s+"')
+
+Chunk = List[bytes]
+
+
+def open_pgn(path: str) -> BinaryIO:
+    """Open a PGN file as bytes, decompressing .gz, .bz2 and .xz files."""
+    opener = OPENERS.get(os.path.splitext(path)[1], open)
+    return opener(path, 'rb')
+
+
+def read_game_texts(f: BinaryIO) -> Iterator[Tuple[bytes, int]]:
+    """Split a PGN stream into games without parsing them.
+
+    A game ends where a tag pair line follows its movetext, outside any
+    {...} comment (which may span lines, e.g. wrapping before [%eval ...]).
+
+    Yields:
+        (game text, offset in the uncompressed stream just past the game)
+    """
+    lines: List[bytes] = []
+    in_moves = False
+    in_comment = False
+    offset = f.tell()
+    for line in f:
+        if not in_comment and TAG_LINE.match(line):
+            if in_moves:
+                yield b''.join(lines), offset
+                lines = []
+                in_moves = False
+        elif line.strip():
+            in_moves = True
+            in_comment = ends_in_comment(line, in_comment)
+        lines.append(line)
+        offset += len(line)
+    if in_moves:
+        yield b''.join(lines), offset
+
+
+def ends_in_comment(line: bytes, in_comment: bool) -> bool:
+    """Whether a movetext line ends inside a {...} comment."""
+    if not in_comment and line.startswith(b'%'):
+        return False
+    position = 0
+    while True:
+        if in_comment:
+            position = line.find(b'}', position)
+            if position < 0:
+                return True
+            in_comment = False
+        else:
+            brace = line.find(b'{', position)
+            semicolon = line.find(b';', position)
+            # The rest of a line after ';' is a comment, braces included
+            if brace < 0 or 0 <= semicolon < brace:
+                return False
+            position = brace
+            in_comment = True
+        position += 1
+
+
+def node_eval(node: chess.pgn.GameNode) -> float:
+    """Get a node's [%eval] comment in pawns from White's point of view, NaN if it has none.
+
+    Mates count as +/- EVAL_LIMIT, and evaluations are clipped to it, like position_summary.
+    """
+    score = node.eval()
+    if score is None:
+        return np.nan
+    white = score.white()
+    if white.is_mate():
+        return float(EVAL_LIMIT if white.mate() > 0 else -EVAL_LIMIT)
+    return float(np.clip(white.score() / 100.0, -EVAL_LIMIT, EVAL_LIMIT))
+
+
+def featurize_games(texts: Chunk) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Parse and featurize a chunk of games, skipping ones that fail to parse.
+
+    Returns:
+        (features, evals, plies per game) with a row per position of every
+        kept game, and 0 plies for skipped games
+    """
+    features = []
+    evals = []
+    lengths = np.zeros(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        game = chess.pgn.read_game(io.StringIO(text.decode('utf-8', errors='replace')))
+        if game is None or game.errors:
+            continue
+        game_features, _ = featurize_game(game)
+        features.append(game_features)
+        evals.append([node_eval(game)] + [node_eval(node) for node in game.mainline()])
+        lengths[i] = len(game_features)
+
+    if not features:
+        return np.empty((0, len(SUMMARY_FEATURES)), dtype=np.float32), np.empty(0, dtype=np.float32), lengths
+    return np.concatenate(features), np.concatenate(evals).astype(np.float32), lengths
+
+
+def read_chunks(f: BinaryIO, games_per_chunk: int) -> Iterator[Tuple[Chunk, int]]:
+    """Group game texts into chunks, with the offset just past each chunk."""
+    chunk: Chunk = []
+    for text, offset in read_game_texts(f):
+        chunk.append(text)
+        if len(chunk) >= games_per_chunk:
+            yield chunk, offset
+            chunk = []
+    if chunk:
+        yield chunk, offset
+
+
+def load_manifest(run_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(run_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(run_dir: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(run_dir, MANIFEST)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, path)
+
+
+def import_pgn(
+    path: str,
+    dataset_dir: str,
+    run: Optional[str] = None,
+    workers: Optional[int] = 1,
+    games_per_chunk: int = 100,
+    shard_size: int = 262_144,
+    resume: bool = True
+) -> Dict[str, Any]:
+    """Featurize every game of a PGN file into Parquet shards of a dataset.
+
+    The file is streamed: games are split off in this process, parsed and
+    featurized in chunks by worker processes, and written in file order as
+    shards of about shard_size positions to
+    dataset_dir/run=<run>/pairing=pgn/part-<n>.parquet, the layout
+    DatasetWriter uses, so data.load_data reads them the same way. At most
+    two chunks per worker are in flight, so memory stays bounded.
+
+    After each shard, the offset reached in the (uncompressed) file is saved
+    in the run's _import.json; an interrupted import resumes from there.
+    Positions take their eval from the game's [%eval] comments.
+
+    Args:
+        path: PGN file, optionally compressed (.gz, .bz2, .xz)
+        dataset_dir: Dataset directory
+        run: Run partition name, defaults to the file name
+        workers: Processes featurizing games; None uses every core
+        games_per_chunk: Games sent to a worker at once
+        shard_size: Positions per shard
+        resume: Continue an earlier import of the same file into the same run;
+            otherwise the run's earlier shards are deleted
+
+    Returns:
+        Dict with 'games' (imported), 'skipped', 'positions', 'shards' and 'offset'
+    """
+    run = run if run is not None else os.path.basename(path)
+    run_dir = os.path.join(dataset_dir, f"run={quote(run, safe='')}")
+    shard_dir = os.path.join(run_dir, "pairing=pgn")
+    os.makedirs(shard_dir, exist_ok=True)
+
+    manifest = load_manifest(run_dir) if resume else None
+    if manifest is None or manifest['source'] != os.path.abspath(path):
+        manifest = {'source': os.path.abspath(path), 'offset': 0, 'games': 0, 'skipped': 0, 'positions': 0, 'shards': 0}
+        # Starting over: shards left by an earlier import would be read along with the new ones
+        for stale_path in glob.glob(os.path.join(shard_dir, "part-*.parquet")) + glob.glob(os.path.join(shard_dir, ".part-*.tmp")):
+            os.remove(stale_path)
+
+    buffered: List[Any] = []
+    buffered_rows = 0
+    state = {'games': manifest['games'], 'skipped': manifest['skipped'], 'positions': manifest['positions']}
+
+    def add_chunk(result: Tuple[np.ndarray, np.ndarray, np.ndarray], offset: int) -> None:
+        nonlocal buffered_rows
+        features, evals, lengths = result
+        kept = lengths[lengths > 0]
+        games = np.repeat(np.arange(state['games'], state['games'] + len(kept)), kept)
+        plies = np.arange(len(features)) - np.repeat(np.cumsum(kept) - kept, kept)
+        state['games'] += len(kept)
+        state['skipped'] += len(lengths) - len(kept)
+        state['positions'] += len(features)
+        buffered.append(features_to_table(features, evals, games, plies))
+        buffered_rows += len(features)
+        if buffered_rows >= shard_size:
+            write_shard(offset)
+
+    def write_shard(offset: int) -> None:
+        nonlocal buffered, buffered_rows
+        if buffered:
+            shard_path = os.path.join(shard_dir, f"part-{manifest['shards']:05d}.parquet")
+            temp_path = os.path.join(shard_dir, f".{os.path.basename(shard_path)}.tmp")
+            pq.write_table(pa.concat_tables(buffered), temp_path)
+            os.replace(temp_path, shard_path)
+            manifest['shards'] += 1
+        buffered = []
+        buffered_rows = 0
+        manifest.update(state, offset=offset)
+        save_manifest(run_dir, manifest)
+
+    workers = workers or os.cpu_count() or 1
+    with open_pgn(path) as f:
+        f.seek(manifest['offset'])
+        offset = manifest['offset']
+        chunks = read_chunks(f, games_per_chunk)
+        if workers == 1:
+            for chunk, offset in chunks:
+                add_chunk(featurize_games(chunk), offset)
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                pending = deque()
+                for chunk, offset in chunks:
+                    pending.append((executor.submit(featurize_games, chunk), offset))
+                    if len(pending) >= 2 * workers:
+                        future, done_offset = pending.popleft()
+                        add_chunk(future.result(), done_offset)
+                while pending:
+                    future, done_offset = pending.popleft()
+                    add_chunk(future.result(), done_offset)
+        write_shard(offset)
+
+    return {key: manifest[key] for key in ('games', 'skipped', 'positions', 'shards', 'offset')}
@@ -1,11 +1,11 @@
 from chess_analysis.engine import CustomModelEngine
 from .analysis import Analysis
-from .analysis_steps import evaluate_board, process_eval, random_move, extract_move, human_move
+from .analysis_steps import evaluate_board, probe_board, process_eval, book_move, random_move, extract_move, human_move
 
-use_engine = Analysis() | evaluate_board | process_eval
-use_custom = lambda path: Analysis(engine=CustomModelEngine(path)) | evaluate_board | process_eval
-use_random = Analysis() | random_move
-use_human = Analysis() | human_move
+use_engine = Analysis(records=True) | probe_board | evaluate_board | process_eval | book_move
+use_custom = lambda path: Analysis(engine=CustomModelEngine(path), records=True) | evaluate_board | process_eval
+use_random = Analysis(records=True) | random_move
+use_human = Analysis(records=True) | human_move
 
 def player(name: str, pipeline: Analysis):
     pipeline |= extract_move
@@ -0,0 +1,240 @@
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import chess
+import chess.polyglot
+import numpy as np
+import pandas as pd
+from .cache import CacheKey, EvaluationCache
+from .engine import make_analysis_result
+from .features import SUMMARY_FEATURES
+from .history import PositionHistory
+
+# Evaluations are exported in pawns, clipped like position_summary's
+EVAL_LIMIT = 20
+
+# Keeps the deepest result for each position
+PUT_RESULT = """
+    INSERT INTO positions (key, score_type, score_value, best_move, depth, engine)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(key) DO UPDATE SET
+        score_type = excluded.score_type,
+        score_value = excluded.score_value,
+        best_move = excluded.best_move,
+        depth = excluded.depth,
+        engine = excluded.engine
+    WHERE positions.depth IS NULL OR excluded.depth > positions.depth
+"""
+
+
+def signed_key(zobrist: int) -> int:
+    """Map a 64-bit Zobrist hash to SQLite's signed 64-bit integers."""
+    return zobrist - (1 << 64) if zobrist >= 1 << 63 else zobrist
+
+
+class PositionStore(EvaluationCache):
+    """SQLite store with one row per distinct position, keyed by Zobrist hash.
+
+    Each row holds the position's features (as first seen: clocks and move
+    numbers are not part of the hash), the deepest engine result seen for
+    it with its depth and engine name, and how often it occurred in games.
+
+    It is also an EvaluationCache, so a CachedEngine (or share_evaluations)
+    using it looks positions up before searching them. Several processes can
+    use the same file; each opens its own connection.
+
+    Engine results are buffered and written batch_size at a time in one
+    transaction, like add_game's rows; flush() (or close()) writes the rest.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0, batch_size: int = 512):
+        """Open the store, creating it if needed.
+
+        Args:
+            path: SQLite database file
+            timeout: Seconds to wait for another process's write to finish
+            batch_size: Engine results buffered before writing them
+        """
+        self.path = path
+        self.timeout = timeout
+        self.batch_size = batch_size
+        # Deepest unwritten result per key, as a row for PUT_RESULT
+        self.pending: Dict[int, Tuple[int, str, int, Optional[str], int, str]] = {}
+        self.max_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        feature_columns = ", ".join(f"{feature} REAL" for feature in SUMMARY_FEATURES)
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS positions (
+                key INTEGER PRIMARY KEY,
+                fen TEXT,
+                count INTEGER NOT NULL DEFAULT 0,
+                {feature_columns},
+                score_type TEXT,
+                score_value INTEGER,
+                best_move TEXT,
+                depth INTEGER,
+                engine TEXT
+            )
+        """)
+
+    def __reduce__(self):
+        # Pickled by path, each process opening its own connection
+        return (PositionStore, (self.path, self.timeout, self.batch_size))
+
+    def __len__(self) -> int:
+        with self.lock:
+            self._write_pending()
+            return self.connection.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+    def close(self) -> None:
+        """Write buffered results and close the database connection."""
+        self.flush()
+        self.connection.close()
+
+    def flush(self) -> None:
+        """Write every buffered engine result."""
+        with self.lock:
+            self._write_pending()
+
+    def _write_pending(self, statements: Tuple[Tuple[str, List[tuple]], ...] = ()) -> None:
+        """Write buffered results, plus any other statements, in one transaction (lock held)."""
+        batches = [(PUT_RESULT, list(self.pending.values()))] if self.pending else []
+        batches += [(sql, rows) for sql, rows in statements if rows]
+        if not batches:
+            return
+        self.connection.execute("BEGIN")
+        try:
+            for sql, rows in batches:
+                self.connection.executemany(sql, rows)
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.pending.clear()
+
+    def get(self, key: CacheKey, depth: int, multipv: int = 1) -> Optional[Dict[str, Any]]:
+        """Get the stored result of an engine if searched at least as deep as requested.
+
+        Only single-line results are stored, so multipv > 1 always misses.
+        """
+        name, zobrist = key
+        row = None
+        if multipv <= 1:
+            with self.lock:
+                pending = self.pending.get(signed_key(zobrist))
+                if pending is not None and pending[5] == name and pending[4] >= depth:
+                    row = pending[1:5]
+            if row is None:
+                with self.lock:
+                    row = self.connection.execute(
+                        "SELECT score_type, score_value, best_move, depth FROM positions "
+                        "WHERE key = ? AND engine = ? AND depth >= ?",
+                        (signed_key(zobrist), name, depth)
+                    ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        score_type, score_value, best_move, stored_depth = row
+        score = {'type': score_type, 'value': score_value}
+        lines = [{'move': best_move, 'score': score, 'pv': [best_move]}] if best_move else []
+        return make_analysis_result(score, lines, stored_depth)
+
+    def put(self, key: CacheKey, result: Dict[str, Any], multipv: int = 1) -> None:
+        """Store a result unless one at least as deep is already stored.
+
+        The result is buffered, and written with the next batch_size results.
+        """
+        name, zobrist = key
+        row = (signed_key(zobrist), result['score']['type'], result['score']['value'],
+               result['best_move'], result['depth'], name)
+        with self.lock:
+            pending = self.pending.get(row[0])
+            if pending is None or row[4] > pending[4]:
+                self.pending[row[0]] = row
+            if len(self.pending) >= self.batch_size:
+                self._write_pending()
+
+    def lookup(self, board: chess.Board) -> Optional[Dict[str, Any]]:
+        """Get everything stored about a position, or None if it was never seen."""
+        with self.lock:
+            self._write_pending()
+            cursor = self.connection.execute(
+                "SELECT * FROM positions WHERE key = ?", (signed_key(chess.polyglot.zobrist_hash(board)),)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([column[0] for column in cursor.description], row))
+
+    def add_game(self, position_history: PositionHistory) -> None:
+        """Count every position of a game, storing the features of new ones."""
+        features = np.column_stack([position_history.column(feature) for feature in SUMMARY_FEATURES])
+        rows = []
+        for board, values in zip(position_history.boards(), features):
+            rows.append((
+                signed_key(chess.polyglot.zobrist_hash(board)),
+                board.fen(),
+                *[None if np.isnan(value) else float(value) for value in values]
+            ))
+
+        columns = ", ".join(SUMMARY_FEATURES)
+        placeholders = ", ".join("?" for _ in range(len(SUMMARY_FEATURES) + 2))
+        updates = ", ".join(f"{feature} = COALESCE(positions.{feature}, excluded.{feature})" for feature in SUMMARY_FEATURES)
+        sql = f"""
+            INSERT INTO positions (key, fen, {columns}, count) VALUES ({placeholders}, 1)
+            ON CONFLICT(key) DO UPDATE SET
+                count = positions.count + 1,
+                fen = COALESCE(positions.fen, excluded.fen),
+                {updates}
+        """
+        # Written along with the buffered engine results, in one transaction
+        with self.lock:
+            self._write_pending(((sql, rows),))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Get every counted position with its features, best eval and provenance.
+
+        'eval' is in pawns from White's point of view, clipped to +/- 20 like
+        position_summary (mates at the limit); NaN if never evaluated.
+        """
+        columns = ", ".join(SUMMARY_FEATURES)
+        with self.lock:
+            self._write_pending()
+            df = pd.read_sql_query(
+                f"SELECT key, fen, count, {columns}, score_type, score_value, depth, engine "
+                "FROM positions WHERE count > 0 ORDER BY key",
+                self.connection
+            )
+        pawns = np.where(df['score_type'] == 'cp', df['score_value'] / 100.0, np.sign(df['score_value']) * EVAL_LIMIT)
+        df['eval'] = np.where(df['score_type'].isna(), np.nan, np.clip(pawns.astype(float), -EVAL_LIMIT, EVAL_LIMIT))
+        return df
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and the number of stored positions."""
+        lookups = self.hits + self.misses
+        with self.lock:
+            self._write_pending()
+            size, occurrences = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(count), 0) FROM positions"
+            ).fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': size,
+            'occurrences': occurrences,
+        }
+
+    def load(self, path: Optional[str] = None) -> None:
+        """Nothing to do: the store is always on disk."""
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write buffered results (the store is otherwise always on disk)."""
+        self.flush()
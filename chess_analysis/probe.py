@@ -0,0 +1,194 @@
+from typing import Any, Dict, List, Optional
+import chess
+import chess.polyglot
+import chess.syzygy
+from chess.engine import Limit
+from .engine import Engine, make_analysis_result
+
+# Same score CustomModelEngine gives a won game
+TABLEBASE_WIN_SCORE = 2000
+# Tablebase results are exact, so they satisfy any requested depth
+TABLEBASE_DEPTH = 255
+
+
+class Prober:
+    """Looks positions up in a local Polyglot opening book and Syzygy tablebases."""
+
+    def __init__(self, book_path: Optional[str] = None, tablebase_path: Optional[str] = None, max_pieces: int = 7):
+        """Open the book and tablebases.
+
+        Args:
+            book_path: Path to a Polyglot .bin opening book
+            tablebase_path: Directory (or ';'-separated directories) of Syzygy files
+            max_pieces: Largest number of pieces covered by the tablebases
+        """
+        self.book_path = book_path
+        self.tablebase_path = tablebase_path
+        self.max_pieces = max_pieces
+        self.book = chess.polyglot.open_reader(book_path) if book_path else None
+        self.tablebase = None
+        if tablebase_path:
+            self.tablebase = chess.syzygy.Tablebase()
+            for directory in tablebase_path.split(";"):
+                self.tablebase.add_directory(directory)
+
+    def __reduce__(self):
+        # Pickled by paths, reopening the files
+        return (Prober, (self.book_path, self.tablebase_path, self.max_pieces))
+
+    def probe(self, board: chess.Board) -> Optional[Dict[str, Any]]:
+        """Get a book or tablebase result for a position.
+
+        Returns:
+            Same dict as Engine.analyse plus 'source' ('book' or
+            'tablebase'), or None if neither covers the position. Book
+            results have no score (None)
+        """
+        return self.probe_tablebase(board) or self.probe_book(board)
+
+    def probe_book(self, board: chess.Board) -> Optional[Dict[str, Any]]:
+        """Get the book moves of a position, heaviest first.
+
+        A book only says which moves are played, not how good the position
+        is, so the result's score is None: book moves are for choosing a
+        move (see analysis_steps.book_move), not for evaluating.
+        """
+        if self.book is None:
+            return None
+
+        entries = sorted(self.book.find_all(board), key=lambda entry: entry.weight, reverse=True)
+        if not entries:
+            return None
+
+        lines = [{'move': entry.move.uci(), 'score': None, 'weight': entry.weight} for entry in entries]
+        return {
+            'score': None,
+            'best_move': lines[0]['move'],
+            'mate_in': None,
+            'depth': 0,
+            'lines': lines,
+            'source': 'book',
+        }
+
+    def probe_tablebase(self, board: chess.Board) -> Optional[Dict[str, Any]]:
+        """Get the exact result and a move keeping it from the tablebases.
+
+        Wins are scored like CustomModelEngine's won games; wins and losses
+        spoiled by the fifty-move rule count as draws.
+        """
+        if (self.tablebase is None
+                or chess.popcount(board.occupied) > self.max_pieces
+                or board.castling_rights
+                or board.is_game_over()):
+            return None
+
+        try:
+            wdl = self.tablebase.probe_wdl(board)
+            moves = self._rank_tablebase_moves(board)
+        except KeyError:
+            return None
+
+        side_score = TABLEBASE_WIN_SCORE if wdl == 2 else -TABLEBASE_WIN_SCORE if wdl == -2 else 0
+        score = {'type': 'cp', 'value': side_score if board.turn == chess.WHITE else -side_score}
+        lines = [{'move': moves[0].uci(), 'score': score}] if moves else []
+        result = make_analysis_result(score, lines, TABLEBASE_DEPTH)
+        result['source'] = 'tablebase'
+        return result
+
+    def _rank_tablebase_moves(self, board: chess.Board) -> List[chess.Move]:
+        """Order moves by the result they keep, then by distance to zeroing.
+
+        Winning moves reach a zeroing move (capture or pawn move) soonest,
+        losing moves put it off as long as possible.
+        """
+        ranked = []
+        for move in board.legal_moves:
+            board.push(move)
+            try:
+                wdl = -self.tablebase.probe_wdl(board)
+                distance = abs(self.tablebase.probe_dtz(board))
+            finally:
+                board.pop()
+            ranked.append(((wdl, -distance if wdl > 0 else distance), move))
+
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in ranked]
+
+    def close(self) -> None:
+        """Close the book and tablebase files."""
+        if self.book is not None:
+            self.book.close()
+        if self.tablebase is not None:
+            self.tablebase.close()
+
+
+class ProbingEngine(Engine):
+    """Engine wrapper answering tablebase positions without a search.
+
+    Book positions are still searched, since a book gives no evaluation.
+    """
+
+    def __init__(self, engine: Engine, prober: Prober):
+        """Initialize the probing engine.
+
+        Args:
+            engine: Engine used for positions the prober does not cover
+            prober: Opening book and tablebase prober
+        """
+        self.engine = engine
+        self.prober = prober
+        self.depth = getattr(engine, 'depth', 0)
+        self.name = engine.name
+        self.board = chess.Board()
+
+    def __reduce__(self):
+        return (ProbingEngine, (self.engine, self.prober))
+
+    def set_board(self, board: chess.Board) -> None:
+        """Set the board."""
+        self.board = board
+
+    def get_evaluation(self) -> Dict[str, Any]:
+        """Get the evaluation of the current position.
+
+        Returns:
+            Dict with 'type' ('cp' for centipawns, 'mate' for mate) and 'value'
+        """
+        return self.analyse(self.board)['score']
+
+    def get_best_move(self) -> Optional[str]:
+        """Get the best move in UCI format.
+
+        Returns:
+            UCI move string or None if no move available
+        """
+        return self.analyse(self.board)['best_move']
+
+    def analyse(self, board: chess.Board, multipv: int = 1, limit: Optional[Limit] = None) -> Dict[str, Any]:
+        """Probe the tablebases, searching the position if they do not cover it.
+
+        Args:
+            board: The position to analyse
+            multipv: Number of principal variations to report
+            limit: Search budget passed on to the engine
+
+        Returns:
+            Dict with 'score', 'best_move', 'mate_in', 'depth' and 'lines',
+            plus 'source' when the tablebases answered
+        """
+        result = self.prober.probe_tablebase(board)
+        if result is None:
+            result = self.engine.analyse(board, multipv, limit)
+        return result
+
+    def stop(self) -> None:
+        """Ask a running search to finish early."""
+        self.engine.stop()
+
+    def new_game(self) -> None:
+        """Start a new game on the wrapped engine."""
+        self.engine.new_game()
+
+    def close(self) -> None:
+        """Close the wrapped engine."""
+        self.engine.close()
@@ -0,0 +1,115 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+
+def percentile(sorted_samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(fraction * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+class Profiler:
+    """Collects per-step latencies and engine calls of Analysis pipelines.
+
+    Attach one with `analysis.profiler = Profiler()` (several pipelines may
+    share it). Step times exclude the steps they trigger lazily, and memo
+    replays are counted separately from real runs, as are engine calls
+    answered from an evaluation cache.
+    """
+
+    def __init__(self, max_samples: int = 100_000):
+        """Initialize the profiler.
+
+        Args:
+            max_samples: Latency samples kept per step for percentiles;
+                counts and totals cover every call
+        """
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.engines: Dict[str, Dict[str, Any]] = {}
+        self.caches: Dict[str, Dict[str, Any]] = {}
+
+    def record_step(self, name: str, seconds: float, memoized: bool = False) -> None:
+        """Record one run (or memo replay) of a step."""
+        with self.lock:
+            stats = self.steps.get(name)
+            if stats is None:
+                stats = self.steps[name] = {'calls': 0, 'memo_hits': 0, 'total': 0.0, 'samples': []}
+            stats['calls'] += 1
+            stats['total'] += seconds
+            if memoized:
+                stats['memo_hits'] += 1
+            elif len(stats['samples']) < self.max_samples:
+                stats['samples'].append(seconds)
+
+    def record_engine_call(self, name: str, seconds: float, cached: bool = False) -> None:
+        """Record one engine search, or one answered from a cache (see CachedEngine.last_hit)."""
+        with self.lock:
+            calls = self.caches if cached else self.engines
+            stats = calls.setdefault(name, {'calls': 0, 'total': 0.0})
+            stats['calls'] += 1
+            stats['total'] += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the statistics, times in seconds.
+
+        Returns:
+            Dict with 'steps' (calls, memo_hits, total, mean, p50, p90, p99
+            and max per step, percentiles over real runs), 'engines'
+            (calls, total and mean of real searches per engine name) and
+            'caches' (the same for calls answered from a cache)
+        """
+        with self.lock:
+            steps = {}
+            for name, stats in self.steps.items():
+                samples = sorted(stats['samples'])
+                steps[name] = {
+                    'calls': stats['calls'],
+                    'memo_hits': stats['memo_hits'],
+                    'total': stats['total'],
+                    'mean': stats['total'] / stats['calls'],
+                    'p50': percentile(samples, 0.5),
+                    'p90': percentile(samples, 0.9),
+                    'p99': percentile(samples, 0.99),
+                    'max': samples[-1] if samples else 0.0,
+                }
+            engines, caches = [
+                {name: {**stats, 'mean': stats['total'] / stats['calls']} for name, stats in calls.items()}
+                for calls in (self.engines, self.caches)
+            ]
+        return {'steps': steps, 'engines': engines, 'caches': caches}
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        """Get the statistics as JSON, also writing them to path if given."""
+        text = json.dumps(self.to_dict(), indent=2)
+        if path:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+    def report(self) -> str:
+        """Format the statistics as a table, slowest steps first, times in ms."""
+        stats = self.to_dict()
+        lines = [
+            f"{'Step':30} {'Calls':>8} {'Memo':>8} {'Total':>10} {'Mean':>8} {'p50':>8} {'p90':>8} {'p99':>8}",
+            "-" * 96,
+        ]
+        for name, step in sorted(stats['steps'].items(), key=lambda item: item[1]['total'], reverse=True):
+            lines.append(
+                f"{name:30} {step['calls']:8d} {step['memo_hits']:8d} {step['total'] * 1000:10.1f} "
+                f"{step['mean'] * 1000:8.3f} {step['p50'] * 1000:8.3f} {step['p90'] * 1000:8.3f} {step['p99'] * 1000:8.3f}"
+            )
+        for kind in ['engines', 'caches']:
+            for name, engine in stats[kind].items():
+                lines.append(
+                    f"{kind[:-1] + ' ' + name:30} {engine['calls']:8d} {'':8} {engine['total'] * 1000:10.1f} {engine['mean'] * 1000:8.3f}"
+                )
+        return "\n".join(lines)
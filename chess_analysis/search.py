@@ -0,0 +1,328 @@
+import time
+from typing import Any, Callable, Dict, List, Optional
+import chess
+import chess.polyglot
+
+MATE_SCORE = 100_000
+MATE_THRESHOLD = MATE_SCORE - 1_000
+MAX_PLY = 128
+
+# Transposition table bound flags
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Piece values used for MVV-LVA ordering, indexed by piece type
+ORDER_VALUES = [0, 1, 3, 3, 5, 9, 20]
+
+Evaluate = Callable[[chess.Board], int]
+EvaluateMoves = Callable[[chess.Board, List[chess.Move]], List[int]]
+MakeMove = Callable[[chess.Board, chess.Move], None]
+UnmakeMove = Callable[[chess.Board], Any]
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when it is stopped or a budget runs out."""
+    pass
+
+
+class AlphaBetaSearch:
+    """Negamax alpha-beta search with iterative deepening over a static evaluation."""
+
+    def __init__(
+        self,
+        evaluate: Evaluate,
+        evaluate_moves: Optional[EvaluateMoves] = None,
+        tt_size: int = 1_000_000,
+        quiescence: bool = True,
+        make_move: MakeMove = chess.Board.push,
+        unmake_move: UnmakeMove = chess.Board.pop,
+        leaf_batch: int = 8
+    ):
+        """Initialize the search.
+
+        Args:
+            evaluate: Score in centipawns, from White's point of view, of a
+                position that is not game over
+            evaluate_moves: Optional batched version of evaluate scoring the
+                position after each move, used to evaluate the leaves below
+                a node a few at a time
+            tt_size: Maximum number of transposition table entries
+            quiescence: Whether to extend leaves with a capture-only search
+            make_move: Pushes a move during the search, e.g. through a
+                features.FeatureAccumulator the evaluation reads from
+            unmake_move: Pops the last move pushed with make_move
+            leaf_batch: Leaves scored per evaluate_moves call, in move
+                order, so a beta cutoff skips the batches after it
+        """
+        self.evaluate = evaluate
+        self.evaluate_moves = evaluate_moves
+        self.tt_size = tt_size
+        self.quiescence = quiescence
+        self.make_move = make_move
+        self.unmake_move = unmake_move
+        self.leaf_batch = leaf_batch
+        self.tt: Dict[int, tuple[int, int, int, Optional[chess.Move]]] = {}
+        self.killers: List[List[Optional[chess.Move]]] = [[None, None] for _ in range(MAX_PLY)]
+        self.nodes = 0
+        self.max_nodes: Optional[int] = None
+        self.deadline: Optional[float] = None
+        self.stopped = False
+
+    def search(
+        self,
+        board: chess.Board,
+        depth: int,
+        max_nodes: Optional[int] = None,
+        movetime: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Search a position with iterative deepening.
+
+        Args:
+            board: Position to search, restored before returning
+            depth: Maximum depth in plies
+            max_nodes: Optional node budget
+            movetime: Optional time budget in seconds
+
+        Returns:
+            Dict with 'move' (best move or None), 'score' ('cp' or 'mate'
+            dict from White's point of view), 'depth' (last completed
+            iteration), 'pv', 'nodes', 'time' and 'nps'
+        """
+        start = time.perf_counter()
+        self.nodes = 0
+        self.max_nodes = max_nodes
+        self.deadline = start + movetime if movetime is not None else None
+        self.stopped = False
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        if len(self.tt) > self.tt_size:
+            self.tt.clear()
+
+        legal_moves = list(board.legal_moves)
+        best_move = legal_moves[0] if legal_moves else None
+        best_score = 0
+        completed_depth = 0
+
+        if legal_moves:
+            stack_size = len(board.move_stack)
+            for current_depth in range(1, depth + 1):
+                try:
+                    best_score = self._negamax(board, current_depth, -MATE_SCORE, MATE_SCORE, 0)
+                except SearchAborted:
+                    while len(board.move_stack) > stack_size:
+                        self.unmake_move(board)
+                    break
+
+                completed_depth = current_depth
+                entry = self.tt.get(chess.polyglot.zobrist_hash(board))
+                if entry is not None and entry[3] is not None:
+                    best_move = entry[3]
+                if abs(best_score) > MATE_THRESHOLD:
+                    break
+
+        elapsed = time.perf_counter() - start
+        score = best_score if board.turn == chess.WHITE else -best_score
+        return {
+            'move': best_move,
+            'score': score_to_dict(score),
+            'depth': completed_depth,
+            'pv': self._principal_variation(board, completed_depth),
+            'nodes': self.nodes,
+            'time': elapsed,
+            'nps': int(self.nodes / elapsed) if elapsed > 0 else 0,
+        }
+
+    def clear(self) -> None:
+        """Forget the transposition table, e.g. between games."""
+        self.tt.clear()
+
+    def stop(self) -> None:
+        """Abort the running search, keeping the last completed iteration."""
+        self.stopped = True
+
+    def _check_limits(self) -> None:
+        self.nodes += 1
+        if self.stopped:
+            raise SearchAborted()
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchAborted()
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchAborted()
+
+    def _static(self, board: chess.Board) -> int:
+        """Static evaluation from the side to move's point of view."""
+        score = self.evaluate(board)
+        return score if board.turn == chess.WHITE else -score
+
+    def _negamax(self, board: chess.Board, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self._check_limits()
+
+        if ply > 0 and (board.is_insufficient_material() or board.halfmove_clock >= 100 or board.is_repetition(2)):
+            return 0
+
+        legal_moves = list(board.legal_moves)
+        if not legal_moves:
+            return -(MATE_SCORE - ply) if board.is_check() else 0
+
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self._quiescence(board, alpha, beta, ply) if self.quiescence else self._static(board)
+
+        key = chess.polyglot.zobrist_hash(board)
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, entry_score, flag, tt_move = entry
+            if ply > 0 and entry_depth >= depth:
+                entry_score = score_from_tt(entry_score, ply)
+                if (flag == EXACT
+                        or (flag == LOWER and entry_score >= beta)
+                        or (flag == UPPER and entry_score <= alpha)):
+                    return entry_score
+
+        # Leaves below this node are scored in batches of ordered moves, each
+        # batch only once the search reaches it
+        batched = depth == 1 and self.evaluate_moves is not None
+        leaf_scores: Dict[chess.Move, int] = {}
+        sign = 1 if board.turn == chess.WHITE else -1
+
+        original_alpha = alpha
+        best_score = -MATE_SCORE
+        best_move = None
+        ordered_moves = self._order_moves(board, legal_moves, tt_move, ply)
+        for index, move in enumerate(ordered_moves):
+            if batched and move not in leaf_scores:
+                batch = ordered_moves[index:index + self.leaf_batch]
+                for batch_move, score in zip(batch, self.evaluate_moves(board, batch)):
+                    leaf_scores[batch_move] = -sign * score
+
+            self.make_move(board, move)
+            if batched:
+                score = -self._leaf(board, -beta, -alpha, ply + 1, leaf_scores[move])
+            else:
+                score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            self.unmake_move(board)
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not board.is_capture(move) and self.killers[ply][0] != move:
+                    self.killers[ply] = [move, self.killers[ply][0]]
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt[key] = (depth, score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    def _leaf(self, board: chess.Board, alpha: int, beta: int, ply: int, static_score: int) -> int:
+        """Depth-0 node whose static evaluation is already known."""
+        self._check_limits()
+
+        if board.is_insufficient_material() or board.halfmove_clock >= 100 or board.is_repetition(2):
+            return 0
+        if not any(board.generate_legal_moves()):
+            return -(MATE_SCORE - ply) if board.is_check() else 0
+        if not self.quiescence:
+            return static_score
+        return self._quiescence(board, alpha, beta, ply, static_score)
+
+    def _quiescence(self, board: chess.Board, alpha: int, beta: int, ply: int, static_score: Optional[int] = None) -> int:
+        if static_score is None:
+            self._check_limits()
+            if not any(board.generate_legal_moves()):
+                return -(MATE_SCORE - ply) if board.is_check() else 0
+            static_score = self._static(board)
+
+        if static_score >= beta or ply >= MAX_PLY - 1:
+            return static_score
+        if static_score > alpha:
+            alpha = static_score
+
+        captures = sorted(board.generate_legal_captures(), key=lambda move: mvv_lva(board, move), reverse=True)
+        for move in captures:
+            self.make_move(board, move)
+            score = -self._quiescence(board, -beta, -alpha, ply + 1)
+            self.unmake_move(board)
+
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _order_moves(self, board: chess.Board, moves: List[chess.Move], tt_move: Optional[chess.Move], ply: int) -> List[chess.Move]:
+        """Order moves: TT move, captures by MVV-LVA, promotions, killers, then quiet moves."""
+        killers = self.killers[ply]
+
+        def priority(move: chess.Move) -> int:
+            if move == tt_move:
+                return 1_000_000
+            if board.is_capture(move):
+                return 10_000 + mvv_lva(board, move)
+            if move.promotion:
+                return 9_000 + move.promotion
+            if move == killers[0]:
+                return 8_000
+            if move == killers[1]:
+                return 7_000
+            return 0
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def _principal_variation(self, board: chess.Board, depth: int) -> List[chess.Move]:
+        """Follow best moves stored in the transposition table."""
+        pv = []
+        seen = set()
+        for _ in range(max(depth, 1)):
+            key = chess.polyglot.zobrist_hash(board)
+            entry = self.tt.get(key)
+            if entry is None or entry[3] is None or key in seen or not board.is_legal(entry[3]):
+                break
+            seen.add(key)
+            pv.append(entry[3])
+            board.push(entry[3])
+
+        for _ in pv:
+            board.pop()
+        return pv
+
+
+def mvv_lva(board: chess.Board, move: chess.Move) -> int:
+    """Most valuable victim, least valuable attacker score of a capture."""
+    if board.is_en_passant(move):
+        victim = chess.PAWN
+    else:
+        victim = board.piece_type_at(move.to_square) or 0
+    attacker = board.piece_type_at(move.from_square) or 0
+    return ORDER_VALUES[victim] * 100 - ORDER_VALUES[attacker]
+
+
+def score_to_tt(score: int, ply: int) -> int:
+    """Make mate scores relative to the stored node instead of the root."""
+    if score > MATE_THRESHOLD:
+        return score + ply
+    if score < -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_tt(score: int, ply: int) -> int:
+    """Inverse of score_to_tt."""
+    if score > MATE_THRESHOLD:
+        return score - ply
+    if score < -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+def score_to_dict(score: int) -> Dict[str, Any]:
+    """Convert a search score into the Engine evaluation format."""
+    if abs(score) > MATE_THRESHOLD:
+        mate_in = (MATE_SCORE - abs(score) + 1) // 2
+        return {'type': 'mate', 'value': mate_in if score > 0 else -mate_in}
+    return {'type': 'cp', 'value': score}
@@ -0,0 +1,259 @@
+import os
+import subprocess
+import threading
+from typing import Any, Callable, Dict, List, Optional
+import chess
+from chess.engine import Limit
+from .engine import Engine, go_command, lines_from_info, make_analysis_result, parse_info
+
+InfoCallback = Callable[[Dict[str, Any]], None]
+
+
+def position_command(board: chess.Board) -> str:
+    """Build the UCI 'position' command for a board's root and move stack."""
+    root = board.root()
+    start = "startpos" if root.fen() == chess.STARTING_FEN else f"fen {root.fen()}"
+    moves = " ".join(move.uci() for move in board.move_stack)
+    return f"position {start} moves {moves}" if moves else f"position {start}"
+
+
+class SearchOutput:
+    """Collects the output lines of one UCI search into an analysis result."""
+
+    def __init__(self, board: chess.Board, callbacks: List[InfoCallback]):
+        self.board = board
+        self.callbacks = callbacks
+        self.infos: Dict[int, Dict[str, Any]] = {}
+        self.depth = 0
+        self.nodes = 0
+        self.nps = 0
+
+    def feed(self, line: str) -> bool:
+        """Process an output line, returning True once 'bestmove' is read."""
+        if line.startswith("bestmove"):
+            return True
+        if not line.startswith("info"):
+            return False
+
+        info = parse_info(line)
+        for callback in self.callbacks:
+            callback(info)
+
+        self.nodes = info.get('nodes', self.nodes)
+        self.nps = info.get('nps', self.nps)
+        if 'score' in info and 'bound' not in info:
+            self.infos[info.get('multipv', 1)] = info
+            self.depth = max(self.depth, info.get('depth', 0))
+        return False
+
+    def result(self) -> Dict[str, Any]:
+        """Build the Engine.analyse result, scores from White's point of view."""
+        lines = lines_from_info(self.infos, self.board)
+        score = lines[0]['score'] if lines else {'type': 'cp', 'value': 0}
+        result = make_analysis_result(score, lines, self.depth)
+        result['nodes'] = self.nodes
+        result['nps'] = self.nps
+        return result
+
+
+class UCIEngine(Engine):
+    """Engine that talks to a UCI binary directly over pipes.
+
+    Positions are sent as 'position startpos moves ...' from the game's root,
+    and 'ucinewgame' is only sent on request, so the engine keeps its hash
+    table between the moves of a game.
+    """
+
+    def __init__(
+        self,
+        path: str = "stockfish",
+        depth: int = 15,
+        options: Optional[Dict[str, Any]] = None,
+        on_info: Optional[InfoCallback] = None
+    ):
+        """Start the engine process and run the UCI handshake.
+
+        Args:
+            path: Path to the UCI executable
+            depth: Search depth when no limit is given
+            options: UCI options to set, e.g. {'Threads': 2, 'Hash': 256}
+            on_info: Callback receiving every parsed 'info' line
+        """
+        self.path = path
+        self.depth = depth
+        self.options = dict(options or {})
+        self.name = os.path.basename(path)
+        self.board = chess.Board()
+        self.callbacks: List[InfoCallback] = [on_info] if on_info else []
+        self.engine_id: Dict[str, str] = {}
+        self.engine_options: Dict[str, str] = {}
+        self.multipv = 1
+        self.position = None
+        self.lock = threading.Lock()
+
+        self.process: Optional[subprocess.Popen] = None
+        self.start()
+
+    def start(self) -> None:
+        """Start the engine process and run the UCI handshake, if not running."""
+        if self.process is not None and self.process.poll() is None:
+            return
+        self.process = subprocess.Popen(
+            [self.path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            bufsize=1
+        )
+        self.multipv = 1
+        self.position = None
+
+        self.send("uci")
+        while True:
+            line = self.read_line()
+            if line == "uciok":
+                break
+            tokens = line.split()
+            if line.startswith("id ") and len(tokens) > 2:
+                self.engine_id[tokens[1]] = " ".join(tokens[2:])
+            elif line.startswith("option name "):
+                name = line[len("option name "):].split(" type ")[0]
+                self.engine_options[name] = line
+
+        for name, value in self.options.items():
+            self.setoption(name, value)
+        self.ucinewgame()
+
+    def __reduce__(self):
+        # Pickled by configuration (e.g. for Analysis.map), starting a new
+        # process; info callbacks are not carried over
+        return (UCIEngine, (self.path, self.depth, self.options))
+
+    def send(self, command: str) -> None:
+        """Send a single command line to the engine, restarting it if it was closed."""
+        if self.process is None:
+            self.start()
+        with self.lock:
+            if self.process.stdin is None:
+                raise BrokenPipeError()
+            self.process.stdin.write(f"{command}\n")
+            self.process.stdin.flush()
+
+    def read_line(self) -> str:
+        """Read one line of engine output."""
+        if self.process.stdout is None:
+            raise BrokenPipeError()
+        line = self.process.stdout.readline()
+        if not line:
+            raise EOFError(f"UCI engine {self.path} exited (code {self.process.poll()})")
+        return line.strip()
+
+    def isready(self) -> None:
+        """Wait until the engine has processed every command sent so far."""
+        self.send("isready")
+        while self.read_line() != "readyok":
+            pass
+
+    def setoption(self, name: str, value: Any) -> None:
+        """Set a UCI option."""
+        if isinstance(value, bool):
+            value = str(value).lower()
+        self.send(f"setoption name {name} value {value}")
+        self.isready()
+
+    def ucinewgame(self) -> None:
+        """Tell the engine the next position is from a different game."""
+        self.send("ucinewgame")
+        self.position = None
+        self.isready()
+
+    def new_game(self) -> None:
+        """Send 'ucinewgame', clearing the engine's hash table."""
+        self.ucinewgame()
+
+    def add_info_callback(self, callback: InfoCallback) -> None:
+        """Register a callback receiving every parsed 'info' line."""
+        self.callbacks.append(callback)
+
+    def set_board(self, board: chess.Board) -> None:
+        """Set the board."""
+        self.board = board
+
+    def get_evaluation(self) -> Dict[str, Any]:
+        """Get the evaluation of the current position.
+
+        Returns:
+            Dict with 'type' ('cp' for centipawns, 'mate' for mate) and 'value'
+        """
+        return self.analyse(self.board)['score']
+
+    def get_best_move(self) -> Optional[str]:
+        """Get the best move in UCI format.
+
+        Returns:
+            UCI move string or None if no move available
+        """
+        return self.analyse(self.board)['best_move']
+
+    def send_position(self, board: chess.Board) -> None:
+        """Send a position as its root plus the moves played, if it changed."""
+        position = position_command(board)
+        if position != self.position:
+            self.send(position)
+            self.position = position
+
+    def analyse(self, board: chess.Board, multipv: int = 1, limit: Optional[Limit] = None) -> Dict[str, Any]:
+        """Evaluate a position and find its best move with a single search.
+
+        Every 'info' line is passed to the callbacks as it arrives.
+
+        Args:
+            board: The position to analyse
+            multipv: Number of principal variations to report
+            limit: Search budget, defaults to the configured depth
+
+        Returns:
+            Dict with 'score', 'best_move', 'mate_in', 'depth', 'lines'
+            (each with its 'pv'), 'nodes' and 'nps', scores from White's
+            point of view
+        """
+        if limit is None:
+            limit = Limit(depth=self.depth)
+        if multipv != self.multipv:
+            self.setoption("MultiPV", multipv)
+            self.multipv = multipv
+
+        self.set_board(board)
+        self.send_position(board)
+        self.send(go_command(board, limit, self.depth))
+
+        output = SearchOutput(board, self.callbacks)
+        while not output.feed(self.read_line()):
+            pass
+        return output.result()
+
+    def stop(self) -> None:
+        """Ask a running search to finish early."""
+        self.send("stop")
+
+    def close(self) -> None:
+        """Shut the engine process down; it is started again if used afterwards."""
+        process, self.process = self.process, None
+        if process is not None and process.poll() is None:
+            try:
+                process.stdin.write("quit\n")
+                process.stdin.flush()
+                process.wait(timeout=5)
+            except (BrokenPipeError, subprocess.TimeoutExpired):
+                process.kill()
+                process.wait()
+
+    def quit(self) -> None:
+        """Shut the engine process down (same as close)."""
+        self.close()
+
+    def __del__(self) -> None:
+        process = getattr(self, 'process', None)
+        if process is not None and process.poll() is None:
+            process.kill()
@@ -3,6 +3,7 @@ import chess
 import chess.svg
 import chess.pgn
 from typing import Optional
+from .adjudication import Adjudication
 from .analysis import Analysis
 
 def display_board(board: chess.Board, move: Optional[chess.Move] = None, pov: Optional[chess.Color] = None) -> None:
@@ -14,10 +15,14 @@ def display_board(board: chess.Board, move: Optional[chess.Move] = None, pov: Op
     )
     display_svg(svg)
 
-def export_game(board: chess.Board, players: list[Analysis]) -> None:
+def export_game(board: chess.Board, players: list[Analysis], adjudication: Optional[Adjudication] = None) -> None:
     game = chess.pgn.Game.from_board(board)
     game.headers['White'] = players[0]['name']
     game.headers['Black'] = players[1]['name']
+    if adjudication is not None:
+        game.headers['Result'] = adjudication.result
+        game.headers['Termination'] = 'adjudication'
+        game.end().comment = f"Adjudicated: {adjudication.reason}"
     
     with open("game.pgn", "w") as f:
         exporter = chess.pgn.FileExporter(f)
@@ -1,10 +1,38 @@
+import os
 import pandas as pd
 import numpy as np
 
-def load_data():
-    df = pd.read_csv('tournament_results.csv')
+STORE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+def load_data(path='tournament_results.csv', columns=None, filter=None, weighted=False):
+    """
+    Load tournament positions as a feature matrix and evaluations.
+    
+    Args:
+        path (str): CSV file, directory of a Parquet dataset written with
+            run_tournament(dataset_dir=...) or pgn_import.import_pgn, or PositionStore database (.db, .sqlite)
+            to load each distinct evaluated position once
+        columns (list): Features to load, every numerical one by default. A
+            Parquet dataset only decodes these columns
+        filter: pyarrow.dataset expression selecting rows of a Parquet dataset,
+            e.g. ds.field('run') == '42'
+        weighted (bool): With a PositionStore, also return how often each position
+            occurred, for use as sample weights
+    
+    Returns:
+        tuple: (X, y, feature_names), plus the weights if weighted; float32
+            arrays for a Parquet dataset or PositionStore
+    """
+    if path.endswith(STORE_EXTENSIONS):
+        return load_store_data(path, columns, weighted)
+    if os.path.isdir(path):
+        return load_dataset_data(path, columns, filter)
+    
+    df = pd.read_csv(path)
 
     numerical_columns = df.select_dtypes(include=[np.number, bool]).columns.tolist()
+    if columns is not None:
+        numerical_columns = [column for column in numerical_columns if column in columns or column == 'eval']
     df_numerical = df[numerical_columns].copy()
     eval_column = df_numerical['eval'].copy()
     df_numerical = df_numerical.drop('eval', axis=1)
@@ -16,4 +44,37 @@ def load_data():
     y = eval_column.values
     feature_names = df_numerical.columns.tolist()
 
-    return X, y, feature_names
\ No newline at end of file
+    return X, y, feature_names
+
+def load_dataset_data(path, columns=None, filter=None):
+    from chess_analysis.dataset import SUMMARY_FEATURES, load_table, table_to_matrix
+
+    feature_names = list(columns) if columns is not None else list(SUMMARY_FEATURES)
+    table = load_table(path, feature_names + ['eval'], filter)
+
+    X = table_to_matrix(table.select(feature_names))
+    y = table_to_matrix(table.select(['eval']))[:, 0]
+
+    print("Processed data shape:", X.shape)
+    print("Processed columns (without eval):", feature_names)
+
+    return X, y, feature_names
+
+def load_store_data(path, columns=None, weighted=False):
+    from chess_analysis.position_store import SUMMARY_FEATURES, PositionStore
+
+    store = PositionStore(path)
+    df = store.to_dataframe()
+    store.close()
+    df = df[df['eval'].notna()]
+
+    feature_names = list(columns) if columns is not None else list(SUMMARY_FEATURES)
+    X = df[feature_names].to_numpy(dtype=np.float32)
+    y = df['eval'].to_numpy(dtype=np.float32)
+
+    print("Processed data shape:", X.shape, f"({int(df['count'].sum())} occurrences)")
+    print("Processed columns (without eval):", feature_names)
+
+    if weighted:
+        return X, y, feature_names, df['count'].to_numpy(dtype=np.float32)
+    return X, y, feature_names
@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+PLAYING_ENGINE = os.path.join(os.path.dirname(__file__), "fake_playing_engine.py")
+
+
+@pytest.fixture(scope="session")
+def stockfish(tmp_path_factory):
+    """Put the fake playing engine first on PATH as "stockfish".
+
+    Importing chess_analysis.auto (and the modules built on it) starts the
+    default pipelines' "stockfish"; tests doing so request this first.
+    """
+    bin_dir = tmp_path_factory.mktemp("bin")
+    os.symlink(PLAYING_ENGINE, bin_dir / "stockfish")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+        yield str(bin_dir / "stockfish")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Minimal UCI engine that follows the position, for playing whole games in tests.
+
+'go' answers at once with the legal moves in UCI order as the MultiPV lines,
+each scored by material for the side to move; the same position always gets
+the same answer.
+"""
+import sys
+
+import chess
+
+VALUES = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 300, chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0}
+
+
+def send(line):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+def material(board):
+    return sum(VALUES[piece.piece_type] * (1 if piece.color == board.turn else -1) for piece in board.piece_map().values())
+
+
+def set_position(tokens):
+    moves = tokens.index("moves") if "moves" in tokens else len(tokens)
+    board = chess.Board() if tokens[1] == "startpos" else chess.Board(" ".join(tokens[2:moves]))
+    for move in tokens[moves + 1:]:
+        board.push_uci(move)
+    return board
+
+
+def main():
+    multipv = 1
+    board = chess.Board()
+    for command in sys.stdin:
+        tokens = command.split()
+        if not tokens:
+            continue
+        if tokens[0] == "uci":
+            send("id name Fake Playing UCI")
+            send("id author chess_analysis tests")
+            send("option name MultiPV type spin default 1 min 1 max 5")
+            send("uciok")
+        elif tokens[0] == "isready":
+            send("readyok")
+        elif tokens[:3] == ["setoption", "name", "MultiPV"]:
+            multipv = int(tokens[4])
+        elif tokens[0] == "position":
+            board = set_position(tokens)
+        elif tokens[0] == "go":
+            depth = int(tokens[tokens.index("depth") + 1]) if "depth" in tokens else 1
+            moves = sorted(board.legal_moves, key=lambda move: move.uci())
+            if not moves:
+                send(f"info depth 0 score {'mate 0' if board.is_check() else 'cp 0'}")
+                send("bestmove (none)")
+                continue
+            for k, move in enumerate(moves[:multipv], 1):
+                board.push(move)
+                score = -material(board)
+                board.pop()
+                send(f"info depth {depth} multipv {k} score cp {score} nodes 100 nps 1000 pv {move.uci()}")
+            send(f"bestmove {moves[0].uci()}")
+        elif tokens[0] == "quit":
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Minimal UCI engine answering with canned output, for testing engine drivers.
+
+'go depth N' reports every depth up to N for each of the MultiPV lines and
+answers at once; any other 'go' reports one line and searches until 'stop'.
+Scores are for the side to move, whatever the position.
+"""
+import sys
+
+LINES = [("e2e4 e7e5", 35), ("d2d4 d7d5", 20), ("g1f3 g8f6", 10)]
+
+
+def send(line):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    multipv = 1
+    for command in sys.stdin:
+        tokens = command.split()
+        if not tokens:
+            continue
+        if tokens[0] == "uci":
+            send("id name Fake UCI")
+            send("id author chess_analysis tests")
+            send("option name MultiPV type spin default 1 min 1 max 3")
+            send("uciok")
+        elif tokens[0] == "isready":
+            send("readyok")
+        elif tokens[:3] == ["setoption", "name", "MultiPV"]:
+            multipv = int(tokens[4])
+        elif tokens[0] == "go" and "depth" in tokens:
+            depth = int(tokens[tokens.index("depth") + 1])
+            # Malformed and partial lines a driver has to get past
+            send("info depth")
+            send("info depth two score cp 50 pv a2a3")
+            send("info string searching")
+            for d in range(1, depth + 1):
+                send(f"info depth {d} score cp 900 lowerbound nodes {d * 10} pv h2h4")
+                for k, (pv, score) in enumerate(LINES[:multipv], 1):
+                    send(f"info depth {d} seldepth {d + 2} multipv {k} score cp {score} nodes {d * 100} nps 1000 pv {pv}")
+            send(f"bestmove {LINES[0][0].split()[0]}")
+        elif tokens[0] == "go":
+            send("info depth 1 multipv 1 score cp 15 nodes 50 pv e2e4")
+            for command in sys.stdin:
+                if command.strip() == "stop":
+                    break
+            send("bestmove e2e4")
+        elif tokens[0] == "quit":
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+import chess
+import pytest
+
+from chess_analysis.adjudication import Adjudicator
+from chess_analysis.probe import Prober
+
+# Late middlegame, so draw adjudication (from move 40 by default) may count it
+QUIET_FEN = "4k3/pppp4/8/8/8/8/PPPP4/4K3 w - - 0 40"
+
+
+class WinningTablebase(Prober):
+    """Prober whose tablebases cover positions of at most 3 pieces, all won by White."""
+
+    def probe_tablebase(self, board):
+        if chess.popcount(board.occupied) > 3:
+            return None
+        return {'score': {'type': 'cp', 'value': 20_000}}
+
+
+def feed(adjudicator, evals, fen=QUIET_FEN):
+    """Adjudicate the kings shuffling with the given evals, returning the first decision."""
+    board = chess.Board(fen)
+    adjudicator.reset()
+    for i, eval in enumerate(evals):
+        board.push_san(["Kf1", "Kf8", "Ke1", "Ke8"][i % 4])
+        adjudication = adjudicator.adjudicate(SimpleNamespace(board=board, eval=eval))
+        if adjudication is not None:
+            return adjudication
+    return None
+
+
+@pytest.mark.parametrize("sign, result", [(1, "1-0"), (-1, "0-1")])
+def test_resigns_after_consecutive_lost_plies(sign, result):
+    adjudicator = Adjudicator(resign_eval=5, resign_plies=3)
+
+    assert feed(adjudicator, [sign * 6, sign * 6, sign * 1, sign * 6, sign * 6]) is None
+    adjudication = feed(adjudicator, [sign * 6, sign * 7, sign * 5])
+    assert (adjudication.result, adjudication.reason) == (result, "resign")
+    assert adjudicator.adjudication is adjudication
+
+
+def test_draws_level_positions_after_draw_after():
+    adjudicator = Adjudicator(draw_eval=0.1, draw_plies=4)
+    assert feed(adjudicator, [0.0, 0.05, -0.05, 0.5, 0.0, 0.0, 0.0]) is None
+
+    adjudication = feed(adjudicator, [0.0, 0.05, -0.05, 0.0])
+    assert (adjudication.result, adjudication.reason) == ("1/2-1/2", "draw")
+
+    early = Adjudicator(draw_eval=0.1, draw_plies=4)
+    assert feed(early, [0.0] * 10, QUIET_FEN.replace(" 40", " 10")) is None
+
+
+def test_plies_without_an_eval_reset_the_counts():
+    adjudicator = Adjudicator(resign_eval=5, resign_plies=2, draw_eval=0.1, draw_plies=2)
+    assert feed(adjudicator, [6, None, 6, None, 0.0, None, 0.0]) is None
+
+
+def test_tablebase_decides_covered_positions():
+    adjudicator = Adjudicator(tablebase=WinningTablebase())
+    board = chess.Board("8/8/8/4k3/8/8/8/R3K3 b - - 0 60")
+
+    adjudication = adjudicator.adjudicate(SimpleNamespace(board=board, eval=None))
+
+    assert (adjudication.result, adjudication.reason, adjudication.ply) == ("1-0", "tablebase", board.ply())
+
+
+def test_max_plies_draws():
+    adjudicator = Adjudicator(max_plies=chess.Board(QUIET_FEN).ply() + 3)
+
+    adjudication = feed(adjudicator, [None] * 10)
+
+    assert (adjudication.result, adjudication.reason) == ("1/2-1/2", "max plies")
+
+
+def test_finished_games_are_left_alone():
+    adjudicator = Adjudicator(max_plies=1)
+    board = chess.Board()
+    for san in ["f3", "e5", "g4", "Qh4#"]:
+        board.push_san(san)
+
+    assert adjudicator.adjudicate(SimpleNamespace(board=board, eval=None)) is None
+
+
+def test_adjudicated_game_records_its_adjudication(stockfish):
+    from chess_analysis.auto import run_auto_game
+    from chess_analysis.player import random_player
+
+    board, history = run_auto_game((random_player, random_player), bare=True, adjudicator=Adjudicator(max_plies=6))
+
+    assert board.ply() == 6
+    assert (history.result, history.termination) == ("1/2-1/2", "adjudication: max plies")
+    assert history.adjudication.ply == 6
+
+
+def test_async_game_records_its_adjudication(stockfish):
+    from chess_analysis.auto import run_auto_game_async
+    from chess_analysis.player import random_player
+
+    board, history = asyncio.run(
+        run_auto_game_async((random_player, random_player), adjudicator=Adjudicator(max_plies=4))
+    )
+
+    assert board.ply() == 4
+    assert (history.result, history.termination) == ("1/2-1/2", "adjudication: max plies")
@@ -0,0 +1,211 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+import pytest
+
+from chess_analysis.analysis import Analysis, Record, step
+from chess_analysis.engine import Engine
+
+runs = Counter()
+
+
+class NullEngine(Engine):
+    """Engine the test pipelines never search with."""
+
+    name = 'null'
+
+    def set_board(self, board):
+        pass
+
+    def get_evaluation(self):
+        return {'type': 'cp', 'value': 0}
+
+    def get_best_move(self):
+        return None
+
+    def analyse(self, board, multipv=1, limit=None):
+        raise AssertionError("the test pipelines do not search")
+
+
+@step(produces=['pieces'])
+def count_pieces(analysis):
+    runs['count_pieces'] += 1
+    analysis['pieces'] = len(analysis.board.piece_map())
+
+
+@step(produces=['moves'])
+def count_moves(analysis):
+    runs['count_moves'] += 1
+    analysis['moves'] = analysis.board.legal_moves.count()
+
+
+@step(produces=['ratio'], consumes=['pieces', 'moves'])
+def ratio(analysis):
+    runs['ratio'] += 1
+    analysis['ratio'] = analysis['moves'] / analysis['pieces']
+
+
+@step(produces=['ply'], memoize=False)
+def ply(analysis):
+    runs['ply'] += 1
+    analysis['ply'] = len(analysis.board.move_stack)
+
+
+def summary(analysis):
+    return {'ratio': analysis['ratio'], 'ply': analysis['ply']}
+
+
+def pipeline(**kwargs):
+    runs.clear()
+    return Analysis(NullEngine(), **kwargs) | count_pieces | count_moves | ratio | ply
+
+
+def test_compute_runs_only_what_keys_need():
+    analysis = pipeline()
+
+    assert analysis.compute(chess.Board(), 'pieces') == {'pieces': 32}
+    assert runs == {'count_pieces': 1}
+
+    assert analysis.compute(chess.Board(), 'ratio') == {'ratio': 20 / 32}
+    assert runs == {'count_pieces': 1, 'count_moves': 1, 'ratio': 1}
+
+
+def test_step_results_are_memoized_per_position():
+    analysis = pipeline() | summary
+    board = chess.Board()
+
+    first = analysis(board)
+    assert analysis(board) == first
+    assert runs == {'count_pieces': 1, 'count_moves': 1, 'ratio': 1, 'ply': 2}
+
+    board.push_san("e4")
+    board.push_san("e5")
+    assert analysis(board) == {'ratio': 29 / 32, 'ply': 2}
+    assert runs == {'count_pieces': 2, 'count_moves': 2, 'ratio': 2, 'ply': 3}
+
+    analysis.clear_memo()
+    analysis(board)
+    assert runs['ratio'] == 3
+
+
+def test_memo_is_bounded():
+    analysis = pipeline(memo_size=1)
+    board = chess.Board()
+    analysis.compute(board, 'pieces')
+    board.push_san("e4")
+    analysis.compute(board, 'pieces')
+    board.pop()
+    analysis.compute(board, 'pieces')
+
+    assert runs['count_pieces'] == 3
+    assert len(analysis.memo) == 1
+
+
+def test_undeclared_steps_always_run():
+    calls = []
+    analysis = pipeline() | (lambda analysis: calls.append(analysis['pieces'])) | summary
+
+    analysis(chess.Board())
+    analysis(chess.Board())
+
+    assert calls == [32, 32]
+    assert runs['count_pieces'] == 1
+
+
+def test_records_leave_persist_alone():
+    analysis = pipeline(records=True) | summary
+    analysis.persist['name'] = 'test'
+
+    record = analysis.run(chess.Board())
+
+    assert isinstance(record, Record)
+    assert record['ratio'] == 20 / 32
+    assert sorted(record.keys()) == ['moves', 'pieces', 'ply', 'ratio']
+    assert analysis.persist == {'name': 'test'}
+    assert analysis['name'] == 'test'
+    assert analysis.copy().persist == {'name': 'test'}
+
+
+def test_records_keep_settings_read_only():
+    @step(produces=['moves'])
+    def rename(analysis):
+        analysis['name'] = 'changed'
+
+    analysis = pipeline(records=True) | rename
+    analysis.persist['name'] = 'test'
+
+    with pytest.raises(KeyError):
+        analysis.compute(chess.Board(), 'moves')
+    assert analysis.persist['name'] == 'test'
+
+
+def test_record_calls_are_isolated_between_threads():
+    analysis = pipeline(records=True) | summary
+    boards = [chess.Board(), chess.Board("4k3/8/8/8/8/8/8/4K2R w K - 0 1")] * 20
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(analysis.run, boards))
+
+    assert [record['ratio'] for record in results] == [board.legal_moves.count() / len(board.piece_map()) for board in boards]
+
+
+def test_index_is_built_once(monkeypatch):
+    analysis = pipeline(records=True) | summary
+    built = Counter()
+    producers = Analysis.producers
+    monkeypatch.setattr(Analysis, 'producers', lambda self: built.update(['producers']) or producers(self))
+
+    for _ in range(5):
+        analysis(chess.Board())
+        analysis.compute(chess.Board(), 'ratio')
+    assert built['producers'] == 0
+
+    analysis.pipeline.append(summary)
+    analysis(chess.Board())
+    analysis(chess.Board())
+    assert built['producers'] == 1
+
+
+def test_replayed_calls_set_the_same_keys():
+    analysis = pipeline(records=True) | summary
+
+    first = analysis.run(chess.Board()).to_dict()
+    second = analysis.run(chess.Board()).to_dict()
+
+    assert second == first
+    assert runs['ratio'] == 1
+
+
+def slow_early_plies(analysis):
+    # Early chunks finish last, so completion order differs from input order
+    ply = len(analysis.board.move_stack)
+    time.sleep(0.02 if ply < 8 else 0)
+    return ply
+
+
+def game_boards(plies):
+    board = chess.Board()
+    boards = [board.copy()]
+    for san in ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6", "Ba4", "Nf6", "O-O", "Be7", "Re1", "b5", "Bb3", "d6", "c3", "O-O"][:plies]:
+        board.push_san(san)
+        boards.append(board.copy())
+    return boards
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_map_yields_results_in_input_order(workers):
+    analysis = Analysis(NullEngine()) | slow_early_plies
+    boards = game_boards(16)
+
+    assert list(analysis.map(iter(boards), workers=workers, chunksize=2)) == list(range(17))
+
+
+def test_map_unordered_yields_every_result_with_its_index():
+    analysis = Analysis(NullEngine()) | slow_early_plies
+    boards = game_boards(16)
+
+    results = list(analysis.map(boards, workers=2, chunksize=2, ordered=False))
+
+    assert sorted(results) == [(i, i) for i in range(17)]
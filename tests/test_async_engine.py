@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import chess
+import pytest
+
+from chess_analysis.analysis import Analysis
+from chess_analysis.analysis_steps import evaluate_board, extract_move, process_eval
+from chess_analysis.async_engine import ThreadedEngine
+from chess_analysis.engine import Engine, make_analysis_result
+
+
+@pytest.fixture
+def auto(stockfish):
+    from chess_analysis import auto
+    return auto
+
+
+class SlowEngine(Engine):
+    """Blocking engine playing the first legal move, trying it on the board it is given."""
+
+    name = 'slow'
+
+    def __init__(self, seconds=0.02):
+        self.seconds = seconds
+        self.boards = []
+        self.board = chess.Board()
+
+    def set_board(self, board):
+        self.board = board
+
+    def get_evaluation(self):
+        return self.analyse(self.board)['score']
+
+    def get_best_move(self):
+        return self.analyse(self.board)['best_move']
+
+    def analyse(self, board, multipv=1, limit=None):
+        self.boards.append(board)
+        move = next(iter(board.legal_moves))
+        board.push(move)
+        time.sleep(self.seconds)
+        board.pop()
+        score = {'type': 'cp', 'value': 0}
+        return make_analysis_result(score, [{'move': move.uci(), 'score': score, 'pv': [move.uci()]}], 1)
+
+
+def eval_summary(analysis):
+    return {'eval': analysis['eval']}
+
+
+def test_threaded_engine_searches_a_copy():
+    engine = SlowEngine()
+    board = chess.Board()
+
+    result = asyncio.run(ThreadedEngine(engine).analyse(board))
+
+    assert result['best_move'] is not None
+    assert engine.boards[0] is not board
+    assert engine.boards[0].fen() == board.fen()
+
+
+def test_synchronous_players_do_not_block_the_event_loop(auto):
+    engine = SlowEngine()
+    player = Analysis(engine, records=True) | evaluate_board | process_eval | extract_move
+    player.persist['name'] = 'slow'
+    annotator = Analysis(ThreadedEngine(SlowEngine(0))) | evaluate_board | eval_summary
+
+    async def play():
+        ticks = 0
+        done = asyncio.Event()
+
+        async def tick():
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        ticker = asyncio.ensure_future(tick())
+        plies = []
+        async for ply in auto.aiter_game(chess.Board(), (player, player), annotator):
+            plies.append(ply.san)
+            if len(plies) == 4:
+                break
+        done.set()
+        await ticker
+        return plies, ticks
+
+    plies, ticks = asyncio.run(play())
+
+    assert len(plies) == 4
+    # Four player searches of 20 ms each ran while the loop kept ticking
+    assert ticks >= 20
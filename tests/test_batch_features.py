@@ -0,0 +1,90 @@
+import random
+
+import chess
+import numpy as np
+import pytest
+
+from chess_analysis.batch_features import PACKED_COLUMNS, CASTLED, boards_to_packed, featurize_batch, fens_to_packed
+from chess_analysis.features import SUMMARY_FEATURES, featurize, mobility_counts
+
+from test_features import STARTS, random_games
+
+# Positions where pins, checks and en passant decide which moves are legal
+TACTICS = [
+    # En passant would expose the king along the rank
+    "8/8/8/K2pP2r/8/8/8/4k3 w - d6 0 2",
+    # Knight pinned on the file, pawn pinned on the diagonal
+    "4k3/4r3/8/8/1b6/8/3PN3/4K3 w - - 0 1",
+    # Double check: only the king moves
+    "4k3/8/8/8/8/5n2/8/r3K3 w - - 0 1",
+    # En passant captures the checking pawn
+    "8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1",
+    # Castling through an attacked square, and out of check
+    "r3k2r/8/8/8/8/8/6b1/R3K2R w KQkq - 0 1",
+    "r3k2r/8/8/8/4R3/8/8/4K3 b kq - 0 1",
+    # Pinned queen sliding along the pin line
+    "4r1k1/8/8/8/8/8/4Q3/4K3 w - - 0 1",
+]
+
+
+def positions():
+    boards = [chess.Board(fen) for fen in TACTICS]
+    for name in STARTS:
+        boards.extend(random_games(STARTS[name], seed=len(name), games=2, max_plies=150))
+    rng = random.Random(0)
+    for _ in range(12):
+        boards.extend(random_games(chess.STARTING_FEN, seed=rng.random(), games=1, max_plies=rng.randrange(20, 200)))
+    return boards
+
+
+@pytest.fixture(scope="module")
+def boards():
+    return positions()
+
+
+@pytest.fixture(scope="module")
+def packed(boards):
+    return boards_to_packed(boards)
+
+
+def assert_features_equal(actual, board):
+    expected = featurize(board)
+    for i, feature in enumerate(SUMMARY_FEATURES):
+        value = float(expected[feature]) if feature in expected else np.nan
+        assert actual[i] == pytest.approx(value, nan_ok=True), (feature, board.fen())
+
+
+def test_featurize_batch_matches_featurize(boards, packed):
+    features, names = featurize_batch(packed)
+
+    assert names == SUMMARY_FEATURES
+    for row, board in zip(features, boards):
+        assert_features_equal(row, board)
+
+
+@pytest.mark.parametrize("legal", [True, False])
+def test_mobility_matches_mobility_counts(boards, packed, legal):
+    features, _ = featurize_batch(packed, ['black_mobility', 'white_mobility'], legal=legal)
+
+    mismatches = [board.fen() for board, row in zip(boards, features)
+                  if list(row) != mobility_counts(board, legal=legal, cache=None)]
+    assert mismatches == []
+
+
+def test_fens_pack_like_boards(boards):
+    fens = [board.fen() for board in boards]
+    from_fens = fens_to_packed(fens)
+    from_boards = boards_to_packed(chess.Board(fen) for fen in fens)
+
+    assert from_fens.shape == (len(fens), len(PACKED_COLUMNS))
+    assert (from_fens == from_boards).all()
+    # FENs cannot tell who castled
+    assert (from_fens[:, CASTLED] == 0).all()
+
+
+@pytest.mark.parametrize("fen", TACTICS)
+def test_tactics_restrict_legal_moves(fen):
+    board = chess.Board(fen)
+    legal = mobility_counts(board, cache=None)[board.turn]
+    pseudo_legal = mobility_counts(board, legal=False, cache=None)[board.turn]
+    assert legal < pseudo_legal
@@ -0,0 +1,112 @@
+import chess
+import joblib
+import numpy as np
+import pytest
+from chess.engine import Limit
+from sklearn.linear_model import LinearRegression
+
+from chess_analysis.analysis import Analysis
+from chess_analysis.analysis_steps import evaluate_board
+from chess_analysis.cache import CachedEngine, EvaluationCache
+from chess_analysis.engine import CustomModelEngine
+from chess_analysis.features import SUMMARY_FEATURES
+from chess_analysis.position_store import PositionStore
+from chess_analysis.profiling import Profiler
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    rng = np.random.default_rng(0)
+    model = LinearRegression().fit(rng.normal(size=(50, len(SUMMARY_FEATURES))), rng.normal(size=50))
+    path = tmp_path / "model.joblib"
+    joblib.dump(model, path)
+    return str(path)
+
+
+def boards():
+    board = chess.Board()
+    positions = [board.copy()]
+    for san in ["e4", "e5", "Nf3", "Nc6", "Bb5"]:
+        board.push_san(san)
+        positions.append(board.copy())
+    return positions
+
+
+@pytest.mark.parametrize("search", [False, True])
+def test_custom_engine_results_are_reused(model_path, search):
+    engine = CustomModelEngine(model_path, depth=2, search=search)
+    cached = CachedEngine(engine, EvaluationCache())
+
+    for board in boards():
+        first = cached.analyse(board)
+        assert cached.analyse(board) == first
+        assert first['depth'] >= cached.depth
+
+    assert cached.cache.stats()['hit_rate'] == 0.5
+
+
+def test_position_store_serves_custom_engine(model_path, tmp_path):
+    store = PositionStore(str(tmp_path / "positions.db"))
+    cached = CachedEngine(CustomModelEngine(model_path), store)
+
+    for board in boards():
+        first = cached.analyse(board)
+        assert cached.analyse(board)['score'] == first['score']
+
+    assert store.stats()['hit_rate'] == 0.5
+    store.close()
+
+
+def test_position_store_batches_results(model_path, tmp_path):
+    path = str(tmp_path / "positions.db")
+    store = PositionStore(path, batch_size=4)
+    cached = CachedEngine(CustomModelEngine(model_path), store)
+    results = [cached.analyse(board) for board in boards()]
+
+    # Four results were written together, the other two are still buffered
+    assert len(store.pending) == 2
+    assert [cached.analyse(board)['score'] for board in boards()] == [result['score'] for result in results]
+    store.close()
+
+    reopened = PositionStore(path)
+    assert len(reopened) == len(results)
+    assert reopened.lookup(boards()[-1])['depth'] == results[-1]['depth']
+    reopened.close()
+
+
+def test_evaluation_cache_saved_on_close(model_path, tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = EvaluationCache(path=path)
+    cached = CachedEngine(CustomModelEngine(model_path), cache)
+    results = [cached.analyse(board) for board in boards()]
+    cache.close()
+
+    warm = CachedEngine(CustomModelEngine(model_path), EvaluationCache(path=path))
+    assert [warm.analyse(board) for board in boards()] == results
+    assert warm.cache.stats()['hits'] == len(results)
+
+
+@pytest.mark.parametrize("limit", [Limit(), Limit(mate=2)])
+def test_custom_engine_limit_without_budget_uses_configured_depth(model_path, limit):
+    engine = CustomModelEngine(model_path, depth=2, search=True)
+
+    result = engine.analyse(chess.Board(), limit=limit)
+
+    assert result['depth'] == 2
+    assert result['best_move'] is not None
+
+
+def test_profiler_reports_cache_hits_apart_from_searches(model_path):
+    cached = CachedEngine(CustomModelEngine(model_path), EvaluationCache())
+    analysis = Analysis(cached) | evaluate_board
+    analysis.profiler = Profiler()
+
+    for _ in range(2):
+        for board in boards():
+            analysis(board)
+        analysis.clear_memo()
+
+    stats = analysis.profiler.to_dict()
+    assert stats['engines'][cached.name]['calls'] == len(boards())
+    assert stats['caches'][cached.name]['calls'] == len(boards())
+    assert "cache custom:" in analysis.profiler.report()
@@ -0,0 +1,123 @@
+import chess
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pytest
+
+from chess_analysis.adjudication import Adjudication
+from chess_analysis.dataset import (
+    COLUMN_TYPES, DATASET_SCHEMA, DatasetWriter, load_dataframe, load_table, open_dataset, table_to_matrix
+)
+from chess_analysis.features import SUMMARY_FEATURES, featurize
+from chess_analysis.history import PositionHistory
+
+GAMES = [
+    # (white, black, moves, adjudication)
+    ("Engine", "Random", ["f3", "e5", "g4", "Qh4#"], None),
+    ("Random", "Engine", ["e4", "e5", "Nf3", "Nc6", "Bb5"], Adjudication("1-0", "resign", 5)),
+    ("Engine", "Random", ["d4", "d5", "c4"], None),
+    ("Engine 2/b", "Random", ["Nf3"], None),
+]
+
+
+def game_history(moves):
+    """History of a game with every feature, and an eval on all but the last position."""
+    board = chess.Board()
+    history = PositionHistory(board)
+    history.append(None, {**featurize(board), 'eval': 0.25})
+    for i, san in enumerate(moves):
+        move = board.push_san(san)
+        analysis = featurize(board)
+        if i < len(moves) - 1:
+            analysis['eval'] = i / 4
+        history.append(move, analysis)
+    return board, history
+
+
+@pytest.fixture
+def histories():
+    histories = []
+    for _, _, moves, adjudication in GAMES:
+        board, history = game_history(moves)
+        history.finish(board, adjudication)
+        histories.append(history)
+    return histories
+
+
+def write(root, histories, run="7", **kwargs):
+    with DatasetWriter(str(root), run=run, **kwargs) as writer:
+        for (white, black, _, _), history in zip(GAMES, histories):
+            writer.write_game(white, black, history)
+    return writer
+
+
+@pytest.mark.parametrize("row_group_games", [None, 1])
+def test_games_round_trip(tmp_path, histories, row_group_games):
+    writer = write(tmp_path, histories, row_group_games=row_group_games)
+    assert (writer.games, writer.rows) == (len(GAMES), sum(len(history) for history in histories))
+
+    df = load_dataframe(str(tmp_path)).sort_values(['game', 'ply'], ignore_index=True)
+
+    assert list(df.columns) == DATASET_SCHEMA.names + ['run', 'pairing']
+    for game, ((white, black, _, _), history) in enumerate(zip(GAMES, histories)):
+        rows = df[df['game'] == game]
+        expected = history.to_dataframe(SUMMARY_FEATURES + ['eval'])
+        assert rows['ply'].tolist() == list(range(len(history)))
+        for column in SUMMARY_FEATURES:
+            assert rows[column].tolist() == expected[column].tolist(), column
+        assert rows['eval'].tolist()[:-1] == expected['eval'].tolist()[:-1]
+        assert np.isnan(rows['eval'].iloc[-1])
+        assert set(rows['result']) == {history.result}
+        # Unfinished games have no termination
+        assert set(rows['termination'].fillna('')) == {history.termination or ''}
+        assert set(rows['run']) == {"7"}
+        assert set(rows['pairing']) == {f"{white}_vs_{black}"}
+
+    assert df.loc[df['game'] == 0, 'termination'].iloc[0] == 'checkmate'
+    assert df.loc[df['game'] == 1, 'termination'].iloc[0] == 'adjudication: resign'
+    assert df.loc[df['game'] == 2, 'result'].iloc[0] == '*'
+
+
+def test_columns_keep_their_types(tmp_path, histories):
+    write(tmp_path, histories)
+
+    table = load_table(str(tmp_path))
+
+    for name, type in COLUMN_TYPES.items():
+        assert table.schema.field(name).type == type, name
+    assert table.schema.field('run').type == pa.string()
+    assert open_dataset(str(tmp_path)).count_rows() == table.num_rows
+
+
+def test_filters_and_columns(tmp_path, histories):
+    write(tmp_path, histories, run="1")
+    write(tmp_path, histories[:1], run="2")
+
+    table = load_table(str(tmp_path), ['game', 'ply'], (ds.field('run') == "1") & (ds.field('pairing') == "Engine_vs_Random"))
+
+    assert table.column_names == ['game', 'ply']
+    assert sorted(set(table.column('game').to_pylist())) == [0, 2]
+    assert load_table(str(tmp_path), filter=ds.field('run') == "2").num_rows == len(histories[0])
+
+
+def test_overwrite_replaces_only_its_run(tmp_path, histories):
+    write(tmp_path, histories, run="1")
+    write(tmp_path, histories, run="2")
+    write(tmp_path, histories[:1], run="1", overwrite=True)
+
+    runs = load_table(str(tmp_path), ['run']).column('run').to_pylist()
+
+    assert runs.count("1") == len(histories[0])
+    assert runs.count("2") == sum(len(history) for history in histories)
+
+
+def test_table_to_matrix_reads_nulls_as_nan(tmp_path, histories):
+    write(tmp_path, histories[:1])
+
+    table = load_table(str(tmp_path), ['ply', 'white_has_castled', 'eval'])
+    matrix = table_to_matrix(table)
+
+    assert matrix.dtype == np.float32
+    assert matrix.shape == (len(histories[0]), 3)
+    assert matrix[:, 0].tolist() == list(range(len(histories[0])))
+    assert np.isnan(matrix[-1, 2]) and not np.isnan(matrix[:-1, 2]).any()
@@ -0,0 +1,230 @@
+import random
+
+import chess
+import numpy as np
+import pytest
+from chess import BLACK, WHITE
+
+from chess_analysis.features import (
+    MOBILITY_CACHE, SUMMARY_FEATURES, FeatureAccumulator, featurize, featurize_game, mobility_counts
+)
+
+# Per-square reference implementation the bitboard features replaced,
+# as position_analysis computed them before (castling replayed from the
+# game's root rather than the standard starting position)
+PIECE_VALUES = {chess.PAWN: 1, chess.KNIGHT: 3, chess.BISHOP: 3, chess.ROOK: 5, chess.QUEEN: 9, chess.KING: 0}
+
+
+def reference_material(board):
+    points = [0, 0]
+    for piece in board.piece_map().values():
+        points[piece.color] += PIECE_VALUES[piece.piece_type]
+    return points
+
+
+def reference_development(board):
+    development = [0., 0.]
+    starting_board = chess.Board()
+    for color in [WHITE, BLACK]:
+        starting_counts = {}
+        current_counts = {}
+        for square in chess.SQUARES:
+            piece = starting_board.piece_at(square)
+            if piece and piece.color == color:
+                starting_counts[piece.piece_type] = starting_counts.get(piece.piece_type, 0) + 1
+        for piece in board.piece_map().values():
+            if piece.color == color:
+                current_counts[piece.piece_type] = current_counts.get(piece.piece_type, 0) + 1
+
+        moved_count = {}
+        for square in chess.SQUARES:
+            starting_piece = starting_board.piece_at(square)
+            if starting_piece is not None and starting_piece.color == color and starting_piece != board.piece_at(square):
+                moved_count[starting_piece.piece_type] = moved_count.get(starting_piece.piece_type, 0) + 1
+
+        for piece_type, moved in moved_count.items():
+            captured = starting_counts.get(piece_type, 0) - current_counts.get(piece_type, 0)
+            developed = max(0, moved - captured)
+            if piece_type in [chess.KNIGHT, chess.BISHOP]:
+                development[color] += developed * 2
+            elif piece_type in [chess.QUEEN, chess.ROOK]:
+                development[color] += developed * 1
+    return development
+
+
+def reference_mobility(board):
+    board = board.copy()
+    mobility = [0, 0]
+    for color in [WHITE, BLACK]:
+        board.turn = color
+        for move in board.legal_moves:
+            piece = board.piece_at(move.from_square)
+            if piece and piece.color == color:
+                mobility[color] += 1
+    return mobility
+
+
+def reference_castled(board):
+    has_castled = [False, False]
+    temp_board = board.root()
+    for move in board.move_stack:
+        if temp_board.is_castling(move):
+            has_castled[temp_board.turn] = True
+        temp_board.push(move)
+    return has_castled
+
+
+def reference_furthest_rank(board):
+    furthest_rank = [0, 0]
+    for square in chess.SQUARES:
+        piece = board.piece_at(square)
+        if piece:
+            rank = chess.square_rank(square)
+            if piece.color == BLACK:
+                rank = 7 - rank
+            furthest_rank[piece.color] = max(furthest_rank[piece.color], rank)
+    return furthest_rank
+
+
+def reference_features(board):
+    material = reference_material(board)
+    development = reference_development(board)
+    mobility = reference_mobility(board)
+    has_castled = reference_castled(board)
+    furthest_rank = reference_furthest_rank(board)
+    features = {
+        'material': material[WHITE] - material[BLACK],
+        'white_material': material[WHITE],
+        'black_material': material[BLACK],
+        'development': development[WHITE] - development[BLACK],
+        'white_development': development[WHITE],
+        'black_development': development[BLACK],
+        'mobility': mobility[WHITE] - mobility[BLACK],
+        'white_mobility': mobility[WHITE],
+        'black_mobility': mobility[BLACK],
+        'white_has_castled': has_castled[WHITE],
+        'black_has_castled': has_castled[BLACK],
+        'fullmove_number': board.fullmove_number,
+        'halfmove_clock': board.halfmove_clock,
+        'furthest_rank': furthest_rank[WHITE] - furthest_rank[BLACK],
+        'white_furthest_rank': furthest_rank[WHITE],
+        'black_furthest_rank': furthest_rank[BLACK],
+    }
+    for square, piece in board.piece_map().items():
+        if piece.piece_type == chess.KING:
+            rank = chess.square_rank(square)
+            prefix = 'white' if piece.color == WHITE else 'black'
+            features[f'{prefix}_king_file'] = chess.square_file(square)
+            features[f'{prefix}_king_rank'] = rank if piece.color == WHITE else 7 - rank
+    return features
+
+
+STARTS = {
+    'standard': chess.STARTING_FEN,
+    # Castling on both sides, by both colors
+    'castling': "r3k2r/pppppppp/8/8/8/8/PPPPPPPP/R3K2R w KQkq - 0 1",
+    # Pawns one step from promoting, with captures onto the last rank
+    'promotion': "1n2k1n1/PP3PPP/8/8/8/8/pp3ppp/1N2K1N1 w - - 0 1",
+    # En passant available at once
+    'en passant': "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 2",
+    'no black king': "8/3ppp2/8/8/8/8/3PPP2/R3K2R w KQ - 0 1",
+    'no white king': "rn2k2r/8/8/8/8/8/1P6/8 b kq - 0 1",
+}
+
+
+def random_games(fen, seed, games=6, max_plies=120):
+    """Boards after every ply of seeded random games from a position."""
+    rng = random.Random(seed)
+    for _ in range(games):
+        board = chess.Board(fen)
+        yield board.copy()
+        for _ in range(max_plies):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+            yield board.copy()
+
+
+@pytest.fixture(autouse=True)
+def empty_mobility_cache():
+    MOBILITY_CACHE.clear()
+
+
+@pytest.mark.parametrize("name", STARTS)
+def test_featurize_matches_reference(name):
+    for board in random_games(STARTS[name], seed=len(name)):
+        assert featurize(board) == reference_features(board), board.fen()
+
+
+@pytest.mark.parametrize("name", STARTS)
+def test_accumulator_matches_reference(name):
+    rng = random.Random(name)
+    for game in range(6):
+        board = chess.Board(STARTS[name])
+        accumulator = FeatureAccumulator(board)
+        for _ in range(120):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            # Take some moves back to check pop() restores the features
+            if len(board.move_stack) > 2 and rng.random() < 0.2:
+                accumulator.pop(board)
+                assert accumulator.features(board) == reference_features(board), board.fen()
+                continue
+            accumulator.push(board, rng.choice(moves))
+            assert accumulator.features(board) == reference_features(board), board.fen()
+
+
+def test_games_include_captures_and_promotions():
+    captures = promotions = 0
+    for name in STARTS:
+        for board in random_games(STARTS[name], seed=len(name)):
+            if board.move_stack:
+                move = board.pop()
+                captures += board.is_capture(move)
+                promotions += move.promotion is not None
+    assert captures > 0
+    assert promotions > 0
+
+
+def test_pseudo_legal_mobility():
+    for board in random_games(STARTS['standard'], seed=7, games=3):
+        expected = [0, 0]
+        for color in [WHITE, BLACK]:
+            copy = board.copy()
+            copy.turn = color
+            expected[color] = sum(1 for move in copy.pseudo_legal_moves if copy.piece_at(move.from_square).color == color)
+        assert mobility_counts(board, legal=False, cache=None) == expected, board.fen()
+
+
+def test_featurize_game_marks_missing_kings_as_nan():
+    board = chess.Board(STARTS['no black king'])
+    features, columns = featurize_game(["e1g1", "d7d6"], board)
+    assert columns == SUMMARY_FEATURES
+    assert np.isnan(features[:, SUMMARY_FEATURES.index('black_king_file')]).all()
+    assert features[1, SUMMARY_FEATURES.index('white_has_castled')] == 1
+
+
+def test_accumulator_keeps_max_undo_moves():
+    board = chess.Board()
+    accumulator = FeatureAccumulator(board, max_undo=2)
+    for san in ["e4", "e5", "Nf3", "Nc6"]:
+        accumulator.push(board, board.parse_san(san))
+    assert len(accumulator.changes) == 2
+
+    accumulator.pop(board)
+    accumulator.pop(board)
+    assert accumulator.features(board) == reference_features(board)
+    with pytest.raises(IndexError):
+        accumulator.pop(board)
+    assert len(board.move_stack) == 2
+
+
+def test_forward_only_accumulator_keeps_no_history():
+    board = chess.Board()
+    accumulator = FeatureAccumulator(board, max_undo=0)
+    for move in list(random_games(chess.STARTING_FEN, seed=3, games=1))[-1].move_stack:
+        accumulator.push(board, move)
+    assert not accumulator.changes
+    assert accumulator.features(board) == reference_features(board)
@@ -0,0 +1,43 @@
+import chess
+import numpy as np
+
+from chess_analysis.history import PositionHistory
+
+
+def test_int_column_becomes_float():
+    board = chess.Board()
+    history = PositionHistory(board)
+    history.append(None, {'eval': 20, 'white_has_castled': False})
+    history.append(chess.Move.from_uci("e2e4"), {'eval': 0.37, 'white_has_castled': True})
+
+    assert history.to_dataframe()['eval'].tolist() == [20.0, 0.37]
+    assert history.analysis(0) == {'eval': 20.0, 'white_has_castled': False}
+    assert history.analysis(1) == {'eval': 0.37, 'white_has_castled': True}
+
+
+def test_kinds_never_narrow():
+    history = PositionHistory(chess.Board())
+    history.append(None, {'mobility': True, 'eval': 0.5})
+    history.append(chess.Move.from_uci("e2e4"), {'mobility': 20, 'eval': -3})
+
+    df = history.to_dataframe()
+    assert df['mobility'].dtype == np.int64
+    assert df['mobility'].tolist() == [1, 20]
+    assert df['eval'].tolist() == [0.5, -3.0]
+    assert isinstance(history.analysis(1)['eval'], float)
+
+
+def test_finish_records_how_the_game_ended():
+    from chess_analysis.adjudication import Adjudication
+
+    board = chess.Board()
+    history = PositionHistory(board)
+    assert (history.result, history.termination) == ('*', None)
+
+    for san in ["f3", "e5", "g4", "Qh4#"]:
+        board.push_san(san)
+    history.finish(board)
+    assert (history.result, history.termination) == ('0-1', 'checkmate')
+
+    history.finish(chess.Board(), Adjudication('1/2-1/2', 'draw', 80))
+    assert (history.result, history.termination) == ('1/2-1/2', 'adjudication: draw')
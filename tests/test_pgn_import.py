@@ -0,0 +1,51 @@
+import glob
+import io
+import os
+
+from chess_analysis.pgn_import import import_pgn, read_game_texts
+
+PGN = b"""[Event "One"]
+[Result "1-0"]
+
+1. e4 { opening
+[%eval 0.3] } 1... e5 { ; not a rest-of-line comment } 2. Nf3 ; a { here
+[%eval 0.25] 2... Nc6 3. Bb5 1-0
+
+[Event "Two"]
+[Result "0-1"]
+
+1. d4 { [%eval 0.2] } 1... d5 0-1
+"""
+
+
+def test_comments_do_not_split_games():
+    texts = list(read_game_texts(io.BytesIO(PGN)))
+
+    assert len(texts) == 2
+    assert texts[0][0].rstrip().endswith(b"3. Bb5 1-0")
+    assert texts[1][0].startswith(b'[Event "Two"]')
+    assert texts[-1][1] == len(PGN)
+
+
+def test_import_keeps_every_move(tmp_path):
+    path = tmp_path / "games.pgn"
+    path.write_bytes(PGN)
+
+    summary = import_pgn(str(path), str(tmp_path / "dataset"), run="pgn", shard_size=1)
+    assert summary['games'] == 2
+    assert summary['skipped'] == 0
+    # Every ply of both games, plus their start positions
+    assert summary['positions'] == 6 + 3
+
+
+def test_fresh_import_replaces_earlier_shards(tmp_path):
+    path = tmp_path / "games.pgn"
+    path.write_bytes(PGN)
+    dataset_dir = str(tmp_path / "dataset")
+
+    import_pgn(str(path), dataset_dir, run="pgn", games_per_chunk=1, shard_size=1)
+    summary = import_pgn(str(path), dataset_dir, run="pgn", games_per_chunk=2, shard_size=100, resume=False)
+
+    shards = glob.glob(os.path.join(dataset_dir, "run=pgn", "pairing=pgn", "part-*.parquet"))
+    assert summary['shards'] == 1
+    assert len(shards) == 1
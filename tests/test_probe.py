@@ -0,0 +1,85 @@
+import struct
+
+import chess
+import chess.polyglot
+import pytest
+
+from chess_analysis.analysis import Analysis
+from chess_analysis.analysis_steps import book_move, evaluate_board, extract_move, probe_board, process_eval
+from chess_analysis.engine import Engine, make_analysis_result
+from chess_analysis.probe import Prober
+
+
+class CountingEngine(Engine):
+    """Engine scoring every position +0.25 with the first legal move."""
+
+    name = 'counting'
+
+    def __init__(self):
+        self.calls = 0
+        self.board = chess.Board()
+
+    def set_board(self, board):
+        self.board = board
+
+    def get_evaluation(self):
+        return self.analyse(self.board)['score']
+
+    def get_best_move(self):
+        return self.analyse(self.board)['best_move']
+
+    def analyse(self, board, multipv=1, limit=None):
+        self.calls += 1
+        score = {'type': 'cp', 'value': 25}
+        move = next(iter(board.legal_moves)).uci()
+        return make_analysis_result(score, [{'move': move, 'score': score, 'pv': [move]}], 1)
+
+
+def polyglot_move(move):
+    return (chess.square_file(move.to_square) | chess.square_rank(move.to_square) << 3
+            | chess.square_file(move.from_square) << 6 | chess.square_rank(move.from_square) << 9)
+
+
+@pytest.fixture
+def prober(tmp_path):
+    board = chess.Board()
+    key = chess.polyglot.zobrist_hash(board)
+    entries = [(key, polyglot_move(chess.Move.from_uci(uci)), weight) for uci, weight in [("d2d4", 5), ("e2e4", 10)]]
+    path = tmp_path / "book.bin"
+    with open(path, "wb") as f:
+        for key, move, weight in sorted(entries):
+            f.write(struct.pack(">QHHI", key, move, weight, 0))
+    prober = Prober(book_path=str(path))
+    yield prober
+    prober.close()
+
+
+def test_book_hits_have_no_score(prober):
+    result = prober.probe(chess.Board())
+    assert result['source'] == 'book'
+    assert result['score'] is None
+    assert [line['move'] for line in result['lines']] == ["e2e4", "d2d4"]
+    assert prober.probe(chess.Board("8/8/8/8/8/8/8/K6k w - - 0 1")) is None
+
+
+def test_annotator_searches_book_positions(prober):
+    engine = CountingEngine()
+    annotator = Analysis(engine, records=True) | probe_board | evaluate_board
+    annotator.persist['prober'] = prober
+
+    assert annotator.compute(chess.Board(), 'eval') == {'eval': 0.25}
+    assert engine.calls == 1
+
+
+def test_player_plays_book_moves_without_searching(prober):
+    engine = CountingEngine()
+    player = Analysis(engine, records=True) | probe_board | evaluate_board | process_eval | book_move | extract_move
+    player.persist['prober'] = prober
+
+    assert player(chess.Board()) == chess.Move.from_uci("e2e4")
+    assert engine.calls == 0
+
+    board = chess.Board()
+    board.push_san("e4")
+    assert player(board) == next(iter(board.legal_moves))
+    assert engine.calls == 1
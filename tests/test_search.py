@@ -0,0 +1,144 @@
+import chess
+import pytest
+
+from chess_analysis.search import MATE_SCORE, AlphaBetaSearch
+
+VALUES = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 320, chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0}
+
+FENS = [
+    chess.STARTING_FEN,
+    "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",
+    "2kr3r/ppp2ppp/2n5/3q4/3P4/2P2N2/P4PPP/R2QR1K1 w - - 0 15",
+    "8/5k2/8/3p4/3P4/4K3/8/8 w - - 0 1",
+]
+
+# White mates with Qxf7 (scholar's mate)
+MATE_FEN = "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4"
+
+# Positions with a few exchanges available
+CAPTURE_FENS = [
+    "4k3/8/2n5/3p4/4P3/5N2/8/4K3 w - - 0 1",
+    "4k3/2r5/2n5/3p4/4P3/2N5/2R5/4K3 b - - 0 1",
+    "3qk3/8/8/3p4/4P3/3Q4/8/4K3 w - - 0 1",
+]
+
+
+def material(board):
+    """Material from White's point of view, plus a pawn-advance term to break ties."""
+    score = 0
+    for square, piece in board.piece_map().items():
+        sign = 1 if piece.color == chess.WHITE else -1
+        score += sign * VALUES[piece.piece_type]
+        if piece.piece_type == chess.PAWN:
+            score += chess.square_rank(square) if piece.color == chess.WHITE else chess.square_rank(square) - 7
+    return score
+
+
+def static(board):
+    score = material(board)
+    return score if board.turn == chess.WHITE else -score
+
+
+def is_draw(board):
+    return board.is_insufficient_material() or board.halfmove_clock >= 100 or board.is_repetition(2)
+
+
+def quiescence(board, ply):
+    if not any(board.generate_legal_moves()):
+        return -(MATE_SCORE - ply) if board.is_check() else 0
+    best = static(board)
+    for move in board.generate_legal_captures():
+        board.push(move)
+        best = max(best, -quiescence(board, ply + 1))
+        board.pop()
+    return best
+
+
+def minimax(board, depth, ply, extend):
+    """Plain negamax over every move, with the search's draw and mate rules."""
+    if ply > 0 and is_draw(board):
+        return 0
+    moves = list(board.legal_moves)
+    if not moves:
+        return -(MATE_SCORE - ply) if board.is_check() else 0
+    if depth == 0:
+        return quiescence(board, ply) if extend else static(board)
+    best = -MATE_SCORE
+    for move in moves:
+        board.push(move)
+        best = max(best, -minimax(board, depth - 1, ply + 1, extend))
+        board.pop()
+    return best
+
+
+def white_score(board, score):
+    return score if board.turn == chess.WHITE else -score
+
+
+@pytest.mark.parametrize("fen", FENS)
+@pytest.mark.parametrize("batched", [False, True])
+def test_search_matches_minimax(fen, batched):
+    board = chess.Board(fen)
+    evaluate_moves = None
+    if batched:
+        def evaluate_moves(board, moves):
+            scores = []
+            for move in moves:
+                board.push(move)
+                scores.append(material(board))
+                board.pop()
+            return scores
+    searcher = AlphaBetaSearch(material, evaluate_moves, quiescence=False, leaf_batch=3)
+
+    result = searcher.search(board, 2)
+
+    assert result['depth'] == 2
+    assert result['score'] == {'type': 'cp', 'value': white_score(board, minimax(board, 2, 0, False))}
+    assert board.fen() == fen
+
+
+@pytest.mark.parametrize("fen", FENS[-1:] + CAPTURE_FENS)
+def test_search_matches_minimax_deeper(fen):
+    board = chess.Board(fen)
+    result = AlphaBetaSearch(material, quiescence=False).search(board, 3)
+
+    assert result['score'] == {'type': 'cp', 'value': white_score(board, minimax(board, 3, 0, False))}
+
+
+@pytest.mark.parametrize("fen", CAPTURE_FENS)
+def test_quiescence_matches_capture_search(fen):
+    board = chess.Board(fen)
+    result = AlphaBetaSearch(material, quiescence=True).search(board, 2)
+
+    assert result['score'] == {'type': 'cp', 'value': white_score(board, minimax(board, 2, 0, True))}
+
+
+def test_finds_mate():
+    board = chess.Board(MATE_FEN)
+    result = AlphaBetaSearch(material).search(board, 3)
+
+    assert result['move'] == chess.Move.from_uci("h5f7")
+    assert result['score'] == {'type': 'mate', 'value': 1}
+    assert result['pv'][0] == result['move']
+
+
+def test_transposition_table_reuses_searches():
+    board = chess.Board(FENS[2])
+    searcher = AlphaBetaSearch(material, quiescence=False)
+
+    cold = searcher.search(board, 3)
+    warm = searcher.search(board, 3)
+    searcher.clear()
+    cleared = searcher.search(board, 3)
+
+    assert warm['score'] == cold['score'] == cleared['score']
+    assert warm['nodes'] < cold['nodes'] == cleared['nodes']
+
+
+def test_node_budget_keeps_last_iteration():
+    board = chess.Board(FENS[2])
+    result = AlphaBetaSearch(material, quiescence=False).search(board, 20, max_nodes=2_000)
+
+    assert 1 <= result['depth'] < 20
+    assert result['nodes'] > 2_000
+    assert board.fen() == FENS[2]
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from chess_analysis.adjudication import Adjudicator
+
+
+@pytest.fixture
+def bot_tournament(stockfish):
+    import bot_tournament
+    return bot_tournament
+
+
+def play(bot_tournament, tmp_path, workers):
+    csv_filename = tmp_path / f"workers_{workers}.csv"
+    df = bot_tournament.run_tournament(
+        [bot_tournament.random_player], games_per_round=3, csv_filename=str(csv_filename),
+        workers=workers, seed=7, adjudicator=Adjudicator(max_plies=24)
+    )
+    return df, pd.read_csv(csv_filename)
+
+
+def test_parallel_tournament_matches_sequential(bot_tournament, tmp_path):
+    sequential, sequential_csv = play(bot_tournament, tmp_path, 1)
+    parallel, parallel_csv = play(bot_tournament, tmp_path, 2)
+
+    assert len(sequential) > 0
+    pd.testing.assert_frame_equal(parallel, sequential)
+    pd.testing.assert_frame_equal(parallel_csv, sequential_csv)
+
+
+def test_games_depend_only_on_the_seed(bot_tournament, tmp_path):
+    first, _ = play(bot_tournament, tmp_path, 1)
+    # A game played in between must not change the ones after it
+    bot_tournament.play_tournament_game(bot_tournament.random_player, bot_tournament.random_player, "other")
+    second, _ = play(bot_tournament, tmp_path, 1)
+
+    pd.testing.assert_frame_equal(second, first)
@@ -0,0 +1,97 @@
+import os
+import threading
+
+import chess
+import pytest
+from chess.engine import Limit
+
+from chess_analysis.engine import parse_info
+from chess_analysis.uci import UCIEngine
+
+FAKE_ENGINE = os.path.join(os.path.dirname(__file__), "fake_uci_engine.py")
+
+
+@pytest.fixture
+def engine():
+    with UCIEngine(FAKE_ENGINE, depth=3) as engine:
+        yield engine
+
+
+def test_handshake(engine):
+    assert engine.engine_id['name'] == "Fake UCI"
+    assert "MultiPV" in engine.engine_options
+
+
+def test_analyse(engine):
+    infos = []
+    engine.add_info_callback(infos.append)
+    result = engine.analyse(chess.Board())
+
+    assert result['score'] == {'type': 'cp', 'value': 35}
+    assert result['best_move'] == "e2e4"
+    assert result['depth'] == 3
+    assert result['nodes'] == 300
+    assert result['lines'] == [{'move': "e2e4", 'score': {'type': 'cp', 'value': 35}, 'pv': ["e2e4", "e7e5"]}]
+    assert any(info.get('string') == "searching" for info in infos)
+
+
+def test_scores_are_from_whites_point_of_view(engine):
+    board = chess.Board()
+    board.push_san("e4")
+    assert engine.analyse(board)['score'] == {'type': 'cp', 'value': -35}
+
+
+def test_empty_limit_searches_configured_depth(engine):
+    assert engine.analyse(chess.Board(), limit=Limit())['depth'] == 3
+    assert engine.analyse(chess.Board(), limit=Limit(depth=5))['depth'] == 5
+
+
+def test_multipv(engine):
+    result = engine.analyse(chess.Board(), multipv=3)
+    assert [line['move'] for line in result['lines']] == ["e2e4", "d2d4", "g1f3"]
+    assert [line['score']['value'] for line in result['lines']] == [35, 20, 10]
+    assert result['score'] == result['lines'][0]['score']
+
+    assert len(engine.analyse(chess.Board())['lines']) == 1
+
+
+def test_stop(engine):
+    searching = threading.Event()
+    engine.add_info_callback(lambda info: searching.set())
+    results = []
+    search = threading.Thread(target=lambda: results.append(engine.analyse(chess.Board(), limit=Limit(time=60))))
+    search.start()
+
+    assert searching.wait(5)
+    engine.stop()
+    search.join(5)
+    assert not search.is_alive()
+    assert results[0]['best_move'] == "e2e4"
+    assert results[0]['score'] == {'type': 'cp', 'value': 15}
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("info", {}),
+    ("info depth", {}),
+    ("info depth two nodes 5", {}),
+    ("info depth 4 score cp", {'depth': 4}),
+    ("info depth 4 score wdl 500 400 100 nodes 9", {'depth': 4}),
+    ("info depth 4 score mate -2 upperbound pv e2e4 e7e5", {
+        'depth': 4, 'score': {'type': 'mate', 'value': -2}, 'bound': "upperbound", 'pv': ["e2e4", "e7e5"]
+    }),
+    ("info string depth x", {'string': "depth x"}),
+])
+def test_parse_info(line, expected):
+    assert parse_info(line) == expected
+
+
+def test_close_and_restart():
+    engine = UCIEngine(FAKE_ENGINE, depth=2)
+    process = engine.process
+    engine.close()
+    assert process.poll() is not None
+    assert engine.process is None
+
+    assert engine.analyse(chess.Board())['best_move'] == "e2e4"
+    assert engine.process.poll() is None
+    engine.close()